@@ -1,34 +1,560 @@
+import argparse
+import importlib
+import json
 import random
+import sys
+import time
+from array import array
+from collections import namedtuple
 
-def get_user_choice():
-    user_input = input("Enter your choice (rock, paper, scissors): ").lower()
-    if user_input in ["rock", "paper", "scissors"]:
-        return user_input
-    else:
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Outcomes from the first player's side
+TIE, WIN, LOSS = 0, 1, 2
+MESSAGES = ["It's a tie!", "You win!", "You lose!"]
+RESULT_NAMES = ["tie", "win", "loss"]
+
+# Streaming mode: how many bad input lines to describe on stderr
+MAX_REPORTED_INVALID = 10
+
+# Largest rule set accepted (its dominance table is N^2 bytes)
+MAX_WEAPONS = 1001
+# Per-order table budgets for the learning bots; their context length is capped to fit
+PREDICTIVE_FLOATS = 1 << 16
+PATTERN_BYTES = 1 << 16
+
+BatchResult = namedtuple("BatchResult", ["wins", "ties", "losses", "results"])
+StreamSummary = namedtuple("StreamSummary", ["rounds", "wins", "ties", "losses", "invalid"])
+
+class RuleSet:
+    """A balanced N-weapon variant compiled to an N x N dominance table.
+
+    ``beats`` maps each weapon to the weapons it defeats. Weapons are
+    encoded as their index in ``weapons``; ``table[a * n + b]`` is the
+    outcome (TIE, WIN or LOSS) for a against b, so resolving a round is
+    one lookup whatever N is. Raises ValueError unless N is odd and every
+    weapon beats exactly (N - 1) / 2 others, each pair settled one way.
+    """
+
+    def __init__(self, name, weapons, beats):
+        self.name = name
+        self.weapons = [weapon.lower() for weapon in weapons]
+        self.codes = {weapon: code for code, weapon in enumerate(self.weapons)}
+        n = self.size = len(self.weapons)
+        if n < 3 or n % 2 == 0 or len(self.codes) != n:
+            raise ValueError(f"{name}: need an odd number (3 or more) of distinct weapons")
+        if n > MAX_WEAPONS:
+            raise ValueError(f"{name}: {n} weapons, at most {MAX_WEAPONS} are supported")
+        table = bytearray(n * n)
+        for weapon, beaten in beats.items():
+            for other in beaten:
+                a, b = self._code(weapon), self._code(other)
+                if a == b or table[a * n + b] == LOSS:
+                    raise ValueError(f"{name}: {weapon} and {other} cannot both win")
+                table[a * n + b] = WIN
+                table[b * n + a] = LOSS
+        for a, weapon in enumerate(self.weapons):
+            wins = table[a * n:(a + 1) * n].count(WIN)
+            if wins != n // 2:
+                raise ValueError(f"{name}: {weapon} beats {wins} weapons, expected {n // 2}")
+        self.table = bytes(table)
+        # Weapons that beat each weapon, for bots that counter a prediction
+        self.counters = [[a for a in range(n) if table[a * n + b] == WIN] for b in range(n)]
+
+    @classmethod
+    def cyclic(cls, name, weapons):
+        # Each weapon beats the (N - 1) / 2 weapons listed just before it
+        n = len(weapons)
+        return cls(name, weapons, {weapon: [weapons[(i - j) % n] for j in range(1, n // 2 + 1)]
+                                   for i, weapon in enumerate(weapons)})
+
+    def _code(self, weapon):
+        try:
+            return self.codes[weapon.lower()]
+        except KeyError:
+            raise ValueError(f"{self.name}: unknown weapon {weapon!r}") from None
+
+    def outcome(self, a, b):
+        return self.table[a * self.size + b]
+
+def load_rules(path):
+    """Read a rule set from a JSON file.
+
+    {"name": "...", "weapons": [...], "beats": {"weapon": [...], ...}}
+    Without "beats" the weapons are taken as a cyclic tournament
+    (see RuleSet.cyclic), which is how RPS-101 style lists are usually given.
+    Raises ValueError for a file that isn't JSON of that shape.
+    """
+    with open(path) as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: not valid JSON ({e})") from None
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a JSON object with \"weapons\"")
+    weapons = data.get("weapons")
+    if not isinstance(weapons, list) or not all(isinstance(weapon, str) for weapon in weapons):
+        raise ValueError(f"{path}: \"weapons\" must be a list of names")
+    name = data.get("name", path)
+    if not isinstance(name, str):
+        raise ValueError(f"{path}: \"name\" must be a string")
+    if "beats" not in data:
+        return RuleSet.cyclic(name, weapons)
+    beats = data["beats"]
+    if not isinstance(beats, dict) or not all(
+            isinstance(beaten, list) and all(isinstance(other, str) for other in beaten)
+            for beaten in beats.values()):
+        raise ValueError(f"{path}: \"beats\" must map each weapon to a list of names")
+    return RuleSet(name, weapons, beats)
+
+CLASSIC = RuleSet.cyclic("classic", ["rock", "paper", "scissors"])
+RPSLS = RuleSet("rpsls", ["rock", "paper", "scissors", "lizard", "spock"], {
+    "rock": ["scissors", "lizard"],
+    "paper": ["rock", "spock"],
+    "scissors": ["paper", "lizard"],
+    "lizard": ["spock", "paper"],
+    "spock": ["scissors", "rock"],
+})
+RULE_SETS = {rules.name: rules for rules in (CLASSIC, RPSLS)}
+
+# Moves are encoded as small integers (see RuleSet)
+CHOICES = CLASSIC.weapons
+MOVE_CODES = CLASSIC.codes
+
+def get_user_choice(rules=CLASSIC):
+    while True:
+        user_input = input(f"Enter your choice ({', '.join(rules.weapons)}): ").lower()
+        if user_input in rules.codes:
+            return user_input
         print("Invalid choice. Please try again.")
-        return get_user_choice()
-
-def get_computer_choice():
-    return random.choice(["rock", "paper", "scissors"])
-
-def determine_winner(user_choice, computer_choice):
-    if user_choice == computer_choice:
-        return "It's a tie!"
-    elif (user_choice == "rock" and computer_choice == "scissors") or \
-         (user_choice == "paper" and computer_choice == "rock") or \
-         (user_choice == "scissors" and computer_choice == "paper"):
-        return "You win!"
-    else:
-        return "You lose!"
-
-def play_game():
+
+def get_computer_choice(bot=None, rules=CLASSIC):
+    if bot is not None:
+        return rules.weapons[bot.choose()]
+    return random.choice(rules.weapons)
+
+def encode_moves(choices, rules=CLASSIC):
+    # ["rock", "scissors", ...] -> [0, 2, ...]
+    return [rules.codes[choice] for choice in choices]
+
+def play_rounds(user_moves, computer_moves, rules=CLASSIC):
+    """Resolve many rounds at once from two equal-length sequences of move codes.
+
+    Returns a BatchResult with win/tie/loss counts (user's side) and the
+    per-round outcomes (TIE, WIN or LOSS), looked up in the rule set's
+    dominance table. Uses NumPy when it is installed; the results then
+    come back as a uint8 array instead of a list.
+    """
+    if len(user_moves) != len(computer_moves):
+        raise ValueError("user_moves and computer_moves must be the same length")
+    n = rules.size
+    if np is not None:
+        user = np.asarray(user_moves, dtype=np.intp)
+        computer = np.asarray(computer_moves, dtype=np.intp)
+        for moves in (user, computer):
+            if moves.size and (moves.min() < 0 or moves.max() >= n):
+                raise ValueError(f"move codes must be 0 to {n - 1}")
+        results = np.frombuffer(rules.table, dtype=np.uint8)[user * n + computer]
+        ties, wins, losses = (int(count) for count in np.bincount(results, minlength=3))
+        return BatchResult(wins, ties, losses, results)
+    if not {*user_moves, *computer_moves} <= set(range(n)):
+        raise ValueError(f"move codes must be 0 to {n - 1}")
+    table = rules.table
+    results = [table[a * n + b] for a, b in zip(user_moves, computer_moves)]
+    return BatchResult(results.count(WIN), results.count(TIE), results.count(LOSS), results)
+
+def random_moves(rounds, rng=None, rules=CLASSIC):
+    if np is not None:
+        return (rng or np.random.default_rng()).integers(0, rules.size, size=rounds, dtype=np.intp)
+    rng = rng or random.Random()
+    return [rng.randrange(rules.size) for _ in range(rounds)]
+
+def simulate(rounds, seed=None, rules=CLASSIC):
+    # Random play against random play, in one batch
+    rng = np.random.default_rng(seed) if np is not None else random.Random(seed)
+    return play_rounds(random_moves(rounds, rng, rules), random_moves(rounds, rng, rules), rules)
+
+def determine_winner(user_choice, computer_choice, rules=CLASSIC):
+    # One round through the batch API
+    outcome = play_rounds([rules.codes[user_choice]], [rules.codes[computer_choice]], rules).results[0]
+    return MESSAGES[outcome]
+
+def bounded_order(base, max_order, budget):
+    # Largest k <= max_order with base^k <= budget
+    k = 0
+    while k < max_order and base ** (k + 1) <= budget:
+        k += 1
+    return k
+
+# Strategies: choose() -> move code, update(the other side's move) after
+# each round. register() files a class under a name; plugin modules call it
+# when they are imported (load_plugins), and --opponent, --stream and
+# rps_tournament.py all look strategies up here.
+OPPONENTS = {}
+
+def register(name):
+    def add(cls):
+        OPPONENTS[name] = cls
+        return cls
+    return add
+
+def load_plugins(modules):
+    # Import strategy plugins by module name; each registers its own classes
+    for module in modules:
+        importlib.import_module(module)
+
+@register("random")
+class RandomBot:
+    """Uniformly random moves; the baseline opponent."""
+
+    def __init__(self, rng=None, rules=CLASSIC):
+        self.rng = rng or random.Random()
+        self.rules = rules
+
+    def choose(self):
+        return self.rng.randrange(self.rules.size)
+
+    def update(self, move):
+        pass
+
+@register("predictive")
+class PredictiveBot:
+    """Counters the player's most likely next move, learned from their history.
+
+    For each context length k = 0..max_order it keeps counts of the move
+    that followed each run of the player's last k moves, as a flat float
+    array indexed by the context read as a base-N number. Counts decay on
+    every update so old habits fade. Each context length also earns a
+    decayed score for how often its own guess was right, and choose()
+    blends their predictions by those scores. Memory is fixed, N^(k+1)
+    floats per order (about 0.5 KB for classic rules at the default
+    order), and update() does constant work per round. max_order is cut
+    to the longest context whose table fits in ``budget`` floats, so large
+    rule sets learn from shorter histories instead of running out of
+    memory (101 weapons: order 1 at the default budget).
+    """
+
+    def __init__(self, max_order=3, decay=0.9, rng=None, rules=CLASSIC, budget=PREDICTIVE_FLOATS):
+        n = self.n = rules.size
+        if n > budget:
+            raise ValueError(f"{rules.name}: {n} weapons don't fit a budget of {budget} floats")
+        max_order = self.max_order = bounded_order(n, max_order, budget // n)
+        self.decay = decay
+        self.rng = rng or random.Random()
+        self.rules = rules
+        self.counts = [array("f", bytes(4 * n ** (k + 1))) for k in range(max_order + 1)]
+        self.scores = array("f", [1.0] * (max_order + 1))
+        self.history = 0  # last max_order moves as a base-N number, newest lowest
+        self.seen = 0
+
+    @property
+    def nbytes(self):
+        return sum(counts.itemsize * len(counts) for counts in self.counts) + 4 * len(self.scores)
+
+    def _rows(self):
+        # (order, offset of the current context's N counts)
+        n = self.n
+        for k in range(min(self.seen, self.max_order) + 1):
+            yield k, self.history % n ** k * n
+
+    def choose(self):
+        n = self.n
+        blend = [0.0] * n
+        for k, row in self._rows():
+            counts = self.counts[k][row:row + n]
+            total = sum(counts)
+            if total:
+                weight = self.scores[k] / total
+                for move, count in enumerate(counts):
+                    blend[move] += weight * count
+        if not any(blend):
+            return self.rng.randrange(n)
+        predicted = max(range(n), key=blend.__getitem__)
+        return self.rng.choice(self.rules.counters[predicted])
+
+    def update(self, move):
+        # Record the player's move for this round
+        n = self.n
+        decay = self.decay
+        for k, row in self._rows():
+            counts = self.counts[k]
+            current = counts[row:row + n]
+            if any(current):
+                guess = max(range(n), key=current.__getitem__)
+                self.scores[k] = self.scores[k] * decay + (guess == move)
+            for i, count in enumerate(current, row):
+                counts[i] = count * decay
+            counts[row + move] += 1
+        self.history = (self.history * n + move) % n ** self.max_order
+        self.seen += 1
+
+@register("frequency")
+class FrequencyBot:
+    """Counters the other side's most frequent move so far."""
+
+    def __init__(self, rng=None, rules=CLASSIC):
+        self.rng = rng or random.Random()
+        self.rules = rules
+        self.counts = [0] * rules.size
+
+    def choose(self):
+        counts = self.counts
+        top = max(counts)
+        if not top:
+            return self.rng.randrange(self.rules.size)
+        return self.rng.choice(self.rules.counters[counts.index(top)])
+
+    def update(self, move):
+        self.counts[move] += 1
+
+@register("cycle")
+class CycleBot:
+    """Plays every weapon in turn (rock, paper, scissors, rock, ...) from a random start."""
+
+    def __init__(self, rng=None, rules=CLASSIC):
+        self.rules = rules
+        self.move = (rng or random.Random()).randrange(rules.size)
+
+    def choose(self):
+        move = self.move
+        self.move = (move + 1) % self.rules.size
+        return move
+
+    def update(self, move):
+        pass
+
+@register("wsls")
+class WinStayLoseShiftBot:
+    """Win-stay, lose-shift: repeats a move that won, otherwise moves on to the next weapon.
+
+    A tie counts as a loss. The outcome comes from the bot's own last
+    choice and the move passed to update().
+    """
+
+    def __init__(self, rng=None, rules=CLASSIC):
+        self.rules = rules
+        self.move = (rng or random.Random()).randrange(rules.size)
+
+    def choose(self):
+        return self.move
+
+    def update(self, move):
+        if self.rules.outcome(self.move, move) != WIN:
+            self.move = (self.move + 1) % self.rules.size
+
+@register("pattern")
+class PatternBot:
+    """Plays against what the other side did the last time the game looked like this.
+
+    The last k rounds, both moves of each, form a context read as a base-N^2
+    number. For every k = 1..max_order a flat bytearray maps each context to
+    the move that followed it most recently (UNSEEN if none has). choose()
+    takes the longest context seen before and counters its move. Memory is
+    fixed, N^(2k) bytes per order (about 7 KB for classic rules at the
+    default order), and both calls do at most max_order lookups. max_order
+    is cut to the longest context whose table fits in ``budget`` bytes
+    (at the default budget: 3 for RPSLS, 1 for 101 weapons; from 255
+    weapons on, where move codes no longer fit a byte, the bot plays at
+    random).
+    """
+
+    UNSEEN = 255
+
+    def __init__(self, max_order=4, rng=None, rules=CLASSIC, budget=PATTERN_BYTES):
+        n = self.n = rules.size
+        max_order = self.max_order = bounded_order(n * n, max_order, budget) if n < self.UNSEEN else 0
+        self.rng = rng or random.Random()
+        self.rules = rules
+        self.sizes = [(n * n) ** k for k in range(max_order + 1)]
+        self.next = [bytearray([self.UNSEEN]) * size for size in self.sizes]
+        self.history = 0  # last max_order rounds, own move * N + theirs, newest lowest
+        self.seen = 0
+        self.move = 0  # own last choice
+
+    def choose(self):
+        history = self.history
+        for k in range(min(self.seen, self.max_order), 0, -1):
+            predicted = self.next[k][history % self.sizes[k]]
+            if predicted != self.UNSEEN:
+                self.move = self.rng.choice(self.rules.counters[predicted])
+                return self.move
+        self.move = self.rng.randrange(self.n)
+        return self.move
+
+    def update(self, move):
+        history = self.history
+        for k in range(1, min(self.seen, self.max_order) + 1):
+            self.next[k][history % self.sizes[k]] = move
+        self.history = (history * self.n * self.n + self.move * self.n + move) % self.sizes[self.max_order]
+        self.seen += 1
+
+def play_match(first, second, rounds, rules=CLASSIC):
+    """Play two strategies against each other for a number of rounds.
+
+    Each sees the other's move after every round. Returns the
+    (wins, ties, losses) counts from first's side.
+    """
+    table = rules.table
+    n = rules.size
+    first_choose, first_update = first.choose, first.update
+    second_choose, second_update = second.choose, second.update
+    counts = [0, 0, 0]
+    for _ in range(rounds):
+        a = first_choose()
+        b = second_choose()
+        first_update(b)
+        second_update(a)
+        counts[table[a * n + b]] += 1
+    return counts[WIN], counts[TIE], counts[LOSS]
+
+def play_stream(lines, out, opponent, rules=CLASSIC, fmt="text"):
+    """Play one round per input line and write each result as it happens.
+
+    A line is the player's move, or the player's and the opponent's moves
+    (a recorded match) separated by whitespace or a comma. The opponent
+    chooses only when its move is missing, but sees every player move.
+    Output is one line per round: tab-separated text, or JSON lines with
+    fmt="jsonl". Blank lines are skipped; bad lines are counted and the
+    first few reported on stderr. Memory stays constant however long the
+    stream is.
+    """
+    codes = rules.codes
+    table = rules.table
+    n = rules.size
+    write = out.write
+    counts = [0, 0, 0]
+    rounds = invalid = 0
+    for number, line in enumerate(lines, 1):
+        fields = line.replace(",", " ").lower().split()
+        if not fields:
+            continue
+        user = codes.get(fields[0])
+        computer = codes.get(fields[1]) if len(fields) == 2 else None
+        if user is None or len(fields) > 2 or (len(fields) == 2 and computer is None):
+            invalid += 1
+            if invalid <= MAX_REPORTED_INVALID:
+                print(f"line {number}: invalid round {line.strip()!r}", file=sys.stderr)
+            continue
+        if computer is None:
+            computer = opponent.choose()
+        opponent.update(user)
+        outcome = table[user * n + computer]
+        counts[outcome] += 1
+        rounds += 1
+        if fmt == "jsonl":
+            write(json.dumps({"round": rounds, "user": rules.weapons[user],
+                              "computer": rules.weapons[computer],
+                              "result": RESULT_NAMES[outcome]}) + "\n")
+        else:
+            write(f"{rounds}\t{rules.weapons[user]}\t{rules.weapons[computer]}\t{RESULT_NAMES[outcome]}\n")
+    if invalid > MAX_REPORTED_INVALID:
+        print(f"... {invalid - MAX_REPORTED_INVALID} more invalid lines", file=sys.stderr)
+    return StreamSummary(rounds, counts[WIN], counts[TIE], counts[LOSS], invalid)
+
+def print_summary(summary, file=sys.stderr):
+    rounds = summary.rounds or 1
+    print(f"{summary.rounds} rounds: {summary.wins} wins ({summary.wins / rounds:.1%}), "
+          f"{summary.ties} ties ({summary.ties / rounds:.1%}), "
+          f"{summary.losses} losses ({summary.losses / rounds:.1%}), "
+          f"{summary.invalid} invalid lines", file=file)
+
+def run_stream(source, destination, opponent_name, rules, fmt, seed=None):
+    # source/destination are paths, "-" for stdin/stdout
+    opponent = OPPONENTS[opponent_name](rng=random.Random(seed), rules=rules)
+    infile = sys.stdin if source == "-" else open(source)
+    outfile = sys.stdout if destination == "-" else open(destination, "w", buffering=1 << 16)
+    try:
+        summary = play_stream(infile, outfile, opponent, rules, fmt)
+        outfile.flush()
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    print_summary(summary)
+    return summary
+
+def player_streams(rounds, rng, rules=CLASSIC):
+    # Move streams for benchmarking bots: name -> list of move codes
+    n = rules.size
+    return {
+        "random": [rng.randrange(n) for _ in range(rounds)],
+        "biased": rng.choices(range(n), weights=(5, 3, 2) + (1,) * (n - 3), k=rounds),
+        "cycle": [i % n for i in range(rounds)],
+        "sticky": [rng.randrange(n) if rng.random() < 0.2 else i // 7 % n for i in range(rounds)],
+    }
+
+def benchmark_bot(rounds, seed=None, rules=CLASSIC):
+    rng = random.Random(seed)
+    for name, stream in player_streams(rounds, rng, rules).items():
+        bot = PredictiveBot(rng=random.Random(rng.random()), rules=rules)
+        bot_moves = []
+        started = time.perf_counter()
+        for move in stream:
+            bot_moves.append(bot.choose())
+            bot.update(move)
+        elapsed = time.perf_counter() - started
+        result = play_rounds(bot_moves, stream, rules)
+        print(f"{name:>7}: bot wins {result.wins / rounds:6.1%}, ties {result.ties / rounds:6.1%}, "
+              f"losses {result.losses / rounds:6.1%}  ({elapsed / rounds * 1e6:.1f} us/round)")
+    print(f"state per player: {PredictiveBot(rules=rules).nbytes} bytes")
+
+def play_game(rules=CLASSIC):
     print("Welcome to Rock, Paper, Scissors!")
-    user_choice = get_user_choice()
-    computer_choice = get_computer_choice()
+    user_choice = get_user_choice(rules)
+    computer_choice = get_computer_choice(rules=rules)
     print(f"You chose: {user_choice}")
     print(f"Computer Bot chose: {computer_choice}")
-    result = determine_winner(user_choice, computer_choice)
+    result = determine_winner(user_choice, computer_choice, rules)
     print(result)
 
+def resolve_rules(name_or_path):
+    # A built-in rule set by name, else a JSON rule file
+    if name_or_path in RULE_SETS:
+        return RULE_SETS[name_or_path]
+    return load_rules(name_or_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rock, Paper, Scissors")
+    parser.add_argument("--simulate", type=int, metavar="ROUNDS",
+                        help="play ROUNDS random rounds in one batch and print the totals")
+    parser.add_argument("--benchmark-bot", type=int, metavar="ROUNDS",
+                        help="report the predictive bot's win rate against sample players")
+    parser.add_argument("--stream", nargs="?", const="-", metavar="FILE",
+                        help="play one round per line of FILE (default: stdin), no prompts")
+    parser.add_argument("--opponent", choices=sorted(OPPONENTS), default="random",
+                        help="opponent for --stream")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text",
+                        help="--stream output format")
+    parser.add_argument("--output", default="-", help="--stream output file (default: stdout)")
+    parser.add_argument("--rules", default="classic",
+                        help=f"variant: {', '.join(RULE_SETS)} or a JSON rule file")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        rules = resolve_rules(args.rules)
+    except (OSError, ValueError) as e:
+        parser.error(f"--rules: {e}")
+
+    if args.stream is not None:
+        try:
+            run_stream(args.stream, args.output, args.opponent, rules, args.format, args.seed)
+        except BrokenPipeError:
+            # Reader went away (e.g. piped into head); nothing left to say
+            sys.stderr.close()
+        return
+    if args.benchmark_bot is not None:
+        benchmark_bot(args.benchmark_bot, args.seed, rules)
+        return
+    if args.simulate is None:
+        play_game(rules)
+        return
+    result = simulate(args.simulate, args.seed, rules)
+    print(f"{args.simulate} rounds: {result.wins} wins, {result.ties} ties, {result.losses} losses")
+
 if __name__ == "__main__":
-    play_game()
\ No newline at end of file
+    main()
\ No newline at end of file
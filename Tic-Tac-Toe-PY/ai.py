@@ -0,0 +1,326 @@
+"""Computer players behind one interface.
+
+    job = engine.choose_move(state, budget_ms, on_move)
+
+returns a Job at once and later calls on_move(index) (None when there is
+no legal move). Nothing is awaited, and job.cancel() drops the answer, so
+a move can never land on a board that "New Game" or "Back" has replaced.
+
+InstantEngine   answers before returning: the solved table on 3x3
+                (solver.py), the one-ply threat scan on bigger boards
+                (board.choose_move). No delay, budget unused.
+AnytimeEngine   iterative-deepening alpha-beta over board.candidate_moves,
+                run in short slices on a clock.Scheduler so the page keeps
+                drawing; at the deadline it plays the best move of the
+                deepest finished iteration.
+WorkerEngine    the same search in a Web Worker (ai_worker.js), answered
+                by the main-thread engine until the worker has loaded,
+                and for any request the worker fails on.
+
+The 3x3 table is already perfect play, so every engine answers a 3x3
+position instantly. Ultimate Tic-Tac-Toe positions get ultimate.Search,
+the bitboard search with a transposition table, through the same engines.
+
+    python ai.py    # depth and nodes/s reached for a few budgets
+"""
+import itertools
+import json
+import random
+import time
+
+import board
+import engine
+import solver
+import ultimate
+
+BUDGET_MS = 300
+SLICE_MS = 8  # Main-thread search time per slice, between frames
+WIDTH = 10  # Candidate moves searched per node, best-looking first
+MAX_DEPTH = 12
+WIN = 1 << 50
+INFINITY = 1 << 60
+
+
+def now_ms():
+    return time.perf_counter() * 1000
+
+
+class Job:
+    """One choose_move() call: cancel() drops its answer."""
+
+    __slots__ = ("on_move", "cancelled", "done")
+
+    def __init__(self, on_move):
+        self.on_move = on_move
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def deliver(self, move):
+        if not self.done and not self.cancelled:
+            self.done = True
+            self.on_move(move)
+
+
+def instant_move(state, rng=random):
+    # What the page always played: table lookup on 3x3, one-ply scan above
+    position = state.position
+    if isinstance(position, engine.Position):
+        return solver.choose_move(position.x_mask, position.o_mask, state.difficulty, rng)
+    if isinstance(position, ultimate.UltimateBoard):
+        return ultimate.choose_move(position, rng)
+    return board.choose_move(position, rng=rng)
+
+def new_search(position):
+    # The search that fits the position (both have best, depth, nodes and step())
+    if isinstance(position, ultimate.UltimateBoard):
+        return ultimate.Search(position)
+    return Search(position)
+
+
+# --- Search ---
+def ordered_moves(position, width=WIDTH):
+    # Candidates by the one-ply score (own threat twice, block once), best first
+    me = position.turn
+    opponent = board.O if me == board.X else board.X
+    scored = []
+    for index in board.candidate_moves(position):
+        attack = board.run_score(position, index, me)
+        if attack >= 1 << 40:
+            return [index]  # Wins on the spot
+        scored.append((attack * 2 + board.run_score(position, index, opponent), index))
+    scored.sort(reverse=True)
+    return [index for _, index in scored[:width]]
+
+def evaluate(position, width=WIDTH):
+    # Side to move's view: its best threat against the opponent's best
+    me = position.turn
+    opponent = board.O if me == board.X else board.X
+    mine = theirs = 0
+    for index in board.candidate_moves(position, limit=width):
+        mine = max(mine, board.run_score(position, index, me))
+        theirs = max(theirs, board.run_score(position, index, opponent))
+    if mine >= 1 << 40:
+        return WIN // 2  # Wins next move
+    return mine - theirs // 2
+
+
+class Search:
+    """Iterative-deepening alpha-beta on a copy of a board, run in steps.
+
+    ``best`` is always playable: the one-ply pick until the first
+    iteration finishes, then the deepest finished iteration's move.
+    """
+
+    def __init__(self, position, width=WIDTH, max_depth=MAX_DEPTH):
+        self.board = board.Board(position.size, position.win_length)
+        for index in position.moves:
+            self.board.make(index)
+        self.width = width
+        self.max_depth = min(max_depth, len(self.board.empty))
+        self.best = None if self.board.result() else board.choose_move(self.board)
+        self.depth = 0
+        self.nodes = 0
+        self._steps = self._iterate()
+
+    def step(self, until_ms):
+        # Search until until_ms (now_ms() clock); True once there is nothing left to search
+        if self._steps is None:
+            return True
+        for _ in self._steps:
+            if now_ms() >= until_ms:
+                return False
+        self._steps = None
+        return True
+
+    def _iterate(self):
+        if self.best is None:
+            return
+        moves = ordered_moves(self.board, self.width)
+        for depth in range(1, self.max_depth + 1):
+            best_score = alpha = -INFINITY
+            best = moves[0]
+            for index in moves:
+                self.board.make(index)
+                score = -(yield from self._negamax(depth - 1, -INFINITY, -alpha))
+                self.board.undo()
+                if score > best_score:
+                    best_score, best = score, index
+                    alpha = max(alpha, score)
+            self.best, self.depth = best, depth
+            if abs(best_score) >= WIN // 2:
+                return  # Forced result: deeper search can't change the move
+            # Try the last iteration's best first: more cutoffs next time round
+            moves.remove(best)
+            moves.insert(0, best)
+
+    def _negamax(self, depth, alpha, beta):
+        position = self.board
+        self.nodes += 1
+        if not self.nodes & 15:
+            yield
+        if position.winner is not None:
+            return -WIN - depth  # The last move won; sooner is worse for us
+        if not position.empty:
+            return 0
+        if depth == 0:
+            return evaluate(position, self.width)
+        best = -INFINITY
+        for index in ordered_moves(position, self.width):
+            position.make(index)
+            score = -(yield from self._negamax(depth - 1, -beta, -alpha))
+            position.undo()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+
+# --- Engines ---
+class InstantEngine:
+    def __init__(self, rng=random):
+        self.rng = rng
+
+    def choose_move(self, state, budget_ms, on_move):
+        job = Job(on_move)
+        job.deliver(instant_move(state, self.rng))
+        return job
+
+
+class AnytimeEngine:
+    def __init__(self, scheduler, slice_ms=SLICE_MS, rng=random):
+        self.scheduler = scheduler  # clock.Scheduler, or anything with call_later(ms, callback)
+        self.slice_ms = slice_ms
+        self.rng = rng
+
+    def choose_move(self, state, budget_ms, on_move):
+        job = Job(on_move)
+        if isinstance(state.position, engine.Position):
+            job.deliver(instant_move(state, self.rng))
+            return job
+        search = new_search(state.position)
+        deadline = now_ms() + budget_ms
+
+        def step():
+            if job.cancelled:
+                return
+            finished = search.step(min(deadline, now_ms() + self.slice_ms))
+            if finished or now_ms() >= deadline:
+                job.deliver(search.best)
+            else:
+                # Let the page draw and take input before the next slice
+                self.scheduler.call_later(0, step)
+
+        self.scheduler.call_later(0, step)
+        return job
+
+
+class WorkerEngine:
+    """Search in ai_worker.js; ``fallback`` answers until the worker is ready."""
+
+    def __init__(self, fallback, url="ai_worker.js"):
+        import js
+
+        from metrics import create_proxy
+        self.fallback = fallback
+        self.jobs = {}  # request id -> (Job, state, budget_ms); a cancelled search's answer is dropped
+        self.ids = itertools.count(1)
+        self.ready = False
+        self._proxy = create_proxy(self._on_message)
+        self.worker = js.Worker.new(url)
+        self.worker.addEventListener("message", self._proxy)
+
+    @staticmethod
+    def available():
+        try:
+            import js
+        except ImportError:
+            return False
+        return hasattr(js, "Worker")
+
+    def choose_move(self, state, budget_ms, on_move):
+        position = state.position
+        if not self.ready or isinstance(position, engine.Position):
+            return self.fallback.choose_move(state, budget_ms, on_move)
+        job = Job(on_move)
+        request_id = next(self.ids)
+        self.jobs[request_id] = (job, state, budget_ms)
+        # The worker can't hear about a cancel mid-search; the budget bounds it
+        self.worker.postMessage(json.dumps({
+            "id": request_id, "size": position.size, "win_length": position.win_length,
+            "moves": position.moves, "budget_ms": budget_ms}))
+        return job
+
+    def _on_message(self, event):
+        answer = json.loads(event.data)
+        if answer.get("ready"):
+            self.ready = True
+            return
+        request = self.jobs.pop(answer.get("id"), None)
+        if "error" in answer:
+            import js
+
+            js.console.error(f"AI worker: {answer['error']}")
+            if request is None:
+                self.ready = False  # The worker failed to start
+                return
+            job, state, budget_ms = request
+            if not job.cancelled:
+                # This search failed in the worker: the main-thread engine answers instead
+                self.fallback.choose_move(state, budget_ms, job.deliver)
+        elif request is not None:
+            request[0].deliver(answer["move"])
+
+    def destroy(self):
+        from metrics import destroy_proxy
+
+        self.worker.terminate()
+        destroy_proxy(self._proxy)
+
+
+def make_engine(name, scheduler):
+    # "instant", "anytime" or "worker" (anytime where Web Workers are missing)
+    if name == "instant":
+        return InstantEngine()
+    anytime = AnytimeEngine(scheduler)
+    if name == "worker" and WorkerEngine.available():
+        return WorkerEngine(anytime)
+    return anytime
+
+
+def search_request(text):
+    # ai_worker.js entry point: one JSON request in, one JSON answer out
+    request = json.loads(text)
+    if (request["size"], request["win_length"]) == ultimate.DIMENSIONS:
+        position = ultimate.UltimateBoard()
+    else:
+        position = board.Board(request["size"], request["win_length"])
+    for index in request["moves"]:
+        position.make(index)
+    search = new_search(position)
+    search.step(now_ms() + request["budget_ms"])
+    return json.dumps({"id": request["id"], "move": search.best, "depth": search.depth, "nodes": search.nodes})
+
+
+def _benchmark(seed=0):
+    # Depth and search speed for a few budgets, on CPython
+    rng = random.Random(seed)
+    for size, win_length in ((7, 5), (15, 5)):
+        position = board.Board(size, win_length)
+        for _ in range(6):
+            position.make(board.choose_move(position, rng=rng))
+        for budget in (50, 300, 1000):
+            search = Search(position)
+            start = now_ms()
+            search.step(start + budget)
+            seconds = (now_ms() - start) / 1000
+            print(f"{size}x{size} k={win_length}, {budget:4d} ms: depth {search.depth}, "
+                  f"{search.nodes:,} nodes, {search.nodes / seconds:,.0f} nodes/s, move {search.best}")
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,36 @@
+// Web Worker for ai.WorkerEngine: runs ai.search_request() away from the
+// page's main thread, so a long search never holds up drawing or input.
+// Requests queue while a search runs and are answered in order. A search
+// that fails is answered with {id, error}, so the page can fall back.
+
+importScripts("https://cdn.jsdelivr.net/pyodide/v0.23.4/full/pyodide.js");
+
+const AI_MODULES = ["ai.py", "board.py", "engine.py", "solver.py", "ultimate.py"];
+
+async function start() {
+    const [pyodide, files] = await Promise.all([
+        loadPyodide(),
+        Promise.all(AI_MODULES.map(
+            name => fetch(name).then(response => response.text()).then(text => [name, text]))),
+    ]);
+    for (const [name, text] of files) {
+        pyodide.FS.writeFile(name, text);
+    }
+    const searchRequest = pyodide.pyimport("ai").search_request;
+    self.onmessage = event => {
+        let answer;
+        try {
+            answer = searchRequest(event.data);
+        } catch (error) {
+            let id = null;
+            try {
+                id = JSON.parse(event.data).id;
+            } catch (ignored) {}
+            answer = JSON.stringify({ id, error: String(error) });
+        }
+        self.postMessage(answer);
+    };
+    self.postMessage(JSON.stringify({ ready: true }));
+}
+
+start().catch(error => self.postMessage(JSON.stringify({ error: String(error) })));
@@ -0,0 +1,224 @@
+"""N x N, k-in-a-row board with incremental bookkeeping.
+
+Placing a stone only looks at the four lines through that cell, and the
+list of empty cells is kept up to date with swap-removal, so a move costs
+the same on a 3x3 board as on 15x15. ``Board`` speaks the same small API
+as ``engine.Position`` (``place``, ``is_empty``, ``cell``, ``winning_line``,
+``is_full``, ``empty_cells``, ``clear``) so the UI can use either one.
+"""
+import random
+
+EMPTY = 0
+X = 1
+O = 2
+SYMBOLS = ("", "X", "O")
+SIDES = {"X": X, "O": O}
+
+# Row/column steps for horizontal, vertical and the two diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# Preset sizes offered in the UI: (board size, win length)
+PRESETS = {
+    "3-3": (3, 3),
+    "5-4": (5, 4),
+    "7-5": (7, 5),
+    "15-5": (15, 5),
+    "ultimate": (9, 3),  # Nine 3x3 boards in one (ultimate.py), not 3 in a row on 9x9
+}
+
+
+class Board:
+    __slots__ = ("size", "win_length", "cells", "empty", "_slot", "moves",
+                 "winner", "win_line")
+
+    def __init__(self, size=3, win_length=3):
+        if size < 1 or not 1 <= win_length <= size:
+            raise ValueError(f"Invalid board: {size}x{size}, {win_length} in a row")
+        self.size = size
+        self.win_length = win_length
+        self.cells = bytearray(size * size)
+        self.empty = list(range(size * size))
+        self._slot = list(range(size * size))
+        self.moves = []
+        self.winner = None
+        self.win_line = None
+
+    def clear(self):
+        count = self.size * self.size
+        self.cells = bytearray(count)
+        self.empty = list(range(count))
+        self._slot = list(range(count))
+        self.moves = []
+        self.winner = None
+        self.win_line = None
+
+    # --- Queries ---
+    @property
+    def turn(self):
+        return X if len(self.moves) % 2 == 0 else O
+
+    @property
+    def current_player(self):
+        return SYMBOLS[self.turn]
+
+    def is_empty(self, index):
+        return self.cells[index] == EMPTY
+
+    def cell(self, index):
+        return SYMBOLS[self.cells[index]]
+
+    def empty_cells(self):
+        return list(self.empty)
+
+    def move_count(self):
+        return len(self.moves)
+
+    def is_full(self):
+        return not self.empty
+
+    def winning_line(self):
+        return self.win_line
+
+    def result(self):
+        if self.winner:
+            return self.winner
+        if not self.empty:
+            return "TIE"
+        return None
+
+    def line_through(self, index, side, dr, dc):
+        # Cells of side's unbroken run through index along (dr, dc)
+        size = self.size
+        cells = self.cells
+        row, col = divmod(index, size)
+        run = [index]
+        r, c = row + dr, col + dc
+        while 0 <= r < size and 0 <= c < size and cells[r * size + c] == side:
+            run.append(r * size + c)
+            r += dr
+            c += dc
+        r, c = row - dr, col - dc
+        while 0 <= r < size and 0 <= c < size and cells[r * size + c] == side:
+            run.insert(0, r * size + c)
+            r -= dr
+            c -= dc
+        return run
+
+    # --- Updates ---
+    def place(self, index, player):
+        # Put player's symbol on index; False when the cell is taken
+        if self.cells[index] != EMPTY:
+            return False
+        side = SIDES[player]
+        self.cells[index] = side
+        self._remove_empty(index)
+        self.moves.append(index)
+        if self.winner is None:
+            for dr, dc in DIRECTIONS:
+                run = self.line_through(index, side, dr, dc)
+                if len(run) >= self.win_length:
+                    self.winner = player
+                    self.win_line = run
+                    break
+        return True
+
+    def make(self, index):
+        self.place(index, SYMBOLS[self.turn])
+
+    def undo(self):
+        index = self.moves.pop()
+        self.cells[index] = EMPTY
+        self._slot[index] = len(self.empty)
+        self.empty.append(index)
+        if self.win_line is not None and index in self.win_line:
+            self.winner = None
+            self.win_line = None
+        return index
+
+    def unmake(self, index):
+        if self.moves and self.moves[-1] == index:
+            self.undo()
+
+    def _remove_empty(self, index):
+        slot = self._slot[index]
+        last = self.empty.pop()
+        if last != index:
+            self.empty[slot] = last
+            self._slot[last] = slot
+        self._slot[index] = -1
+
+    def __repr__(self):
+        rows = []
+        for r in range(self.size):
+            row = self.cells[r * self.size:(r + 1) * self.size]
+            rows.append("".join(SYMBOLS[v] or "." for v in row))
+        return f"Board({'/'.join(rows)}, k={self.win_length})"
+
+
+# --- Bounded-cost AI ---
+def run_score(board, index, side):
+    # How strongly side would own the lines through index if it played there
+    size = board.size
+    cells = board.cells
+    k = board.win_length
+    row, col = divmod(index, size)
+    total = 0
+    for dr, dc in DIRECTIONS:
+        length = 1
+        open_ends = 0
+        for step in (1, -1):
+            r, c = row + dr * step, col + dc * step
+            while 0 <= r < size and 0 <= c < size and cells[r * size + c] == side:
+                length += 1
+                r += dr * step
+                c += dc * step
+            if 0 <= r < size and 0 <= c < size and cells[r * size + c] == EMPTY:
+                open_ends += 1
+        if length >= k:
+            return 1 << 40
+        if open_ends:
+            total += 10 ** min(length, 9) * open_ends
+    return total
+
+def candidate_moves(board, radius=1, limit=None):
+    # Empty cells near existing stones; the center on an empty board
+    size = board.size
+    if not board.moves:
+        return [(size // 2) * size + size // 2]
+    seen = set()
+    out = []
+    for index in reversed(board.moves):
+        row, col = divmod(index, size)
+        for r in range(max(0, row - radius), min(size, row + radius + 1)):
+            for c in range(max(0, col - radius), min(size, col + radius + 1)):
+                i = r * size + c
+                if i not in seen and board.cells[i] == EMPTY:
+                    seen.add(i)
+                    out.append(i)
+        if limit is not None and len(out) >= limit:
+            break
+    return out or board.empty_cells()
+
+def choose_move(board, max_candidates=64, rng=random):
+    """Pick a move for the side to move with a bounded one-ply evaluation.
+
+    Only cells next to recent stones are scored (at most ``max_candidates``),
+    each in O(win_length), so the cost does not grow with the board.
+    """
+    if board.result() is not None:
+        return None
+    me = board.turn
+    opponent = O if me == X else X
+    best_score = -1
+    best = []
+    for index in candidate_moves(board, limit=max_candidates):
+        attack = run_score(board, index, me)
+        defence = run_score(board, index, opponent)
+        # Finishing our own line beats blocking theirs
+        score = attack * 2 + defence if attack < 1 << 40 else 1 << 42
+        if score > best_score:
+            best_score = score
+            best = [index]
+        elif score == best_score:
+            best.append(index)
+    return rng.choice(best)
@@ -0,0 +1,125 @@
+"""Timers for the page (runs under Pyodide) without a proxy per callback.
+
+Scheduler keeps its callbacks in a Python heap and drives them all from
+one JS timeout through one long-lived proxy, so scheduling costs nothing
+on the JS side and nothing is left to leak. TurnClock counts down to an
+absolute deadline on performance.now(): a throttled background tab that
+fires late still shows the right time and expires on schedule. Online,
+the deadline comes from the server. A callback that raises is logged to
+the console; the callbacks after it still run.
+"""
+import heapq
+import itertools
+import math
+import traceback
+
+import js
+
+from metrics import create_proxy, destroy_proxy
+
+
+def now_ms():
+    return js.performance.now()
+
+
+class Scheduler:
+    def __init__(self):
+        self.queue = []  # [due_ms, order, callback]; callback None once cancelled
+        self.order = itertools.count()
+        self.handle = None
+        self.armed_for = None
+        self._proxy = create_proxy(self._fire)
+
+    def call_later(self, delay_ms, callback):
+        # Run callback() after delay_ms; returns a token for cancel()
+        entry = [now_ms() + delay_ms, next(self.order), callback]
+        heapq.heappush(self.queue, entry)
+        self._arm()
+        return entry
+
+    def cancel(self, entry):
+        if entry is not None:
+            entry[2] = None
+
+    def clear(self):
+        self.queue.clear()
+        self._disarm()
+
+    def destroy(self):
+        self.clear()
+        destroy_proxy(self._proxy)
+        self._proxy = None
+
+    def _arm(self):
+        while self.queue and self.queue[0][2] is None:
+            heapq.heappop(self.queue)
+        if not self.queue:
+            self._disarm()
+            return
+        due = self.queue[0][0]
+        if self.handle is not None and self.armed_for <= due:
+            return
+        self._disarm()
+        self.armed_for = due
+        self.handle = js.setTimeout(self._proxy, max(0, due - now_ms()))
+
+    def _disarm(self):
+        if self.handle is not None:
+            js.clearTimeout(self.handle)
+            self.handle = None
+            self.armed_for = None
+
+    def _fire(self):
+        self.handle = None
+        self.armed_for = None
+        current = now_ms()
+        try:
+            while self.queue and self.queue[0][0] <= current:
+                _, _, callback = heapq.heappop(self.queue)
+                if callback is not None:
+                    try:
+                        callback()
+                    except Exception:
+                        js.console.error(f"Timer callback failed:\n{traceback.format_exc()}")
+        finally:
+            self._arm()
+
+
+class TurnClock:
+    """Countdown to an absolute deadline, ticking on whole seconds."""
+
+    def __init__(self, scheduler, on_tick, on_expire):
+        self.scheduler = scheduler
+        self.on_tick = on_tick
+        self.on_expire = on_expire
+        self.deadline = None
+        self.pending = None
+
+    @property
+    def running(self):
+        return self.deadline is not None
+
+    def start(self, seconds=None, deadline=None):
+        # Give either a duration or an absolute deadline (performance.now() ms)
+        self.stop()
+        self.deadline = deadline if deadline is not None else now_ms() + seconds * 1000
+        self._tick()
+
+    def stop(self):
+        self.scheduler.cancel(self.pending)
+        self.pending = None
+        self.deadline = None
+
+    def remaining_ms(self):
+        return max(0.0, self.deadline - now_ms()) if self.running else 0.0
+
+    def _tick(self):
+        self.pending = None
+        left = self.remaining_ms()
+        if left <= 0:
+            self.deadline = None
+            self.on_expire()
+            return
+        self.on_tick(math.ceil(left / 1000))
+        # Wake at the next whole-second boundary of the countdown
+        self.pending = self.scheduler.call_later(left % 1000 or 1000, self._tick)
@@ -0,0 +1,166 @@
+"""Browser-side WebSocket connection manager (runs under Pyodide).
+
+- open() resolves on the socket's onopen / onerror / onclose events
+  instead of polling readyState.
+- send() queues messages while the socket is down and flushes them, in
+  order, once it is back.
+- An unexpected close reconnects with jittered exponential backoff, so a
+  room full of players who lost the same Wi-Fi don't come back in
+  lockstep. ``on_open(reconnected)`` runs before the queue is flushed,
+  which is where the page sends its ``resume`` message. A drop starts
+  the retries and each failed attempt schedules the next, so there is
+  only ever one attempt in flight; ``on_give_up`` runs once when the
+  retries run out.
+
+All JS callbacks are long-lived proxies created once per Connection and
+destroyed by close().
+"""
+import asyncio
+import random
+from collections import deque
+
+import js
+
+from metrics import create_proxy, destroy_proxy
+
+CONNECT_TIMEOUT = 10
+BACKOFF_BASE_MS = 500
+BACKOFF_CAP_MS = 15000
+MAX_RETRIES = 8
+MAX_QUEUED = 64
+
+
+class Connection:
+    def __init__(self, url_factory, on_message, on_open=None, on_down=None, on_give_up=None):
+        self.url_factory = url_factory
+        self.on_message = on_message
+        self.on_open = on_open
+        self.on_down = on_down
+        self.on_give_up = on_give_up
+        self.ws = None
+        self.queue = deque(maxlen=MAX_QUEUED)
+        self.attempt = 0
+        self.connected_once = False
+        self.closing = False
+        self.gave_up = False
+        self.retry_handle = None
+        self._opened = None
+        self._proxies = {
+            "open": create_proxy(self._handle_open),
+            "message": create_proxy(self._handle_message),
+            "close": create_proxy(self._handle_close),
+            "error": create_proxy(self._handle_error),
+            "retry": create_proxy(self._retry),
+        }
+
+    @property
+    def is_open(self):
+        return self.ws is not None and self.ws.readyState == 1
+
+    async def open(self):
+        # Connect (or return at once if already open); True on success
+        if self.is_open:
+            return True
+        self.closing = False
+        if self.ws is not None:
+            self._detach(self.ws)  # A socket still connecting or closing: its events are stale
+        self._opened = asyncio.get_event_loop().create_future()
+        ws = js.WebSocket.new(self.url_factory())
+        ws.binaryType = "arraybuffer"
+        ws.onopen = self._proxies["open"]
+        ws.onmessage = self._proxies["message"]
+        ws.onclose = self._proxies["close"]
+        ws.onerror = self._proxies["error"]
+        self.ws = ws
+        try:
+            return await asyncio.wait_for(self._opened, CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._detach(ws)
+            ws.close()
+            return False
+
+    def send(self, message):
+        if self.is_open:
+            self.ws.send(message)
+        else:
+            self.queue.append(message)
+
+    def send_now(self, message):
+        # Skip the queue (used for resume, which must go first)
+        if self.is_open:
+            self.ws.send(message)
+
+    def close(self):
+        # User-initiated: no reconnect, release the JS callbacks
+        self.closing = True
+        self.queue.clear()
+        if self.retry_handle is not None:
+            js.clearTimeout(self.retry_handle)
+            self.retry_handle = None
+        if self.ws is not None:
+            self._detach(self.ws)
+            self.ws.close()
+            self.ws = None
+        for proxy in self._proxies.values():
+            destroy_proxy(proxy)
+        self._proxies = {}
+
+    @staticmethod
+    def _detach(ws):
+        ws.onopen = ws.onmessage = ws.onclose = ws.onerror = None
+
+    # --- Socket events ---
+    def _handle_open(self, event=None):
+        reconnected = self.connected_once
+        self.connected_once = True
+        self.attempt = 0
+        self.gave_up = False
+        if self._opened is not None and not self._opened.done():
+            self._opened.set_result(True)
+        if self.on_open:
+            self.on_open(reconnected)
+        while self.queue and self.is_open:
+            self.ws.send(self.queue.popleft())
+
+    def _handle_message(self, event):
+        self.on_message(event)
+
+    def _handle_error(self, event=None):
+        js.console.error("WS Error")
+
+    def _handle_close(self, event=None):
+        if self._opened is not None and not self._opened.done():
+            # A connect attempt failed: open() returns False and its caller retries
+            self._opened.set_result(False)
+            return
+        if self.closing or not self.connected_once:
+            return
+        if self.on_down:
+            self.on_down()
+        self._schedule_retry()
+
+    # --- Reconnect ---
+    def backoff_ms(self):
+        # "Full jitter": uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(BACKOFF_CAP_MS, BACKOFF_BASE_MS * 2 ** self.attempt))
+
+    def _schedule_retry(self):
+        if self.retry_handle is not None or self.gave_up:
+            return
+        if self.attempt >= MAX_RETRIES:
+            self.gave_up = True
+            if self.on_give_up:
+                self.on_give_up()
+            return
+        delay = self.backoff_ms()
+        self.attempt += 1
+        self.retry_handle = js.setTimeout(self._proxies["retry"], delay)
+
+    def _retry(self):
+        self.retry_handle = None
+        if not self.closing:
+            asyncio.ensure_future(self._reopen())
+
+    async def _reopen(self):
+        if not await self.open() and not self.closing:
+            self._schedule_retry()
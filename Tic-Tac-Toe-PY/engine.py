@@ -0,0 +1,187 @@
+"""DOM-free Tic-Tac-Toe engine.
+
+A position is two 9-bit integers, one per player. Bit ``i`` is set when
+that player owns cell ``i`` (cells numbered 0-8, row by row). Everything
+here is plain Python, so it runs the same in Pyodide and on CPython.
+"""
+
+# Winning combinations
+WINNING_CONDITIONS = [
+    [0, 1, 2], [3, 4, 5], [6, 7, 8],
+    [0, 3, 6], [1, 4, 7], [2, 5, 8],
+    [0, 4, 8], [2, 4, 6]
+]
+
+X = 0
+O = 1
+SYMBOLS = ("X", "O")
+SIDES = {"X": X, "O": O}
+
+FULL_MASK = 0x1FF
+LINE_MASKS = tuple(sum(1 << i for i in condition) for condition in WINNING_CONDITIONS)
+CELL_BITS = tuple(1 << i for i in range(9))
+
+# WIN_TABLE[mask] is 1 when the 9-bit mask contains a complete line.
+WIN_TABLE = bytes(
+    1 if any(mask & line == line for line in LINE_MASKS) else 0
+    for mask in range(FULL_MASK + 1)
+)
+
+
+# --- Mask Helpers ---
+def is_win(mask):
+    return WIN_TABLE[mask] == 1
+
+def winning_line(mask):
+    # Cells of the first complete line in mask, or None
+    if not WIN_TABLE[mask]:
+        return None
+    for condition, line in zip(WINNING_CONDITIONS, LINE_MASKS):
+        if mask & line == line:
+            return condition
+    return None
+
+def iter_bits(mask):
+    # Yield the index of every set bit, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def legal_moves(x_mask, o_mask):
+    return list(iter_bits(~(x_mask | o_mask) & FULL_MASK))
+
+def winning_move(own_mask, occupied):
+    # First empty cell that completes a line for own_mask, or None
+    empty = ~occupied & FULL_MASK
+    while empty:
+        low = empty & -empty
+        if WIN_TABLE[own_mask | low]:
+            return low.bit_length() - 1
+        empty ^= low
+    return None
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+class Position:
+    """Mutable board: ``masks[X]``/``masks[O]`` plus the side to move."""
+
+    __slots__ = ("masks", "turn")
+
+    def __init__(self, x_mask=0, o_mask=0, turn=None):
+        self.masks = [x_mask, o_mask]
+        if turn is None:
+            turn = X if popcount(x_mask) == popcount(o_mask) else O
+        self.turn = turn
+
+    @classmethod
+    def from_board(cls, board):
+        # Build from the old list-of-strings layout: ["X", "", "O", ...]
+        x_mask = o_mask = 0
+        for i, val in enumerate(board):
+            if val == "X":
+                x_mask |= CELL_BITS[i]
+            elif val == "O":
+                o_mask |= CELL_BITS[i]
+        return cls(x_mask, o_mask)
+
+    def copy(self):
+        return Position(self.masks[X], self.masks[O], self.turn)
+
+    def clear(self):
+        self.masks[X] = 0
+        self.masks[O] = 0
+        self.turn = X
+
+    # --- Queries ---
+    @property
+    def x_mask(self):
+        return self.masks[X]
+
+    @property
+    def o_mask(self):
+        return self.masks[O]
+
+    @property
+    def occupied(self):
+        return self.masks[X] | self.masks[O]
+
+    @property
+    def current_player(self):
+        return SYMBOLS[self.turn]
+
+    def is_empty(self, index):
+        return not (self.masks[X] | self.masks[O]) & CELL_BITS[index]
+
+    def cell(self, index):
+        bit = CELL_BITS[index]
+        if self.masks[X] & bit:
+            return "X"
+        if self.masks[O] & bit:
+            return "O"
+        return ""
+
+    def to_board(self):
+        return [self.cell(i) for i in range(9)]
+
+    def empty_cells(self):
+        return legal_moves(self.masks[X], self.masks[O])
+
+    def move_count(self):
+        return popcount(self.masks[X] | self.masks[O])
+
+    def is_full(self):
+        return (self.masks[X] | self.masks[O]) == FULL_MASK
+
+    def winner(self):
+        if WIN_TABLE[self.masks[X]]:
+            return "X"
+        if WIN_TABLE[self.masks[O]]:
+            return "O"
+        return None
+
+    def winning_line(self):
+        return winning_line(self.masks[X]) or winning_line(self.masks[O])
+
+    def result(self):
+        # 'X', 'O', 'TIE', or None while the game is still going
+        winner = self.winner()
+        if winner:
+            return winner
+        if self.is_full():
+            return "TIE"
+        return None
+
+    # --- Updates ---
+    def make(self, index):
+        # Play the side to move on index; no legality check
+        self.masks[self.turn] |= CELL_BITS[index]
+        self.turn ^= 1
+
+    def unmake(self, index):
+        self.turn ^= 1
+        self.masks[self.turn] &= ~CELL_BITS[index]
+
+    def place(self, index, player):
+        # Put a specific symbol on index (used when the server decides turns).
+        # Returns False when the cell is already taken.
+        bit = CELL_BITS[index]
+        if (self.masks[X] | self.masks[O]) & bit:
+            return False
+        side = SIDES[player]
+        self.masks[side] |= bit
+        self.turn = side ^ 1
+        return True
+
+    def __eq__(self, other):
+        return (isinstance(other, Position) and self.masks == other.masks
+                and self.turn == other.turn)
+
+    def __hash__(self):
+        return self.masks[X] | (self.masks[O] << 9) | (self.turn << 18)
+
+    def __repr__(self):
+        rows = ["".join(self.cell(r * 3 + c) or "." for c in range(3)) for r in range(3)]
+        return f"Position({'/'.join(rows)}, turn={SYMBOLS[self.turn]})"
@@ -0,0 +1,187 @@
+"""Game state and its transitions, without the DOM.
+
+GameState holds one whole game: board, turn, mode, scores and, online,
+the Session (room, resume token, server sequence numbers). The functions
+below are the only way the state changes. They return what happened and
+leave drawing to the caller, so main.py keeps the DOM side effects and
+a server or test process can run any number of games side by side.
+Everything is plain Python and runs the same in Pyodide and on CPython.
+
+Each game is also kept as a movelog.MoveLog, so undo, redo and a resync
+from the server replay moves instead of copying boards around.
+"""
+import board
+import engine
+import movelog
+import ultimate
+
+SINGLE = "single"
+LOCAL = "local"
+ONLINE = "online"
+
+# scores[SCORE_INDEX[key]] for key "X", "O" or "TIE"
+SCORE_INDEX = {"X": 0, "O": 1, "TIE": 2}
+
+
+class Session:
+    """Online seat: where we sit and how far the server has got."""
+
+    __slots__ = ("room_code", "token", "seq", "game_seq", "binary_moves", "pending_resync", "turn_deadline")
+
+    def __init__(self):
+        self.room_code = None
+        self.token = None  # Lets a reconnect resume our seat in the room
+        self.seq = 0  # Moves the server has confirmed in this room (see server.py)
+        self.game_seq = 0  # seq when the game on the board began
+        self.binary_moves = False  # True once the server agreed to protocol.ENCODING
+        self.pending_resync = None
+        self.turn_deadline = None  # performance.now() ms of the server's deadline, when it runs a clock
+
+
+class GameState:
+    __slots__ = ("mode", "size", "win_length", "position", "current_player", "active",
+                 "my_symbol", "my_turn", "difficulty", "scores", "session", "log")
+
+    def __init__(self, mode=None, size=3, win_length=3, difficulty="impossible"):
+        self.mode = mode  # SINGLE, LOCAL or ONLINE
+        self.size = size
+        self.win_length = win_length
+        self.position = new_position(size, win_length)
+        self.current_player = "X"
+        self.active = False
+        self.my_symbol = "X"
+        self.my_turn = False
+        self.difficulty = difficulty
+        self.scores = [0, 0, 0]
+        self.session = Session()
+        self.log = movelog.MoveLog()
+
+
+def new_position(size, win_length):
+    # The bitboard engine (and its solved AI) covers the classic game; 9x9 with 3 is Ultimate
+    if size == 3 and win_length == 3:
+        return engine.Position()
+    if (size, win_length) == ultimate.DIMENSIONS:
+        return ultimate.UltimateBoard()
+    return board.Board(size, win_length)
+
+
+# --- Transitions ---
+def configure(state, size, win_length):
+    # New board dimensions; False when they are already in place
+    if (size, win_length) == (state.size, state.win_length):
+        return False
+    state.size = size
+    state.win_length = win_length
+    state.position = new_position(size, win_length)
+    return True
+
+def reset(state):
+    # Empty board, X to move, game on
+    state.position.clear()
+    state.log.clear(state.session.game_seq)
+    state.current_player = "X"
+    state.active = True
+    state.my_turn = state.mode == ONLINE and state.my_symbol == "X"
+
+def apply_move(state, index, player):
+    # Put player's symbol on index; False when the cell is taken
+    if not state.position.place(index, player):
+        return False
+    state.log.append(index)
+    return True
+
+def undo(state):
+    # Take back the last move; its index, or None at the start of the game
+    index = state.log.undo()
+    if index is not None:
+        state.position.unmake(index)
+        switch_turn(state)
+    return index
+
+def redo(state):
+    # Play the last undone move again; its index, or None
+    index = state.log.redo()
+    if index is not None:
+        state.position.place(index, state.current_player)
+        switch_turn(state)
+    return index
+
+def set_turn(state, player):
+    state.current_player = player
+    state.my_turn = player == state.my_symbol
+
+def switch_turn(state):
+    set_turn(state, "O" if state.current_player == "X" else "X")
+
+def resolve(state):
+    """Settle a finished game: (winner, line) once the board decides it, else None.
+
+    winner is "X", "O" or "TIE" (line is None for a tie). The game stops
+    and the winner's score goes up.
+    """
+    line = state.position.winning_line()
+    if line:
+        winner = state.position.cell(line[0])
+    elif state.position.is_full():
+        winner = "TIE"
+    else:
+        return None
+    end(state, winner)
+    return winner, line
+
+def end(state, winner=None):
+    # Stop the game, scoring a point for winner ("X", "O", "TIE") if given
+    state.active = False
+    if winner:
+        add_point(state, winner)
+
+def add_point(state, key):
+    state.scores[SCORE_INDEX[key]] += 1
+
+def reset_scores(state):
+    state.scores = [0, 0, 0]
+
+def score(state, key):
+    return state.scores[SCORE_INDEX[key]]
+
+def load_moves(state, moves, base_seq=0):
+    # Rebuild the game from its move log; False if the moves don't fit the board
+    state.log = movelog.MoveLog(moves, base_seq)
+    if not movelog.replay(state.position, moves):
+        return False
+    set_turn(state, "O" if len(moves) % 2 else "X")
+    return True
+
+
+def _benchmark(games=10000, seed=0):
+    # Memory per live game and transitions per second, on CPython
+    import random
+    import time
+    import tracemalloc
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    states = [GameState(LOCAL) for _ in range(games)]
+    per_game = (tracemalloc.get_traced_memory()[0] - before) / games
+    tracemalloc.stop()
+
+    rng = random.Random(seed)
+    moves = 0
+    start = time.perf_counter()
+    for state in states:
+        reset(state)
+        while True:
+            apply_move(state, rng.choice(state.position.empty_cells()), state.current_player)
+            moves += 1
+            if resolve(state):
+                break
+            switch_turn(state)
+    seconds = time.perf_counter() - start
+    x, o, ties = (sum(state.scores[i] for state in states) for i in range(3))
+    print(f"{games} live games: {per_game:.0f} bytes each (state, session and board)")
+    print(f"played to the end in {seconds:.2f}s: {games / seconds:,.0f} games/s, "
+          f"{moves / seconds:,.0f} moves/s (X {x}, O {o}, ties {ties})")
+
+if __name__ == "__main__":
+    _benchmark()
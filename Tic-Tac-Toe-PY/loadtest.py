@@ -0,0 +1,282 @@
+"""Load generator for the online protocol.
+
+Opens ``--pairs`` simulated player pairs over real WebSockets. Each pair
+creates and joins a room, plays ``--games`` full games with random moves,
+and with probability ``--disconnect`` per game the waiting side's socket
+drops mid-game: the mover plays on, then the dropped side reconnects, sends
+``resume`` and must get the missed move replayed before the game continues.
+
+    python loadtest.py --pairs 2000 --games 5
+    python loadtest.py --host 127.0.0.1 --port 8080 --pairs 500
+    python loadtest.py --pairs 2000 --binary    # bin1 move encoding
+
+Without ``--host`` a local server.GameServer is started in a child process
+as the stand-in. Reports rooms/s for setup, games/s and moves/s for play,
+the game_move -> turn_switch round trip as percentiles, and (local stand-in
+only) server heap per live room, measured with tracemalloc around the
+setup phase.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+import time
+import tracemalloc
+
+import engine
+import protocol
+import server
+import wsframe
+
+# Message types that end a mover's wait after sending game_move
+TURN_DONE = ("turn_switch", "game_win", "game_tie", "game_timeout")
+
+
+class Stats:
+    def __init__(self):
+        self.rooms = 0
+        self.games = 0
+        self.moves = 0
+        self.drops = 0
+        self.errors = 0
+        self.rtt = []
+        self.bytes_sent = 0
+
+
+def message(msg_type, data):
+    return json.dumps({"type": msg_type, "data": data}, separators=(",", ":"))
+
+async def receive(ws, *wanted):
+    # Next message of one of the wanted types; other types are skipped
+    while True:
+        raw = await ws.recv()
+        if raw is None:
+            raise ConnectionError("Server closed the connection")
+        if isinstance(raw, bytes):
+            msg_type, data = protocol.decode(raw)
+        else:
+            msg = json.loads(raw)
+            msg_type, data = msg["type"], msg["data"]
+        if msg_type in wanted:
+            return msg_type, data
+        if msg_type == "error":
+            raise RuntimeError(data.get("message"))
+
+
+class Pair:
+    __slots__ = ("x", "o", "code", "binary", "sessions", "seq")
+
+    def __init__(self, binary=False):
+        self.x = None
+        self.o = None
+        self.code = None
+        self.binary = binary
+        self.sessions = [None, None]
+        self.seq = 0
+
+    async def connect(self, host, port):
+        if not self.binary:
+            return await wsframe.connect(host, port)
+        ws = await wsframe.connect(host, port, f"/?enc={protocol.ENCODING}")
+        await receive(ws, "hello")
+        return ws
+
+    async def setup(self, host, port):
+        self.x = await self.connect(host, port)
+        self.x.send(message("create_room", {}))
+        _, data = await receive(self.x, "room_created")
+        self.code = data["code"]
+        self.sessions[engine.X] = data["session"]
+        self.o = await self.connect(host, port)
+        self.o.send(message("join_room", {"code": self.code}))
+        _, data = await receive(self.o, "room_joined")
+        self.sessions[engine.O] = data["session"]
+        await receive(self.x, "opponent_joined")
+
+    async def resume(self, side, since, host, port):
+        ws = await self.connect(host, port)
+        ws.send(message("resume", {"code": self.code, "session": self.sessions[side], "seq": since}))
+        msg_type, data = await receive(ws, "resumed", "resume_failed")
+        if msg_type == "resume_failed":
+            raise RuntimeError(data.get("message"))
+        if side == engine.X:
+            self.x = ws
+        else:
+            self.o = ws
+        return ws
+
+    async def play(self, host, port, games, disconnect, rng, stats):
+        clock = time.perf_counter
+        for _ in range(games):
+            position = engine.Position()
+            drop_at = rng.randrange(9) if rng.random() < disconnect else None
+            while position.result() is None:
+                side = position.turn
+                players = (self.x, self.o)
+                mover, other = players[side], players[side ^ 1]
+                dropped = drop_at is not None and position.move_count() >= drop_at
+                if dropped:
+                    drop_at = None
+                    await other.close()
+                    await receive(mover, "opponent_reconnecting")
+                index = rng.choice(position.empty_cells())
+                data = {"code": self.code, "index": index, "player": engine.SYMBOLS[side]}
+                payload = protocol.encode("game_move", data) if self.binary else message("game_move", data)
+                stats.bytes_sent += len(payload)
+                start = clock()
+                mover.send(payload)
+                await receive(mover, *TURN_DONE)
+                stats.rtt.append(clock() - start)
+                if dropped:
+                    # The missed move must come back as a replay
+                    other = await self.resume(side ^ 1, self.seq, host, port)
+                    stats.drops += 1
+                await receive(other, *TURN_DONE)
+                self.seq += 1
+                position.make(index)
+                stats.moves += 1
+            stats.games += 1
+
+    async def close(self):
+        for ws in (self.x, self.o):
+            if ws is not None:
+                await ws.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+# --- Local stand-in server ---
+def run_local_server(control):
+    async def main():
+        loop = asyncio.get_running_loop()
+        game_server = server.GameServer(seed=0)
+        listener = await game_server.serve("127.0.0.1", 0)
+        control.send(listener.sockets[0].getsockname()[1])
+        done = asyncio.Event()
+
+        def on_control():
+            command = control.recv()
+            if command == "trace":
+                tracemalloc.start()
+                control.send(None)
+            elif command == "measure":
+                traced = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                control.send({**game_server.stats(), "traced_bytes": traced})
+            elif command == "stats":
+                control.send({**game_server.stats(), "cpu_seconds": time.process_time()})
+            else:
+                done.set()
+
+        loop.add_reader(control.fileno(), on_control)
+        await done.wait()
+        listener.close()
+        # Let the last connections finish closing before the loop goes away
+        pending = asyncio.all_tasks() - {asyncio.current_task()}
+        if pending:
+            await asyncio.wait(pending, timeout=2)
+
+    asyncio.run(main())
+
+def ask(control, command):
+    control.send(command)
+    return control.recv()
+
+
+async def run(args):
+    stats = Stats()
+    rng = random.Random(args.seed)
+    control = process = None
+    host, port = args.host, args.port
+    if host is None:
+        control, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=run_local_server, args=(child,), daemon=True)
+        process.start()
+        host, port = "127.0.0.1", control.recv()
+        ask(control, "trace")
+
+    pairs = [Pair(args.binary) for _ in range(args.pairs)]
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def setup(pair):
+        async with limit:
+            try:
+                await pair.setup(host, port)
+                stats.rooms += 1
+            except (OSError, RuntimeError, wsframe.ProtocolError, asyncio.IncompleteReadError):
+                stats.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(setup(pair) for pair in pairs))
+    setup_seconds = time.perf_counter() - start
+    server_stats = ask(control, "measure") if control else None
+
+    async def play(pair, seed):
+        try:
+            await pair.play(host, port, args.games, args.disconnect, random.Random(seed), stats)
+        except (OSError, RuntimeError, wsframe.ProtocolError, asyncio.IncompleteReadError):
+            stats.errors += 1
+        finally:
+            await pair.close()
+
+    live = [pair for pair in pairs if pair.code is not None]
+    start = time.perf_counter()
+    await asyncio.gather(*(play(pair, rng.random()) for pair in live))
+    play_seconds = time.perf_counter() - start
+
+    if control:
+        control.send("stop")
+        process.join(timeout=5)
+
+    rtt = sorted(stats.rtt)
+    print(f"{stats.rooms} rooms ({2 * stats.rooms} clients) set up in {setup_seconds:.2f}s: "
+          f"{stats.rooms / setup_seconds:,.0f} rooms/s")
+    print(f"{stats.games} games, {stats.moves} moves, {stats.drops} mid-game reconnects "
+          f"in {play_seconds:.2f}s: {stats.games / play_seconds:,.0f} games/s, "
+          f"{stats.moves / play_seconds:,.0f} moves/s")
+    print("move round trip (ms): " + "  ".join(
+        f"p{p} {percentile(rtt, p) * 1000:.2f}" for p in (50, 90, 99, 99.9)))
+    if stats.moves:
+        print(f"{'binary' if args.binary else 'json'} game_move payload: "
+              f"{stats.bytes_sent / stats.moves:.1f} bytes per move")
+    if server_stats and server_stats["rooms"]:
+        per_room = server_stats["traced_bytes"] / server_stats["rooms"]
+        print(f"server memory: {per_room:,.0f} bytes per live room "
+              f"(rooms + both connections, {server_stats['rooms']} rooms)")
+    if stats.errors:
+        print(f"{stats.errors} pairs failed")
+    return stats
+
+def raise_fd_limit(needed):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed and soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for the Tic-Tac-Toe online protocol")
+    parser.add_argument("--host", default=None, help="server host (default: local stand-in)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--pairs", type=int, default=1000, help="simulated player pairs")
+    parser.add_argument("--games", type=int, default=3, help="games per pair")
+    parser.add_argument("--disconnect", type=float, default=0.05,
+                        help="chance per game that one side drops and resumes")
+    parser.add_argument("--concurrency", type=int, default=200,
+                        help="room setups in flight at once")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--binary", action="store_true",
+                        help="negotiate the compact binary move encoding")
+    args = parser.parse_args(argv)
+
+    # Each pair needs two sockets here, plus two more on a local stand-in
+    raise_fd_limit(4 * args.pairs + 256)
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
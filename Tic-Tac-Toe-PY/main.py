@@ -1,231 +1,441 @@
 import js
-from pyodide.ffi import create_proxy #type: ignore
-import random
+from pyodide.ffi import to_js #type: ignore
+from pyodide.http import pyfetch #type: ignore
 import asyncio
+import importlib
+import importlib.util
+import json
+import random
 
-# --- Global Game State Variables ---
-board = [""] * 9
-current_player = "X"
-game_active = False
-mode = None  # 'single', 'local', or 'online'
-ws = None # WebSocket connection
-room_code = None
-is_my_turn = False
-my_player_symbol = "X"
-
-# Timer handles
-move_timer_handle = None
-
-# Score tracking
-scores = {"X": 0, "O": 0, "TIE": 0}
+import ai
+import board
+import clock
+import engine
+import game
+import metrics
+import render
+import solver
+import ultimate
+from metrics import create_proxy
+
+# Online play modules, fetched on first use (see load_online_modules)
+ONLINE_MODULES = ("protocol", "connection")
+protocol = None
+connection = None
+online_modules_task = None
+
+# --- Game State ---
+# The game on this page; game.py holds the state type and its transitions
+state = game.GameState()
+session = state.session
+server_connection = None # connection.Connection, created on first use
+
+# Turn clock
+TURN_SECONDS = 30
+
+# Ultimate board: extra space between the small boards (px, see .game-board.ultimate)
+ULTIMATE_GUTTER = 8
+next_round_proxy = None
+
+# Computer player: ?ai=instant|anytime|worker picks the engine (see ai.py)
+AI_BUDGET_MS = ai.BUDGET_MS
+ai_engine = None
+ai_job = None # ai.Job of the move being searched, if any
 
 # HTML Elements
 document = js.document
-cells = [document.querySelector(f'[data-index="{i}"]') for i in range(9)]
+game_board = document.getElementById("gameBoard")
+cells = []
+cell_click_proxy = None
 mode_selection_screen = document.getElementById("modeSelection")
 matchmaking_screen = document.getElementById("matchmakingScreen")
 game_screen = document.getElementById("gameScreen")
 game_code_input = document.getElementById("gameCodeInput")
 matchmaking_status = document.getElementById("matchmakingStatus")
-x_label = document.getElementById("xLabel")
-o_label = document.getElementById("oLabel")
-game_title = document.getElementById("gameTitle")
-status_text = document.getElementById("statusText")
-turn_indicator = document.getElementById("turnIndicator")
-thinking_animation = document.getElementById("thinkingAnimation")
 celebration_div = document.getElementById("celebration")
-wait_timer_display = document.getElementById("waitTimer") # Retained for matchmaking display
-
-# Winning combinations
-WINNING_CONDITIONS = [
-    [0, 1, 2], [3, 4, 5], [6, 7, 8],
-    [0, 3, 6], [1, 4, 7], [2, 5, 8],
-    [0, 4, 8], [2, 4, 6]
-]
+difficulty_select = document.getElementById("difficultySelect")
+board_size_select = document.getElementById("boardSizeSelect")
+
+# Board, status and scores are drawn in one batched DOM patch per frame
+renderer = render.BoardRenderer("gameBoard")
+
+# Timings for the stats overlay; every hook is a no-op until it is enabled
+recorder = metrics.recorder
+recorder.now = clock.now_ms
+STATS_REFRESH_MS = 1000
+stats_visible = False
+stats_refresh = None
+
+CELEBRATION_HTML = """
+    <div class="celebration-content">
+        <i class="fas fa-trophy celebration-icon"></i>
+        <h2 id="celebrationMessage"></h2>
+        <div class="action-buttons" style="margin-top: 20px;">
+            <button id="nextRoundBtn" class="action-btn new-game" style="margin: 0;">Next Round</button>
+        </div>
+        <div class="confetti">
+            <div class="confetti-piece"></div>
+            <div class="confetti-piece"></div>
+            <div class="confetti-piece"></div>
+            <div class="confetti-piece"></div>
+            <div class="confetti-piece"></div>
+        </div>
+    </div>
+"""
+
+# --- Online Modules ---
+def load_online_modules():
+    # Local players never download or parse the networking code
+    global online_modules_task
+    if online_modules_task is None:
+        online_modules_task = asyncio.ensure_future(fetch_online_modules())
+    return online_modules_task
+
+async def fetch_online_modules():
+    global protocol, connection, online_modules_task
+    try:
+        missing = [name for name in ONLINE_MODULES if importlib.util.find_spec(name) is None]
+        responses = await asyncio.gather(*(pyfetch(f"{name}.py") for name in missing))
+        for name, response in zip(missing, responses):
+            with open(f"{name}.py", "w") as f:
+                f.write(await response.string())
+        importlib.invalidate_caches()
+        protocol = importlib.import_module("protocol")
+        connection = importlib.import_module("connection")
+    except Exception:
+        online_modules_task = None # Let the next attempt retry
+        raise
 
 # --- WebSocket Client Logic ---
+# Point the page at a self-hosted server (see server.py) with ?server=ws://host:port
+DEFAULT_SERVER_URL = "wss://web-production-08d84.up.railway.app:8080"
+PLAYER_KEY = "ticTacToePlayer" # localStorage key of our player id
+
+def player_id():
+    # Stable id for the server's results store and leaderboard, kept across visits
+    player = js.localStorage.getItem(PLAYER_KEY)
+    if not player:
+        player = f"{random.getrandbits(64):016x}"
+        js.localStorage.setItem(PLAYER_KEY, player)
+    return player
+
+def server_url():
+    url = js.URLSearchParams.new(js.location.search).get("server") or DEFAULT_SERVER_URL
+    # Offer the compact move encoding; servers that don't know it ignore the query
+    return url + ("&" if "?" in url else "?") + f"enc={protocol.ENCODING}"
 
 async def connect_websocket():
-    global ws
+    global server_connection
+
+    if server_connection is None:
+        server_connection = connection.Connection(
+            server_url, handle_server_message,
+            on_open=on_connection_open,
+            on_down=on_connection_down,
+            on_give_up=on_connection_give_up,
+        )
 
-    if ws and ws.readyState == 1:
-        return ws
+    if not await server_connection.open():
+        js.console.error("WebSocket failed to connect.")
+        return None
 
-    url = "wss://web-production-08d84.up.railway.app:8080"
+    return server_connection
 
-    ws = js.WebSocket.new(url)
+async def send_to_server(type, data={}):
+    # Queued by the connection while it is reconnecting
+    if server_connection is None:
+        return
+    if type == 'game_move':
+        recorder.start("move_round_trip")
+    if session.binary_moves and type in protocol.ENCODERS:
+        server_connection.send(to_js(protocol.encode(type, data)))
+    else:
+        server_connection.send(json.dumps({'type': type, 'data': data}))
 
-    # wait until open
-    while ws.readyState == 0:
-        await asyncio.sleep(0.1)
+def on_connection_open(reconnected):
+    # Each new socket negotiates the encoding again with its own hello
+    session.binary_moves = False
+    if reconnected and state.mode == game.ONLINE and session.room_code and session.token:
+        server_connection.send_now(json.dumps({'type': 'resume', 'data': {
+            'code': session.room_code, 'session': session.token, 'seq': session.seq}}))
 
-    if ws.readyState != 1:
-        js.console.error("WebSocket failed to connect.")
-        return None
+def on_connection_down():
+    if state.mode == game.ONLINE and state.active:
+        renderer.set_text("statusText", "Connection lost. Reconnecting...")
 
-    ws.onmessage = create_proxy(handle_server_message)
-    ws.onclose = create_proxy(lambda e: js.console.log("WS Closed"))
-    ws.onerror = create_proxy(lambda e: js.console.error("WS Error"))
+def on_connection_give_up():
+    if state.mode == game.ONLINE and state.active:
+        handle_connection_lost("Connection lost.")
 
-    return ws
-
-async def send_to_server(type, data={}):
-    if ws and ws.readyState == 1:
-        message = js.JSON.stringify({'type': type, 'data': data})
-        ws.send(message)
+# Each accepted move reaches both players as exactly one of these
+SEQ_MESSAGES = ('turn_switch', 'game_win', 'game_tie', 'game_timeout')
 
 def handle_server_message(event):
-    global room_code, my_player_symbol, is_my_turn, current_player, game_active
-    
     try:
-        msg = js.JSON.parse(event.data)
-        msg_type = msg.type
-        data = msg.data
+        if isinstance(event.data, str):
+            msg = json.loads(event.data)
+            msg_type = msg['type']
+            data = msg.get('data') or {}
+        else:
+            # Binary frame: protocol.decode picks the decoder by opcode
+            msg_type, data = protocol.decode(event.data.to_bytes())
     except Exception as e:
-        js.console.error("Error parsing message:", e)
+        js.console.error("Error parsing message:", str(e))
         return
 
-    if msg_type == 'room_created':
-        room_code = data.code
-        my_player_symbol = 'X'
-        matchmaking_status.textContent = f"Room created. Code: {room_code}. Waiting for Player O..."
-        
-    elif msg_type == 'opponent_joined':
-        matchmaking_status.textContent = "Opponent joined! Starting Game..."
-        game_active = True
-        is_my_turn = True
-        switch_screen('game')
-        start_new_game()
-        
-    elif msg_type == 'room_joined':
-        room_code = data.code
-        my_player_symbol = 'O'
-        matchmaking_status.textContent = "Joined game! Starting Game..."
-        game_active = True
-        is_my_turn = False
-        switch_screen('game')
-        start_new_game()
+    if msg_type in SEQ_MESSAGES:
+        session.seq += 1
+        # Our own move comes back as the first of these after we sent it
+        recorder.stop("move_round_trip")
+    handler = SERVER_MESSAGE_HANDLERS.get(msg_type)
+    if handler:
+        handler(data)
+
+def on_hello(data):
+    # The server understood ?enc=...; move messages may now go out as binary
+    session.binary_moves = data.get('encoding') == protocol.ENCODING
+
+def on_room_created(data):
+    session.room_code = data['code']
+    session.token = data.get('session')
+    session.seq = 0
+    session.game_seq = 0
+    session.turn_deadline = None
+    state.my_symbol = 'X'
+    matchmaking_status.textContent = f"Room created. Code: {session.room_code}. Waiting for Player O..."
+
+def on_opponent_joined(data):
+    matchmaking_status.textContent = "Opponent joined! Starting Game..."
+    switch_screen('game')
+    start_new_game()
+
+def on_room_joined(data):
+    session.room_code = data['code']
+    session.token = data.get('session')
+    session.seq = 0
+    session.game_seq = 0
+    session.turn_deadline = None
+    state.my_symbol = 'O'
+    matchmaking_status.textContent = "Joined game! Starting Game..."
+    switch_screen('game')
+    start_new_game()
+
+def on_game_move(data):
+    make_opponent_move(data['index'], data['player'])
+
+def on_turn_switch(data):
+    set_turn_deadline(data)
+    game.set_turn(state, data['player'])
+    set_turn_display()
+    if state.my_turn:
+        start_move_timer()
+
+def on_game_over(data, won):
+    # Apply the final move if needed
+    final_index = data.get('index')
+    final_player = data.get('player')
+    if final_index is not None and final_player:
+        make_opponent_move(final_index, final_player)
         
-    elif msg_type == 'game_move':
-        index = data.index
-        player = data.player
-        make_opponent_move(index, player)
+    winner = data.get('winner')
+    game.end(state, winner)
+    session.game_seq = session.seq
+    cancel_timers()
+    
+    if winner:
+        update_scores()
         
-    elif msg_type == 'turn_switch':
-        current_player = data.player
-        is_my_turn = (current_player == my_player_symbol)
-        set_turn_display()
-        if is_my_turn:
+        if won:
+            renderer.mark_winning(data['condition'])
+            winner_name = player_name(winner)
+            scheduler.call_later(500, lambda: show_celebration(f"{winner_name} Wins!"))
+        else:
+            scheduler.call_later(500, lambda: show_celebration("It's a Tie!"))
+
+def on_game_timeout(data):
+    game.end(state, data['winner'])
+    session.game_seq = session.seq
+    cancel_timers()
+    update_scores()
+    if data['player'] == state.my_symbol:
+        show_celebration("Time's up! You lose this round.")
+    else:
+        show_celebration("Opponent ran out of time. You win this round!")
+
+def on_clock(data):
+    # Server's clock for the turn in progress (new game or after a resume)
+    set_turn_deadline(data)
+    if state.active and state.mode == game.ONLINE:
+        if data['player'] == state.my_symbol:
             start_move_timer()
+        else:
+            turn_clock.stop()
 
-    elif msg_type == 'game_win' or msg_type == 'game_tie':
-        # Apply the final move if needed
-        final_index = data.get('index')
-        final_player = data.get('player')
-        if final_index is not None and final_player:
-            make_opponent_move(final_index, final_player)
-            
-        game_active = False
-        cancel_timers()
-        winner = data.get('winner')
-        
-        if winner:
-            scores[winner] += 1
-            update_scores()
-            
-            if msg_type == 'game_win':
-                for index in data.condition:
-                    cells[index].className += " winning"
-                winner_name = x_label.textContent.split('(')[0].strip() if winner == 'X' else o_label.textContent.split('(')[0].strip()
-                js.setTimeout(create_proxy(lambda: show_celebration(f"{winner_name} Wins!")), 500)
-            else:
-                js.setTimeout(create_proxy(lambda: show_celebration("It's a Tie!")), 500)
-        
-    elif msg_type == 'opponent_disconnected':
-        handle_opponent_disconnect(data.disconnected)
+def on_opponent_disconnected(data):
+    handle_opponent_disconnect(data['disconnected'])
 
-    elif msg_type == 'error':
-        js.alert(f"Error: {data.message}")
-        matchmaking_status.textContent = "Error during connection. Try again."
-        document.getElementById("connectBtn").disabled = False
-        game_code_input.disabled = False
+def on_opponent_reconnecting(data):
+    if state.active:
+        renderer.set_text("statusText", "Opponent lost connection. Waiting for them to return...")
+
+def on_opponent_reconnected(data):
+    set_turn_display()
+
+def on_resumed(data):
+    # Missed moves follow as ordinary messages (or one moves message)
+    state.my_symbol = data['player']
+    set_turn_display()
+
+def on_moves(data):
+    # The current game's moves after seq `since` (answer to sync, or a resume)
+    session.seq = data['seq']
+    if state.active:
+        apply_moves(data)
+    else:
+        # Still showing the last result; start_new_game() applies it
+        session.pending_resync = data
+
+def on_resume_failed(data):
+    handle_connection_lost(f"Connection lost: {data.get('message')}")
+
+def on_error(data):
+    js.alert(f"Error: {data.get('message')}")
+    matchmaking_status.textContent = "Error during connection. Try again."
+    document.getElementById("connectBtn").disabled = False
+    game_code_input.disabled = False
+
+SERVER_MESSAGE_HANDLERS = {
+    'hello': on_hello,
+    'room_created': on_room_created,
+    'opponent_joined': on_opponent_joined,
+    'room_joined': on_room_joined,
+    'game_move': on_game_move,
+    'turn_switch': on_turn_switch,
+    'game_win': lambda data: on_game_over(data, True),
+    'game_tie': lambda data: on_game_over(data, False),
+    'game_timeout': on_game_timeout,
+    'clock': on_clock,
+    'opponent_disconnected': on_opponent_disconnected,
+    'opponent_reconnecting': on_opponent_reconnecting,
+    'opponent_reconnected': on_opponent_reconnected,
+    'resumed': on_resumed,
+    'moves': on_moves,
+    'resume_failed': on_resume_failed,
+    'error': on_error,
+}
 
 # --- Timer Logic ---
+# Every delayed call goes through one scheduler: one JS timeout, one proxy
+scheduler = clock.Scheduler()
+
 def cancel_timers():
-    global move_timer_handle
-    if move_timer_handle:
-        js.clearTimeout(move_timer_handle)
-        move_timer_handle = None
-    wait_timer_display.textContent = ""
+    turn_clock.stop()
 
 def update_move_timer(remaining_seconds):
-    global move_timer_handle
-    if move_timer_handle: js.clearTimeout(move_timer_handle)
+    if not state.active:
+        turn_clock.stop()
+        return
     
-    if remaining_seconds > 0 and game_active:
-        display_text = ""
-        if mode == 'online':
-            display_text = f"Your turn ({my_player_symbol}) - {remaining_seconds}s left" if is_my_turn else "Opponent's turn"
-        else:
-            display_text = f"{current_player}'s turn - {remaining_seconds}s left"
-            
-        status_text.textContent = display_text
-        
-        move_timer_handle = js.setTimeout(
-            create_proxy(lambda: update_move_timer(remaining_seconds - 1)), 
-            1000
-        )
+    display_text = ""
+    if state.mode == game.ONLINE:
+        display_text = f"Your turn ({state.my_symbol}) - {remaining_seconds}s left" if state.my_turn else "Opponent's turn"
     else:
-        handle_move_timeout()
+        display_text = f"{state.current_player}'s turn - {remaining_seconds}s left"
+        
+    renderer.set_text("statusText", display_text)
+
+def set_turn_deadline(data):
+    if 'ms' in data:
+        session.turn_deadline = clock.now_ms() + data['ms']
 
 def start_move_timer():
-    if game_active and (mode != 'online' or is_my_turn):
-        update_move_timer(30)
+    if state.active and (state.mode != game.ONLINE or state.my_turn):
+        if state.mode == game.ONLINE and session.turn_deadline is not None:
+            turn_clock.start(deadline=session.turn_deadline)
+        else:
+            turn_clock.start(TURN_SECONDS)
 
 def handle_move_timeout():
-    global game_active
     
-    if mode == 'online' and is_my_turn:
+    if not state.active:
+        return
+    if state.mode == game.ONLINE and session.turn_deadline is not None:
+        # The server keeps the real clock and will send game_timeout
+        renderer.set_text("statusText", "Time's up!")
+    elif state.mode == game.ONLINE and state.my_turn:
         js.alert("Time's up! You lose this round.")
-        asyncio.ensure_future(send_to_server('disconnect_room', {'code': room_code}))
-        game_active = False
+        asyncio.ensure_future(send_to_server('disconnect_room', {'code': session.room_code}))
+        game.end(state)
         switch_screen('mode_selection')
-    elif mode == 'local':
-        js.alert(f"{current_player}'s time ran out! Game over.")
+    elif state.mode == game.LOCAL:
+        js.alert(f"{state.current_player}'s time ran out! Game over.")
         # Optionally end game or choose random move for local timeout
-        game_active = False
+        game.end(state)
 
 def handle_opponent_disconnect(disconnected_player):
-    global game_active
-    game_active = False
+    game.end(state)
     cancel_timers()
     
-    if mode == 'online':
+    if state.mode == game.ONLINE:
         # Send one last disconnect message just in case
-        asyncio.ensure_future(send_to_server('disconnect_room', {'code': room_code}))
+        asyncio.ensure_future(send_to_server('disconnect_room', {'code': session.room_code}))
         
-        if disconnected_player != my_player_symbol:
-            scores[my_player_symbol] += 1
+        if disconnected_player != state.my_symbol:
+            game.add_point(state, state.my_symbol)
             update_scores()
             show_celebration(f"Opponent ({disconnected_player}) disconnected. You win by forfeit!")
         else:
             show_celebration(f"You disconnected.")
 
+turn_clock = clock.TurnClock(scheduler, update_move_timer, handle_move_timeout)
+
+def handle_connection_lost(message):
+    game.end(state)
+    session.token = None
+    cancel_timers()
+    show_celebration(message)
+
+def request_sync():
+    # Ask for the current game's moves from its first seq on
+    asyncio.ensure_future(send_to_server('sync', {'code': session.room_code, 'seq': state.log.base_seq}))
+
+def apply_moves(data):
+    # Keep our moves up to data['since'] and replay the server's after it
+    since = data['since']
+    log = state.log
+    if log.base_seq <= since <= log.seq:
+        base_seq = log.base_seq
+        moves = log.played()[:since - base_seq] + bytes(data['moves'])
+    else:
+        base_seq = since
+        moves = bytes(data['moves'])
+    session.game_seq = base_seq
+    game.load_moves(state, moves, base_seq)
+    draw_board()
+    cancel_timers()
+    set_turn_display()
+    if state.my_turn:
+        start_move_timer()
+
 
 # --- UI Helper Functions ---
 def set_player_labels():
-    if mode == 'online':
-        x_label.textContent = "You (X)" if my_player_symbol == 'X' else "Friend (X)"
-        o_label.textContent = "You (O)" if my_player_symbol == 'O' else "Friend (O)"
-        game_title.textContent = "Online vs Friend"
-    elif mode == 'single':
-        x_label.textContent = "You (X)"
-        o_label.textContent = "Computer (O)"
-        game_title.textContent = "You vs Computer"
+    if state.mode == game.ONLINE:
+        renderer.set_text("xLabel", "You (X)" if state.my_symbol == 'X' else "Friend (X)")
+        renderer.set_text("oLabel", "You (O)" if state.my_symbol == 'O' else "Friend (O)")
+        renderer.set_text("gameTitle", "Online vs Friend")
+    elif state.mode == game.SINGLE:
+        renderer.set_text("xLabel", "You (X)")
+        renderer.set_text("oLabel", "Computer (O)")
+        renderer.set_text("gameTitle", "You vs Computer")
     else:
-        x_label.textContent = "Player 1 (X)"
-        o_label.textContent = "Player 2 (O)"
-        game_title.textContent = "Two Players (Local)"
+        renderer.set_text("xLabel", "Player 1 (X)")
+        renderer.set_text("oLabel", "Player 2 (O)")
+        renderer.set_text("gameTitle", "Two Players (Local)")
+    # Undo and redo only where nobody else has a say
+    history_class = "action-btn reset-scores hidden" if state.mode == game.ONLINE else "action-btn reset-scores"
+    renderer.set_class("undoBtn", history_class)
+    renderer.set_class("redoBtn", history_class)
 
 def switch_screen(target):
     mode_selection_screen.className = "screen"
@@ -233,14 +443,20 @@ def switch_screen(target):
     game_screen.className = "screen"
     
     cancel_timers()
+    cancel_ai_move()
     
     if target == 'mode_selection':
         mode_selection_screen.className = "screen active"
         # Cleanup online connection
-        if ws and ws.readyState == 1:
-            asyncio.ensure_future(send_to_server('disconnect_room', {'code': room_code}))
+        if server_connection and server_connection.is_open:
+            asyncio.ensure_future(send_to_server('disconnect_room', {'code': session.room_code}))
+        session.token = None
         
     elif target == 'matchmaking':
+        # Start downloading the networking code while the player types a code
+        load_online_modules()
+        # The online protocol only knows the classic board
+        configure_board(3, 3)
         matchmaking_screen.className = "screen active"
         matchmaking_status.textContent = "Ready to connect..."
         game_code_input.disabled = False
@@ -248,267 +464,301 @@ def switch_screen(target):
     elif target == 'game':
         game_screen.className = "screen active"
 
+def player_name(symbol):
+    # "You", "Computer", "Player 1"... from the label, without a DOM read
+    return renderer.text("xLabel" if symbol == 'X' else "oLabel").split('(')[0].strip()
+
 def update_scores():
-    document.getElementById("xScore").textContent = str(scores["X"])
-    document.getElementById("oScore").textContent = str(scores["O"])
-    document.getElementById("tieScore").textContent = str(scores["TIE"])
+    renderer.set_text("xScore", str(game.score(state, "X")))
+    renderer.set_text("oScore", str(game.score(state, "O")))
+    renderer.set_text("tieScore", str(game.score(state, "TIE")))
 
 def set_turn_display():
-    if not game_active: return
-    
-    if mode == 'single' and current_player == 'O':
-        status_text.textContent = "Computer's turn (O)"
-        turn_indicator.className = "turn-indicator o-turn"
-    elif mode == 'online':
-        if is_my_turn:
-            status_text.textContent = f"Your turn ({my_player_symbol})"
-            turn_indicator.className = f"turn-indicator {my_player_symbol.lower()}-turn"
+    if not state.active: return
+    show_playable()
+    
+    if state.mode == game.SINGLE and state.current_player == 'O':
+        renderer.set_text("statusText", "Computer's turn (O)")
+        renderer.set_class("turnIndicator", "turn-indicator o-turn")
+    elif state.mode == game.ONLINE:
+        if state.my_turn:
+            renderer.set_text("statusText", f"Your turn ({state.my_symbol})")
+            renderer.set_class("turnIndicator", f"turn-indicator {state.my_symbol.lower()}-turn")
         else:
-            status_text.textContent = "Opponent's turn"
-            indicator_symbol = 'X' if my_player_symbol == 'O' else 'O'
-            turn_indicator.className = f"turn-indicator {indicator_symbol.lower()}-turn"
-    elif current_player == 'X':
-        status_text.textContent = "Player 1's turn (X)"
-        turn_indicator.className = "turn-indicator x-turn"
+            renderer.set_text("statusText", "Opponent's turn")
+            indicator_symbol = 'X' if state.my_symbol == 'O' else 'O'
+            renderer.set_class("turnIndicator", f"turn-indicator {indicator_symbol.lower()}-turn")
+    elif state.current_player == 'X':
+        renderer.set_text("statusText", "Player 1's turn (X)")
+        renderer.set_class("turnIndicator", "turn-indicator x-turn")
     else:
-        status_text.textContent = "Player 2's turn (O)"
-        turn_indicator.className = "turn-indicator o-turn"
+        renderer.set_text("statusText", "Player 2's turn (O)")
+        renderer.set_class("turnIndicator", "turn-indicator o-turn")
 
 def show_thinking(show):
-    thinking_animation.className = "thinking-animation" if show else "thinking-animation hidden"
+    renderer.set_class("thinkingAnimation", "thinking-animation" if show else "thinking-animation hidden")
 
 def show_celebration(message):
-    celebration_div.innerHTML = f"""
-        <div class="celebration-content">
-            <i class="fas fa-trophy celebration-icon"></i>
-            <h2>{message}</h2>
-            <div class="action-buttons" style="margin-top: 20px;">
-                <button id="nextRoundBtn" class="action-btn new-game" style="margin: 0;">Next Round</button>
-            </div>
-            <div class="confetti">
-                <div class="confetti-piece"></div>
-                <div class="confetti-piece"></div>
-                <div class="confetti-piece"></div>
-                <div class="confetti-piece"></div>
-                <div class="confetti-piece"></div>
-            </div>
-        </div>
-    """
-    
-    document.getElementById("nextRoundBtn").addEventListener("click", create_proxy(start_new_game))
-    celebration_div.className = "celebration"
+    global next_round_proxy
+    if next_round_proxy is None:
+        # Built once; later rounds only change the message and the class
+        celebration_div.innerHTML = CELEBRATION_HTML
+        next_round_proxy = create_proxy(start_new_game)
+        document.getElementById("nextRoundBtn").addEventListener("click", next_round_proxy)
+    renderer.set_text("celebrationMessage", message)
+    renderer.set_class("celebration", "celebration")
 
 def hide_celebration():
-    celebration_div.className = "celebration hidden"
+    renderer.set_class("celebration", "celebration hidden")
 
 def reset_board_ui():
-    for i in range(9):
-        cells[i].textContent = ""
-        cells[i].className = "cell"
-        cells[i].disabled = False
+    renderer.clear_cells()
+
+def draw_board():
+    # Every cell from the current position
+    for index in range(state.size * state.size):
+        renderer.set_cell(index, state.position.cell(index))
+
+def build_board_ui():
+    global cells, cell_click_proxy
+    
+    if cell_click_proxy is None:
+        cell_click_proxy = create_proxy(handle_cell_click)
+    
+    gap = 12 if state.size <= 3 else 4
+    # Ultimate: a wider gutter (CSS margins) between the nine small boards
+    gutter = 2 * ULTIMATE_GUTTER if is_ultimate() else 0
+    cell_size = min(96, (520 - gutter - gap * (state.size - 1)) // state.size)
+    game_board.innerHTML = ""
+    game_board.className = "game-board ultimate" if is_ultimate() else "game-board"
+    game_board.style.gridTemplateColumns = f"repeat({state.size}, 1fr)"
+    game_board.style.gap = f"{gap}px"
+    game_board.style.maxWidth = f"{state.size * cell_size + (state.size - 1) * gap + gutter}px"
+    game_board.style.setProperty("--cell-size", f"{cell_size}px")
+    
+    cells = []
+    for i in range(state.size * state.size):
+        cell = document.createElement("button")
+        cell.className = "cell"
+        cell.setAttribute("data-index", str(i))
+        cell.addEventListener("click", cell_click_proxy)
+        game_board.appendChild(cell)
+        cells.append(cell)
+    renderer.resize(len(cells))
+
+def is_ultimate():
+    return isinstance(state.position, ultimate.UltimateBoard)
+
+def show_playable():
+    # Ultimate: highlight where the next move may go (nothing once the game is over)
+    if is_ultimate():
+        renderer.mark_playable(state.position.legal_moves() if state.active else ())
+
+def configure_board(size, length):
+    if not game.configure(state, size, length) and len(cells) == size * size:
+        return
+    build_board_ui()
 
 def start_new_game(event=None):
-    global board, current_player, game_active, is_my_turn
-    
+    cancel_ai_move()
     hide_celebration()
     reset_board_ui()
-    
-    board = [""] * 9
-    current_player = "X"
-    game_active = True
+    game.reset(state)
     
     set_player_labels()
     cancel_timers()
     
-    if mode == 'online':
-        is_my_turn = (current_player == my_player_symbol)
-        if is_my_turn:
+    if state.mode == game.ONLINE:
+        if session.pending_resync:
+            apply_moves(session.pending_resync)
+            session.pending_resync = None
+        elif session.seq != session.game_seq:
+            # The game went on while the last result was showing
+            request_sync()
+        elif state.my_turn:
             start_move_timer()
         else:
             pass # Opponent's turn, wait for message
-    elif mode == 'local':
+    elif state.mode == game.LOCAL:
         start_move_timer()
         
     set_turn_display()
     
-    if mode == 'single' and current_player == 'O':
-        js.setTimeout(create_proxy(computer_move), 1000)
+    if state.mode == game.SINGLE and state.current_player == 'O':
+        computer_move()
+
+def undo_move(event=None):
+    # Against the computer, its reply is taken back too: your turn again
+    plies = 2 if state.mode == game.SINGLE else 1
+    if not can_rewind(plies, len(state.log)):
+        return
+    for _ in range(plies):
+        game.undo(state)
+    draw_board()
+    after_rewind()
+
+def redo_move(event=None):
+    plies = 2 if state.mode == game.SINGLE else 1
+    if not can_rewind(plies, state.log.undone()):
+        return
+    for _ in range(plies):
+        game.redo(state)
+    draw_board()
+    if not check_win_local():
+        after_rewind()
+
+def can_rewind(plies, available):
+    # Not online, not after the game is decided, not while the computer thinks
+    if not state.active or state.mode == game.ONLINE or available < plies:
+        return False
+    return state.mode != game.SINGLE or state.current_player == 'X'
+
+def after_rewind():
+    set_turn_display()
+    if state.mode == game.LOCAL:
+        start_move_timer()
 
 def reset_all_scores(event=None):
-    global scores
-    scores = {"X": 0, "O": 0, "TIE": 0}
+    game.reset_scores(state)
     update_scores()
     start_new_game()
 
 def select_mode(selected_mode):
-    global mode, game_active
-    mode = selected_mode
-    game_active = True
+    state.mode = selected_mode
+    if difficulty_select and difficulty_select.value in solver.DIFFICULTIES:
+        state.difficulty = difficulty_select.value
+    if board_size_select and board_size_select.value in board.PRESETS:
+        configure_board(*board.PRESETS[board_size_select.value])
     set_player_labels()
+    if state.mode == game.SINGLE and not isinstance(state.position, engine.Position):
+        # Start a search worker loading before the first computer move
+        get_ai_engine()
     switch_screen('game')
     reset_all_scores()
 
 # --- Core Game Logic ---
 def check_win_local():
-    global game_active
-    
-    for condition in WINNING_CONDITIONS:
-        a, b, c = condition
-        if board[a] and board[a] == board[b] and board[a] == board[c]:
-            game_active = False
-            winner = board[a]
-            scores[winner] += 1
-            update_scores()
-            
-            for index in condition: cells[index].className += " winning"
-            
-            winner_name = x_label.textContent.split('(')[0].strip() if winner == 'X' else o_label.textContent.split('(')[0].strip()
-            js.setTimeout(create_proxy(lambda: show_celebration(f"{winner_name} Wins!")), 500)
-            return True
-    
-    if "" not in board:
-        game_active = False
-        scores["TIE"] += 1
-        update_scores()
-        js.setTimeout(create_proxy(lambda: show_celebration("It's a Tie!")), 500)
-        return True
+    result = game.resolve(state)
+    if not result:
+        return False
+    
+    winner, condition = result
+    update_scores()
+    show_playable()
+    if condition:
+        renderer.mark_winning(condition)
         
-    return False
+        winner_name = player_name(winner)
+        scheduler.call_later(500, lambda: show_celebration(f"{winner_name} Wins!"))
+    else:
+        scheduler.call_later(500, lambda: show_celebration("It's a Tie!"))
+    return True
 
 def next_turn():
-    global current_player
-    if not game_active: return
+    if not state.active: return
     
-    current_player = "O" if current_player == "X" else "X"
+    game.switch_turn(state)
     set_turn_display()
     
-    if mode == 'single' and current_player == 'O':
-        js.setTimeout(create_proxy(computer_move), 1000)
-    elif mode == 'local':
+    if state.mode == game.SINGLE and state.current_player == 'O':
+        computer_move()
+    elif state.mode == game.LOCAL:
         start_move_timer()
 
 def handle_cell_click(event):
-    global board, game_active, current_player
-    
-    if not game_active: return
+    if not state.active: return
     
     target = event.currentTarget
     clicked_index = int(target.getAttribute('data-index'))
     
-    if board[clicked_index] != "": return
+    if not state.position.is_empty(clicked_index): return
     
-    player_to_move = current_player
+    player_to_move = state.current_player
     
-    if mode == 'online':
-        if not is_my_turn or player_to_move != my_player_symbol: return
+    if state.mode == game.ONLINE:
+        if not state.my_turn or player_to_move != state.my_symbol: return
         
         # Online move
-        board[clicked_index] = player_to_move
-        target.textContent = player_to_move
-        target.className += f" {player_to_move.lower()}"
-        target.disabled = True
+        if not game.apply_move(state, clicked_index, player_to_move): return
+        renderer.set_cell(clicked_index, player_to_move)
+        time_click(event)
         
         cancel_timers()
-        asyncio.ensure_future(send_to_server('game_move', {'code': room_code, 'index': clicked_index, 'player': player_to_move}))
+        asyncio.ensure_future(send_to_server('game_move', {'code': session.room_code, 'index': clicked_index, 'player': player_to_move}))
         
     else:
-        # Single or Local move
-        board[clicked_index] = player_to_move
-        target.textContent = player_to_move
-        target.className += f" {player_to_move.lower()}"
-        target.disabled = True
+        # Single or Local move (Ultimate turns down cells outside the board you were sent to)
+        if not game.apply_move(state, clicked_index, player_to_move): return
+        renderer.set_cell(clicked_index, player_to_move)
+        time_click(event)
         
         if not check_win_local():
             next_turn()
 
+def time_click(event):
+    # From the input event to the frame that draws its move (on_render_flush)
+    if recorder.enabled:
+        recorder.start("click_to_paint", event.timeStamp)
+
+def on_render_flush():
+    recorder.stop("click_to_paint")
+
 def make_opponent_move(index, player):
-    global board, current_player
-    
-    if board[index] != "": return
+    if not state.active or state.position.cell(index) == player:
+        # Next game's move before "Next Round" (start_new_game() syncs), or our own
+        return
+    if not game.apply_move(state, index, player):
+        # Our board and the server's disagree: replay the server's moves
+        request_sync()
+        return
     
-    board[index] = player
-    cell = cells[index]
-    cell.textContent = player
-    cell.className += f" {player.lower()}"
-    cell.disabled = True
+    renderer.set_cell(index, player)
     
     # Do NOT call check_win_local() or next_turn() here, the server will send win/tie/turn_switch messages.
 
 # --- Computer AI Logic ---
-def get_empty_cells():
-    return [i for i, val in enumerate(board) if val == ""]
+def get_ai_engine():
+    global ai_engine
+    if ai_engine is None:
+        name = js.URLSearchParams.new(js.location.search).get("ai") or "worker"
+        ai_engine = ai.make_engine(name, scheduler)
+    return ai_engine
 
 def computer_move():
+    # No waiting here: the engine calls on_ai_move when its move is ready
+    global ai_job
+    cancel_ai_move()
     show_thinking(True)
-    js.setTimeout(create_proxy(lambda: execute_ai_move()), 500)
-
-def execute_ai_move():
-    empty_cells = get_empty_cells()
-    
-    # AI logic (O)
-    def find_best_move(player):
-        for i in empty_cells:
-            board[i] = player
-            for condition in WINNING_CONDITIONS:
-                a, b, c = condition
-                if board[a] == board[b] == board[c] == player:
-                    board[i] = ''
-                    return i
-            board[i] = ''
-        return None
-
-    # 1. Try to win (O)
-    move = find_best_move('O')
-    if move is not None:
-        make_move(move, 'O')
-        show_thinking(False)
-        return
-    
-    # 2. Try to block (X)
-    move = find_best_move('X')
-    if move is not None:
+    recorder.start("ai_move")
+    job = get_ai_engine().choose_move(state, AI_BUDGET_MS, on_ai_move)
+    if not job.done:
+        ai_job = job
+
+def on_ai_move(move):
+    global ai_job
+    ai_job = None
+    recorder.stop("ai_move")
+    show_thinking(False)
+    if move is not None and state.active and state.current_player == 'O':
         make_move(move, 'O')
-        show_thinking(False)
-        return
-    
-    # 3. Center
-    if 4 in empty_cells:
-        make_move(4, 'O')
-        show_thinking(False)
-        return
-        
-    # 4. Corners
-    corners = [0, 2, 6, 8]
-    available_corners = [c for c in corners if c in empty_cells]
-    if available_corners:
-        move_index = random.choice(available_corners)
-        make_move(move_index, 'O')
-        show_thinking(False)
-        return
-    
-    # 5. Edges
-    if empty_cells:
-        move_index = random.choice(empty_cells)
-        make_move(move_index, 'O')
 
-    show_thinking(False)
+def cancel_ai_move():
+    # Drop the answer of a search still running (new game, back, new mode)
+    global ai_job
+    if ai_job is not None:
+        ai_job.cancel()
+        ai_job = None
+        show_thinking(False)
 
 def make_move(index, player):
-    global board
-    
-    board[index] = player
-    cell = cells[index]
-    cell.textContent = player
-    cell.className += f" {player.lower()}"
-    cell.disabled = True
+    game.apply_move(state, index, player)
+    renderer.set_cell(index, player)
     
     if not check_win_local():
         next_turn()
 
 # --- Online Matchmaking ---
 async def start_matchmaking_async():
-    global room_code
-    
     code_str = game_code_input.value
     if not code_str:
         matchmaking_status.textContent = "Error: Please enter a code."
@@ -529,6 +779,16 @@ async def start_matchmaking_async():
     game_code_input.disabled = True
     
     matchmaking_status.textContent = "Connecting to server..."
+    state.mode = game.ONLINE
+    
+    try:
+        await load_online_modules()
+    except Exception as e:
+        js.console.error("Could not load online modules:", str(e))
+        matchmaking_status.textContent = "Connection failed. Try refreshing."
+        document.getElementById("connectBtn").disabled = False
+        game_code_input.disabled = False
+        return
     
     if not await connect_websocket():
         matchmaking_status.textContent = "Connection failed. Try refreshing."
@@ -536,25 +796,65 @@ async def start_matchmaking_async():
         game_code_input.disabled = False
         return
         
-    room_code = code # Temporarily store to decide join/create
+    session.room_code = code # Temporarily store to decide join/create
     
-    if room_code == 0:
+    if session.room_code == 0:
         # Create a new room (Player X)
         matchmaking_status.textContent = "Requesting new room..."
-        await send_to_server('create_room', {})
+        await send_to_server('create_room', {'player': player_id()})
     else:
         # Join existing room (Player O)
-        matchmaking_status.textContent = f"Attempting to join room {room_code}..."
-        await send_to_server('join_room', {'code': room_code})
+        matchmaking_status.textContent = f"Attempting to join room {session.room_code}..."
+        await send_to_server('join_room', {'code': session.room_code, 'player': player_id()})
 
 def start_matchmaking(event):
     asyncio.ensure_future(start_matchmaking_async())
 
+# --- Performance Stats ---
+def toggle_stats(event=None):
+    global stats_visible
+    recorder.enable()
+    stats_visible = not stats_visible
+    renderer.set_class("statsOverlay", "stats-overlay" if stats_visible else "stats-overlay hidden")
+    refresh_stats()
+
+def refresh_stats():
+    global stats_refresh
+    scheduler.cancel(stats_refresh)
+    stats_refresh = None
+    if stats_visible:
+        update_gauges()
+        renderer.set_text("statsText", recorder.format())
+        stats_refresh = scheduler.call_later(STATS_REFRESH_MS, refresh_stats)
+
+def update_gauges():
+    # Startup times as loadGame() in index.html measured them
+    timing = getattr(js.window, "startupTiming", None)
+    if timing:
+        recorder.gauge("runtime_ready_ms", round(timing.runtime))
+        recorder.gauge("interactive_ms", round(timing.interactive))
+    recorder.gauge("dom_patches", renderer.flushes)
+    recorder.gauge("pending_timers", len(scheduler.queue))
+
+def stats_json(event=None):
+    update_gauges()
+    return recorder.to_json()
+
+def export_stats(event=None):
+    link = document.createElement("a")
+    link.href = "data:application/json," + js.encodeURIComponent(stats_json())
+    link.download = "tic-tac-toe-stats.json"
+    link.click()
+
+def on_key(event):
+    if event.key == "`":
+        toggle_stats()
+
 # --- Event Listeners Setup ---
 def setup_event_listeners():
-    document.getElementById("singlePlayerBtn").addEventListener("click", create_proxy(lambda e: select_mode('single')))
+    document.getElementById("singlePlayerBtn").addEventListener("click", create_proxy(lambda e: select_mode(game.SINGLE)))
     document.getElementById("onlineFriendBtn").addEventListener("click", create_proxy(lambda e: switch_screen('matchmaking')))
-    document.getElementById("localTwoPlayerBtn").addEventListener("click", create_proxy(lambda e: select_mode('local')))
+    document.getElementById("localTwoPlayerBtn").addEventListener("click", create_proxy(lambda e: select_mode(game.LOCAL)))
     
     document.getElementById("connectBtn").addEventListener("click", create_proxy(start_matchmaking))
     document.getElementById("matchmakingBackBtn").addEventListener("click", create_proxy(lambda e: switch_screen('mode_selection')))
@@ -562,13 +862,22 @@ def setup_event_listeners():
     document.getElementById("backBtn").addEventListener("click", create_proxy(lambda e: switch_screen('mode_selection')))
     document.getElementById("newGameBtn").addEventListener("click", create_proxy(start_new_game))
     document.getElementById("resetScoresBtn").addEventListener("click", create_proxy(reset_all_scores))
-    
-    for cell in cells:
-        cell.addEventListener("click", create_proxy(handle_cell_click))
+    document.getElementById("undoBtn").addEventListener("click", create_proxy(undo_move))
+    document.getElementById("redoBtn").addEventListener("click", create_proxy(redo_move))
+    document.getElementById("statsExportBtn").addEventListener("click", create_proxy(export_stats))
+    document.addEventListener("keydown", create_proxy(on_key))
+    # For field reports: ticTacToeStats() in the console gives the JSON
+    js.window.ticTacToeStats = create_proxy(stats_json)
 
 # --- Initialize Game ---
+configure_board(3, 3)
 setup_event_listeners()
 update_scores()
+renderer.on_flush = on_render_flush
+if js.URLSearchParams.new(js.location.search).get("stats"):
+    toggle_stats()
+# Build the AI table after the page is interactive, not before
+scheduler.call_later(0, solver.solve)
 print("Tic-Tac-Toe loaded successfully!")
 
 
@@ -0,0 +1,151 @@
+"""Field measurements for the page: timing rings and a few gauges.
+
+Each timing keeps its last RING_SIZE samples in a fixed array('d'), so
+recording allocates nothing, and is summarised as count, p50/p95/p99 and
+max only when someone looks. Until enable() every hook returns after one
+attribute check, so the calls stay in the hot paths for good.
+
+    recorder.start("ai_move") ... recorder.stop("ai_move")
+    recorder.record("frame", ms)
+    recorder.gauge("interactive_ms", ms)
+    recorder.to_json()
+
+The page (main.py) shows the summary in an overlay (toggle with the `
+key, or open the page with ?stats=1) and exports it as JSON, also from
+the console: ``ticTacToeStats()``.
+
+create_proxy/destroy_proxy wrap pyodide.ffi's so the live proxy count is
+always known.
+"""
+import json
+import time
+from array import array
+
+RING_SIZE = 256
+PERCENTILES = (50, 95, 99)
+
+
+def perf_now_ms():
+    return time.perf_counter() * 1000
+
+
+class Ring:
+    """The last ``size`` samples, oldest overwritten first."""
+
+    __slots__ = ("samples", "size", "count", "total")
+
+    def __init__(self, size=RING_SIZE):
+        self.samples = array("d", bytes(8 * size))
+        self.size = size
+        self.count = 0  # Samples seen, including overwritten ones
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples[self.count % self.size] = value
+        self.count += 1
+        self.total += value
+
+    def values(self):
+        return self.samples[:min(self.count, self.size)]
+
+    def summary(self):
+        ordered = sorted(self.values())
+        if not ordered:
+            return {"count": 0}
+        out = {"count": self.count, "mean": round(self.total / self.count, 2)}
+        for pct in PERCENTILES:
+            out[f"p{pct}"] = round(ordered[min(len(ordered) - 1, len(ordered) * pct // 100)], 2)
+        out["max"] = round(ordered[-1], 2)
+        return out
+
+
+class Recorder:
+    def __init__(self, now=perf_now_ms, ring_size=RING_SIZE):
+        self.now = now  # ms clock; the page uses performance.now() (clock.now_ms)
+        self.ring_size = ring_size
+        self.enabled = False
+        self.rings = {}
+        self.started = {}
+        self.gauges = {}
+        self.proxies = 0  # Live pyodide proxies made through create_proxy()
+
+    def enable(self):
+        self.enabled = True
+
+    # --- Hooks ---
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        ring = self.rings.get(name)
+        if ring is None:
+            ring = self.rings[name] = Ring(self.ring_size)
+        ring.add(ms)
+
+    def start(self, name, at=None):
+        # Open a timing; at is a start time on the same clock (e.g. event.timeStamp)
+        if self.enabled:
+            self.started[name] = self.now() if at is None else at
+
+    def stop(self, name):
+        # Close the timing opened by start(name), if there is one
+        if self.enabled:
+            began = self.started.pop(name, None)
+            if began is not None:
+                self.record(name, self.now() - began)
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    # --- Reports ---
+    def snapshot(self):
+        return {
+            "timings": {name: ring.summary() for name, ring in sorted(self.rings.items())},
+            "gauges": dict(self.gauges, live_proxies=self.proxies),
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def format(self):
+        # Plain-text table for the overlay
+        snapshot = self.snapshot()
+        lines = [f"{'ms':<18}{'n':>8}" + "".join(f"{'p' + str(pct):>8}" for pct in PERCENTILES) + f"{'max':>8}"]
+        for name, summary in snapshot["timings"].items():
+            lines.append(f"{name:<18}{summary['count']:>8}"
+                         + "".join(f"{summary[f'p{pct}']:>8.1f}" for pct in PERCENTILES)
+                         + f"{summary['max']:>8.1f}")
+        lines.extend(f"{name:<18}{value:>8}" for name, value in sorted(snapshot["gauges"].items()))
+        return "\n".join(lines)
+
+
+recorder = Recorder()
+
+
+def create_proxy(callback):
+    from pyodide.ffi import create_proxy as make_proxy #type: ignore
+
+    recorder.proxies += 1
+    return make_proxy(callback)
+
+def destroy_proxy(proxy):
+    proxy.destroy()
+    recorder.proxies -= 1
+
+
+def _benchmark(calls=1000000):
+    # Cost of a hook call, disabled and enabled, on CPython
+    for enabled in (False, True):
+        hooks = Recorder()
+        if enabled:
+            hooks.enable()
+        start = time.perf_counter()
+        for _ in range(calls):
+            hooks.start("bench")
+            hooks.stop("bench")
+        seconds = time.perf_counter() - start
+        print(f"{'enabled ' if enabled else 'disabled'}: {seconds / calls * 1e9:,.0f} ns per start+stop pair")
+    print(hooks.format())
+
+if __name__ == "__main__":
+    _benchmark()
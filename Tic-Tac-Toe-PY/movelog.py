@@ -0,0 +1,234 @@
+"""Move logs and the match-history file.
+
+MoveLog is one game as an append-only byte string: one byte per move
+(the cell index; X moves first and turns alternate, so the side is the
+move's parity) plus the sequence number of the move before the first.
+Undo and redo move a cursor over the bytes, and replaying the bytes onto
+an empty board rebuilds any position exactly.
+
+The history file stores finished games as fixed-width records after a
+16-byte header, so a reader can mmap it and pull whole columns (results,
+lengths, opening moves) out with one strided slice each:
+
+    header  "TTTH" version:u8 size:u8 win_length:u8 pad:u8 record:u32 pad:u32
+    record  time:u32 result:u8 count:u8 moves[size * size] (0xFF padded)
+
+    python movelog.py stats history.bin
+"""
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"TTTH"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxIxxxx")
+RECORD_HEAD = struct.Struct("<IBB")
+NO_MOVE = 0xFF
+
+# Record results
+X_WINS = 0
+O_WINS = 1
+TIE = 2
+TIMEOUT = 3
+RESULT_NAMES = ("X", "O", "TIE", "timeout")
+RESULTS = {"X": X_WINS, "O": O_WINS, "TIE": TIE}
+
+
+class MoveLog:
+    __slots__ = ("moves", "cursor", "base_seq")
+
+    def __init__(self, moves=b"", base_seq=0):
+        self.moves = bytearray(moves)
+        self.cursor = len(self.moves)  # moves[:cursor] are on the board
+        self.base_seq = base_seq
+
+    def __len__(self):
+        return self.cursor
+
+    @property
+    def seq(self):
+        # Sequence number of the last move on the board
+        return self.base_seq + self.cursor
+
+    def played(self):
+        return bytes(self.moves[:self.cursor])
+
+    def append(self, index):
+        # A new move drops whatever could have been redone
+        del self.moves[self.cursor:]
+        self.moves.append(index)
+        self.cursor += 1
+
+    def undo(self):
+        # Index of the move taken back, or None at the start
+        if not self.cursor:
+            return None
+        self.cursor -= 1
+        return self.moves[self.cursor]
+
+    def undone(self):
+        # Moves that redo() can bring back
+        return len(self.moves) - self.cursor
+
+    def redo(self):
+        if self.cursor == len(self.moves):
+            return None
+        self.cursor += 1
+        return self.moves[self.cursor - 1]
+
+    def since(self, seq):
+        # Moves after seq, or None when seq is outside this game
+        if not self.base_seq <= seq <= self.seq:
+            return None
+        return bytes(self.moves[seq - self.base_seq:self.cursor])
+
+    def clear(self, base_seq=None):
+        self.moves.clear()
+        self.cursor = 0
+        if base_seq is not None:
+            self.base_seq = base_seq
+
+
+def replay(position, moves):
+    # Play moves onto position (cleared first), X first; False if one is illegal
+    position.clear()
+    player = "X"
+    for index in moves:
+        if not position.place(index, player):
+            return False
+        player = "O" if player == "X" else "X"
+    return True
+
+
+# --- History file ---
+class HistoryWriter:
+    """Append finished games to a history file, creating it if needed."""
+
+    def __init__(self, path, size=3, win_length=3):
+        self.size = size
+        self.win_length = win_length
+        self.record = RECORD_HEAD.size + size * size
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        # Unbuffered: each record is one append, so several processes can share the file
+        self.file = open(path, "ab", buffering=0)
+        if exists:
+            with open(path, "rb") as f:
+                try:
+                    _, _, file_size, file_length, record = read_header(f.read(HEADER.size))
+                except ValueError:
+                    self.file.close()
+                    raise
+            if (file_size, file_length) != (size, win_length):
+                self.file.close()
+                raise ValueError(f"{path} holds {file_size}x{file_size} games, not {size}x{size}")
+        else:
+            self.file.write(HEADER.pack(MAGIC, VERSION, size, win_length, self.record))
+
+    def append(self, moves, result, when=None):
+        # result is "X", "O", "TIE" or TIMEOUT (lost by the side to move after moves)
+        code = RESULTS.get(result, result)
+        padding = bytes([NO_MOVE]) * (self.record - RECORD_HEAD.size - len(moves))
+        self.file.write(RECORD_HEAD.pack(int(when if when is not None else time.time()), code, len(moves))
+                        + bytes(moves) + padding)
+
+    def close(self):
+        self.file.close()
+
+
+def read_header(data):
+    if len(data) < HEADER.size:
+        raise ValueError(f"Truncated match-history header ({len(data)} of {HEADER.size} bytes)")
+    magic, version, size, win_length, record = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or record != RECORD_HEAD.size + size * size:
+        raise ValueError("Not a match-history file")
+    return magic, version, size, win_length, record
+
+
+class HistoryFile:
+    """Read-only, memory-mapped view of a history file.
+
+    An empty file (HistoryWriter creates it on first write, so a reader can
+    get there first) is an empty history; a short or foreign header raises
+    ValueError.
+    """
+
+    def __init__(self, path, size=3, win_length=3):
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size == 0:
+            # mmap can't map zero bytes; size and win_length stand in for the header
+            self.map = b""
+            self.size, self.win_length, self.record = size, win_length, RECORD_HEAD.size + size * size
+            self.count = 0
+            return
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            _, _, self.size, self.win_length, self.record = read_header(self.map[:HEADER.size])
+        except ValueError:
+            self.close()
+            raise
+        self.count = (len(self.map) - HEADER.size) // self.record
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        # (time, result, moves)
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start = HEADER.size + i * self.record
+        when, result, count = RECORD_HEAD.unpack_from(self.map, start)
+        moves_at = start + RECORD_HEAD.size
+        return when, result, self.map[moves_at:moves_at + count]
+
+    def column(self, offset):
+        # Byte at offset of every record, as one bytes object
+        end = HEADER.size + self.count * self.record
+        return self.map[HEADER.size + offset:end:self.record]
+
+    def stats(self):
+        results = self.column(RECORD_HEAD.size - 2)
+        lengths = self.column(RECORD_HEAD.size - 1)
+        openings = self.column(RECORD_HEAD.size)
+        by_opening = {}
+        for opening, result in zip(openings, results):
+            if opening != NO_MOVE:
+                counts = by_opening.setdefault(opening, [0, 0, 0, 0])
+                counts[result] += 1
+        return {
+            "games": self.count,
+            "results": {name: results.count(code) for code, name in enumerate(RESULT_NAMES)},
+            "average_moves": sum(lengths) / self.count if self.count else 0.0,
+            "openings": {index: dict(zip(RESULT_NAMES, counts)) for index, counts in sorted(by_opening.items())},
+        }
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Match-history file tools")
+    parser.add_argument("command", choices=["stats"])
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    try:
+        history = HistoryFile(args.path)
+    except ValueError as e:
+        parser.error(f"{args.path}: {e}")
+    try:
+        start = time.perf_counter()
+        stats = history.stats()
+        seconds = time.perf_counter() - start
+    finally:
+        history.close()
+    print(json.dumps(stats, indent=2))
+    print(f"scanned {stats['games']} games in {seconds * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
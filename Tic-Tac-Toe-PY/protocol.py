@@ -0,0 +1,139 @@
+"""Compact binary framing for the move-path messages.
+
+JSON stays the default. A client that wants binary connects with
+``?enc=bin1`` in the URL; a server that understands it replies with a
+``hello {encoding: "bin1"}`` text message, and from then on both sides may
+send these four messages as binary frames. Servers that ignore the query
+never send ``hello``, so the client keeps talking JSON.
+
+Layouts (network byte order, player bit 0 = X, 1 = O):
+
+    game_move    [1][room code u32][index u8][player u8]   7 bytes
+    turn_switch  [2][player u8]                            2 bytes
+                 [2][player u8][ms left u32]               6 bytes
+    game_win     [3][line u8][index u8][player u8]         4 bytes
+    game_tie     [4][index u8][player u8]                  3 bytes
+
+``line`` indexes engine.WINNING_CONDITIONS; the winner is always the player
+who made the final move. turn_switch carries the server's turn clock
+(``ms``) when the server runs one.
+
+    python protocol.py    # bytes and encode/decode time, JSON vs binary
+"""
+import struct
+
+import engine
+
+ENCODING = "bin1"
+
+GAME_MOVE = 1
+TURN_SWITCH = 2
+GAME_WIN = 3
+GAME_TIE = 4
+
+_MOVE = struct.Struct("!BIBB")
+_TURN = struct.Struct("!BB")
+_TURN_CLOCK = struct.Struct("!BBI")
+_WIN = struct.Struct("!BBBB")
+_TIE = struct.Struct("!BBB")
+
+_LINES = {tuple(condition): line for line, condition in enumerate(engine.WINNING_CONDITIONS)}
+
+
+# --- Encoders (msg type -> bytes) ---
+def _encode_move(data):
+    return _MOVE.pack(GAME_MOVE, int(data.get("code") or 0), data["index"], engine.SIDES[data["player"]])
+
+def _encode_turn(data):
+    if "ms" in data:
+        return _TURN_CLOCK.pack(TURN_SWITCH, engine.SIDES[data["player"]], data["ms"])
+    return _TURN.pack(TURN_SWITCH, engine.SIDES[data["player"]])
+
+def _encode_win(data):
+    return _WIN.pack(GAME_WIN, _LINES[tuple(data["condition"])], data["index"],
+                     engine.SIDES[data["player"]])
+
+def _encode_tie(data):
+    return _TIE.pack(GAME_TIE, data["index"], engine.SIDES[data["player"]])
+
+ENCODERS = {
+    "game_move": _encode_move,
+    "turn_switch": _encode_turn,
+    "game_win": _encode_win,
+    "game_tie": _encode_tie,
+}
+
+
+# --- Decoders (opcode -> (msg type, data)) ---
+def _decode_move(payload):
+    _, code, index, player = _MOVE.unpack(payload)
+    return "game_move", {"code": code, "index": index, "player": engine.SYMBOLS[player]}
+
+def _decode_turn(payload):
+    if len(payload) == _TURN_CLOCK.size:
+        _, player, ms = _TURN_CLOCK.unpack(payload)
+        return "turn_switch", {"player": engine.SYMBOLS[player], "ms": ms}
+    _, player = _TURN.unpack(payload)
+    return "turn_switch", {"player": engine.SYMBOLS[player]}
+
+def _decode_win(payload):
+    _, line, index, player = _WIN.unpack(payload)
+    symbol = engine.SYMBOLS[player]
+    return "game_win", {"winner": symbol, "condition": engine.WINNING_CONDITIONS[line],
+                        "index": index, "player": symbol}
+
+def _decode_tie(payload):
+    _, index, player = _TIE.unpack(payload)
+    return "game_tie", {"winner": "TIE", "index": index, "player": engine.SYMBOLS[player]}
+
+DECODERS = {
+    GAME_MOVE: _decode_move,
+    TURN_SWITCH: _decode_turn,
+    GAME_WIN: _decode_win,
+    GAME_TIE: _decode_tie,
+}
+
+
+def encode(msg_type, data):
+    # Binary frame for msg_type, or None when it has no binary form
+    encoder = ENCODERS.get(msg_type)
+    return encoder(data) if encoder else None
+
+def decode(payload):
+    # (msg type, data) for a binary frame; ValueError if it is not one of ours
+    if not payload:
+        raise ValueError("Empty binary message")
+    decoder = DECODERS.get(payload[0])
+    if decoder is None:
+        raise ValueError(f"Unknown opcode: {payload[0]}")
+    try:
+        return decoder(payload)
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Bad binary message: {e}")
+
+
+def _benchmark(rounds=200000):
+    import json
+    import time
+
+    samples = [
+        ("game_move", {"code": 48213377, "index": 4, "player": "X"}),
+        ("turn_switch", {"player": "O", "ms": 30000}),
+        ("game_win", {"winner": "X", "condition": [0, 4, 8], "index": 8, "player": "X"}),
+        ("game_tie", {"winner": "TIE", "index": 7, "player": "O"}),
+    ]
+    print(f"{'message':12} {'json B':>7} {'bin B':>6} {'json ns':>8} {'bin ns':>7}")
+    for msg_type, data in samples:
+        text = json.dumps({"type": msg_type, "data": data}, separators=(",", ":"))
+        blob = encode(msg_type, data)
+        timings = []
+        for codec in (lambda: json.loads(json.dumps({"type": msg_type, "data": data})),
+                      lambda: decode(encode(msg_type, data))):
+            start = time.perf_counter_ns()
+            for _ in range(rounds):
+                codec()
+            timings.append((time.perf_counter_ns() - start) / rounds)
+        print(f"{msg_type:12} {len(text):7} {len(blob):6} {timings[0]:8.0f} {timings[1]:7.0f}")
+
+if __name__ == "__main__":
+    _benchmark()
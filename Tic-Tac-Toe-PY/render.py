@@ -0,0 +1,154 @@
+"""Batched DOM updates for the page (runs under Pyodide).
+
+Every Pyodide -> JS attribute write is a bridge crossing, and a move used
+to cost half a dozen of them. BoardRenderer keeps a shadow copy of what
+is on screen (cell states, element text and classes). Setters only record
+the wanted state. Once per animation frame, flush() diffs wanted against
+rendered and ships the changes as one JSON patch to a small JS function,
+so a move, a reset or a celebration is one bridge call however many
+elements it touches. The shadow copy only moves forward once the patch
+has been applied; ids missing from the page are skipped, not fatal.
+"""
+import json
+
+import js
+
+from metrics import create_proxy, destroy_proxy
+
+# Cell state: symbol index (0 empty, 1 X, 2 O) plus WINNING and PLAYABLE
+WINNING = 4
+PLAYABLE = 8  # Ultimate: where the next move may go
+_SYMBOLS = ("", "X", "O")
+_STATE = {"": 0, "X": 1, "O": 2}
+_CELL_CLASSES = {symbol | winning | playable: "cell" + (f" {_SYMBOLS[symbol].lower()}" if symbol else "")
+                 + (" winning" if winning else "") + (" playable" if playable else "")
+                 for symbol in range(3) for winning in (0, WINNING) for playable in (0, PLAYABLE)}
+
+# patch = {"board": id, "cells": [[index, text, class, disabled]],
+#          "text": [[id, textContent]], "class": [[id, className]]}
+APPLY_PATCH_JS = """
+const patch = JSON.parse(json);
+if (patch.cells) {
+    const cells = document.getElementById(patch.board).children;
+    for (const [i, text, cls, disabled] of patch.cells) {
+        const cell = cells[i];
+        cell.textContent = text;
+        cell.className = cls;
+        cell.disabled = disabled;
+    }
+}
+for (const [id, value] of patch.text || []) {
+    const element = document.getElementById(id);
+    if (element) element.textContent = value;
+}
+for (const [id, value] of patch.class || []) {
+    const element = document.getElementById(id);
+    if (element) element.className = value;
+}
+"""
+
+
+class BoardRenderer:
+    def __init__(self, board_id):
+        self.board_id = board_id
+        self.rendered = []
+        self.wanted = []
+        self.rendered_text = {}
+        self.wanted_text = {}
+        self.rendered_class = {}
+        self.wanted_class = {}
+        self.frame = None
+        self.flushes = 0
+        self.on_flush = None  # Called after each patch reaches the DOM
+        self._apply = js.Function.new("json", APPLY_PATCH_JS)
+        self._frame_proxy = create_proxy(self._on_frame)
+
+    def resize(self, count):
+        # Fresh, empty cell elements were just built
+        self.rendered = [0] * count
+        self.wanted = [0] * count
+
+    # --- Wanted state ---
+    def set_cell(self, index, symbol):
+        self.wanted[index] = _STATE[symbol] | self.wanted[index] & PLAYABLE
+        self._request()
+
+    def mark_playable(self, indices):
+        # Exactly these cells get the playable highlight
+        wanted = [state & ~PLAYABLE for state in self.wanted]
+        for index in indices:
+            wanted[index] |= PLAYABLE
+        self.wanted = wanted
+        self._request()
+
+    def mark_winning(self, indices):
+        for index in indices:
+            self.wanted[index] |= WINNING
+        self._request()
+
+    def clear_cells(self):
+        self.wanted = [0] * len(self.wanted)
+        self._request()
+
+    def set_text(self, element_id, value):
+        self.wanted_text[element_id] = value
+        self._request()
+
+    def set_class(self, element_id, value):
+        self.wanted_class[element_id] = value
+        self._request()
+
+    def text(self, element_id):
+        # Latest text given for element_id (no DOM read)
+        return self.wanted_text.get(element_id, self.rendered_text.get(element_id, ""))
+
+    # --- Flushing ---
+    def _request(self):
+        if self.frame is None:
+            self.frame = js.requestAnimationFrame(self._frame_proxy)
+
+    def _on_frame(self, timestamp=None):
+        self.frame = None
+        self.flush()
+
+    def patch(self):
+        # Minimal change set since the last flush; commit() marks it rendered
+        patch = {}
+        cells = [[index, _SYMBOLS[state & 3], _CELL_CLASSES[state], bool(state & 3)]
+                 for index, (state, shown) in enumerate(zip(self.wanted, self.rendered)) if state != shown]
+        if cells:
+            patch["board"] = self.board_id
+            patch["cells"] = cells
+        for key, wanted, rendered in (("text", self.wanted_text, self.rendered_text),
+                                      ("class", self.wanted_class, self.rendered_class)):
+            changes = [[element_id, value] for element_id, value in wanted.items()
+                       if rendered.get(element_id) != value]
+            if changes:
+                patch[key] = changes
+        return patch
+
+    def commit(self):
+        # The last patch() reached the DOM: it is now the rendered state
+        self.rendered = list(self.wanted)
+        for wanted, rendered in ((self.wanted_text, self.rendered_text),
+                                 (self.wanted_class, self.rendered_class)):
+            rendered.update(wanted)
+            wanted.clear()
+
+    def flush(self):
+        # If the apply throws, nothing is committed and the next flush resends it all
+        patch = self.patch()
+        if not patch:
+            self.commit()
+            return
+        self._apply(json.dumps(patch, separators=(",", ":")))
+        self.commit()
+        self.flushes += 1
+        if self.on_flush is not None:
+            self.on_flush()
+
+    def destroy(self):
+        if self.frame is not None:
+            js.cancelAnimationFrame(self.frame)
+            self.frame = None
+        destroy_proxy(self._frame_proxy)
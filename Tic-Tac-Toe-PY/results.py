@@ -0,0 +1,286 @@
+"""Match results and the leaderboard (SQLite in WAL mode).
+
+The game server hands each finished game to ResultStore.submit(), which
+only puts it on a queue. A writer thread drains the queue in batches (up
+to BATCH_SIZE games, or whatever arrived within FLUSH_SECONDS) and
+commits each batch as one transaction: the batch's players are read
+once, their Elo ratings and win/loss/tie counters are updated in Python,
+and the rows go back with executemany. Reads use their own connection;
+WAL lets them run while a batch is being written, and several server
+processes can share one file (BEGIN IMMEDIATE serialises their batches).
+A batch that fails is rolled back and counted in `failed`; the first
+failure of a run of them is logged to stderr, and so is the recovery.
+
+    players  name, elo, wins, losses, ties    index players_by_elo (elo)
+    matches  time, x_player, o_player, winner, moves
+
+top(n) walks players_by_elo from the top and rank(name) counts the
+index entries above the player's rating, so neither reads the table.
+
+    python results.py top results.db
+    python results.py rank results.db NAME
+    python results.py bench --games 200000 --players 5000 --readers 2
+"""
+import argparse
+import os
+import queue
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ELO_START = 1200.0
+ELO_K = 32
+BATCH_SIZE = 1000
+FLUSH_SECONDS = 0.05
+TOP_LIMIT = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    elo REAL NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    ties INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS players_by_elo ON players (elo);
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    x_player INTEGER NOT NULL REFERENCES players (id),
+    o_player INTEGER NOT NULL REFERENCES players (id),
+    winner TEXT NOT NULL,
+    moves BLOB NOT NULL
+);
+"""
+
+# Score for X by winner
+SCORES = {"X": 1.0, "O": 0.0, "TIE": 0.5}
+
+
+def connect(path):
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; a crash may lose the last batch
+    db.execute("PRAGMA busy_timeout=5000")
+    return db
+
+def expected(rating, other):
+    # Elo expected score of rating against other
+    return 1 / (1 + 10 ** ((other - rating) / 400))
+
+
+# --- Reads ---
+def top(db, n=10):
+    # [(name, elo, wins, losses, ties)], best first; n is clamped to 1..TOP_LIMIT
+    # (SQLite reads a negative LIMIT as no limit at all)
+    return db.execute("SELECT name, elo, wins, losses, ties FROM players ORDER BY elo DESC LIMIT ?",
+                      (max(1, min(int(n), TOP_LIMIT)),)).fetchall()
+
+def rank(db, name):
+    # (rank, elo) of name, 1 for the best; None for an unknown player
+    row = db.execute("SELECT elo FROM players WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    above = db.execute("SELECT COUNT(*) FROM players WHERE elo > ?", row).fetchone()[0]
+    return above + 1, row[0]
+
+
+class ResultStore:
+    def __init__(self, path, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue = queue.SimpleQueue()
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.failing_since = None  # `failed` when the current run of failed batches began
+        setup = connect(path)
+        setup.executescript(SCHEMA)
+        setup.close()
+        self.reader = connect(path)  # For top() and rank() on the caller's thread
+        self._writer = threading.Thread(target=self._write_loop, name="results-writer", daemon=True)
+        self._writer.start()
+
+    def submit(self, x_player, o_player, winner, moves=b"", when=None):
+        # Queue one finished game; winner is "X", "O" or "TIE". Never blocks.
+        self.queue.put((when if when is not None else time.time(), x_player, o_player, winner, bytes(moves)))
+
+    def top(self, n=10):
+        return top(self.reader, n)
+
+    def rank(self, name):
+        return rank(self.reader, name)
+
+    def close(self):
+        # Write what is queued, then stop the writer
+        self.queue.put(None)
+        self._writer.join()
+        self.reader.close()
+
+    # --- Writer thread ---
+    def _write_loop(self):
+        db = connect(self.path)
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            if batch:
+                self._write(db, batch)
+        db.close()
+
+    def _write(self, db, batch):
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            players = self._load_players(db, {name for game in batch for name in game[1:3]})
+            matches = []
+            for when, x_name, o_name, winner, moves in batch:
+                x = players[x_name]
+                o = players[o_name]
+                score = SCORES[winner]
+                shift = ELO_K * (score - expected(x[1], o[1]))
+                x[1] += shift
+                o[1] -= shift
+                if winner == "TIE":
+                    x[4] += 1
+                    o[4] += 1
+                else:
+                    winner_row, loser_row = (x, o) if winner == "X" else (o, x)
+                    winner_row[2] += 1
+                    loser_row[3] += 1
+                matches.append((when, x[0], o[0], winner, moves))
+            db.executemany("INSERT INTO matches (time, x_player, o_player, winner, moves) VALUES (?, ?, ?, ?, ?)",
+                           matches)
+            db.executemany("UPDATE players SET elo = ?, wins = ?, losses = ?, ties = ? WHERE id = ?",
+                           [(elo, wins, losses, ties, player_id)
+                            for player_id, elo, wins, losses, ties in players.values()])
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            if self.failing_since is None:
+                # Once per run of failures: a locked or full disk fails every batch until it clears
+                self.failing_since = self.failed
+                print(f"results: writing {len(batch)} games failed: {e!r}; "
+                      f"dropping failed batches until one succeeds", file=sys.stderr, flush=True)
+            self.failed += len(batch)
+            return
+        if self.failing_since is not None:
+            print(f"results: writing again; {self.failed - self.failing_since} games were lost",
+                  file=sys.stderr, flush=True)
+            self.failing_since = None
+        self.written += len(batch)
+        self.batches += 1
+
+    def _load_players(self, db, names):
+        # name -> [id, elo, wins, losses, ties], adding players seen for the first time
+        names = list(names)
+        players = {}
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            rows = db.execute("SELECT name, id, elo, wins, losses, ties FROM players WHERE name IN (%s)"
+                              % ",".join("?" * len(chunk)), chunk)
+            for name, *row in rows:
+                players[name] = row
+        for name in names:
+            if name not in players:
+                cursor = db.execute("INSERT INTO players (name, elo) VALUES (?, ?)", (name, ELO_START))
+                players[name] = [cursor.lastrowid, ELO_START, 0, 0, 0]
+        return players
+
+
+# --- Benchmark ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+def benchmark(games=200000, players=5000, readers=2, seed=0):
+    # Submit games as fast as possible while reader threads query the leaderboard
+    rng = random.Random(seed)
+    names = [f"player{i}" for i in range(players)]
+    winners = ("X", "O", "TIE")
+    moves = bytes([4, 0, 8, 2, 6, 3, 5])
+    directory = tempfile.mkdtemp()
+    store = ResultStore(os.path.join(directory, "bench.db"))
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+
+    def read(samples):
+        db = connect(store.path)
+        local = random.Random(len(samples))
+        clock = time.perf_counter
+        while not stop.is_set():
+            started = clock()
+            top(db, 10)
+            rank(db, local.choice(names))
+            samples.append(clock() - started)
+        db.close()
+
+    threads = [threading.Thread(target=read, args=(samples,)) for samples in latencies]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    for _ in range(games):
+        x, o = rng.sample(names, 2)
+        store.submit(x, o, rng.choice(winners), moves)
+    submitted = time.perf_counter() - start
+    store.close()
+    seconds = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    reads = sorted(sample for samples in latencies for sample in samples)
+    print(f"{games} games, {players} players: queued in {submitted:.2f}s, committed in {seconds:.2f}s "
+          f"({games / seconds:,.0f} games/s, {store.batches} batches, {store.failed} failed)")
+    print(f"{readers} readers, {len(reads)} top-10 + rank queries ({len(reads) / seconds:,.0f}/s): "
+          + "  ".join(f"p{p} {percentile(reads, p) * 1000:.2f}ms" for p in (50, 90, 99)))
+    db = connect(store.path)
+    print("top 3:", [(name, round(elo)) for name, elo, *_ in top(db, 3)])
+    print("plan:", db.execute("EXPLAIN QUERY PLAN SELECT COUNT(*) FROM players WHERE elo > ?", (1200,)).fetchall()[0][-1])
+    db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Match results and leaderboard")
+    commands = parser.add_subparsers(dest="command", required=True)
+    top_parser = commands.add_parser("top", help="best players")
+    top_parser.add_argument("path")
+    top_parser.add_argument("-n", type=int, default=10)
+    rank_parser = commands.add_parser("rank", help="one player's rank")
+    rank_parser.add_argument("path")
+    rank_parser.add_argument("name")
+    bench = commands.add_parser("bench", help="ingestion with concurrent leaderboard reads")
+    bench.add_argument("--games", type=int, default=200000)
+    bench.add_argument("--players", type=int, default=5000)
+    bench.add_argument("--readers", type=int, default=2)
+    bench.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.games, args.players, args.readers, args.seed)
+        return
+    db = connect(args.path)
+    if args.command == "top":
+        for position, (name, elo, wins, losses, ties) in enumerate(top(db, args.n), 1):
+            print(f"{position:>4}  {name:<24} {elo:7.1f}  {wins}W {losses}L {ties}T")
+    else:
+        found = rank(db, args.name)
+        print(f"{args.name}: rank {found[0]}, Elo {found[1]:.1f}" if found else f"{args.name}: no games")
+    db.close()
+
+if __name__ == "__main__":
+    main()
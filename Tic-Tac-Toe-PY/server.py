@@ -0,0 +1,981 @@
+"""Authoritative asyncio game server for the online mode.
+
+Speaks the JSON protocol main.py already uses; every message is
+``{"type": ..., "data": {...}}``.
+
+Client -> server:
+    create_room {player}               join_room {code, player}
+    game_move {code, index, player}    disconnect_room {code}
+    resume {code, session, seq}        sync {code, seq}
+    leaderboard {n, player}            watch_room {code}
+
+Server -> client:
+    room_created {code, session}       room_joined {code, session}
+    opponent_joined {code}             game_move {index, player}
+    turn_switch {player, ms}           game_win {winner, condition, index, player}
+    game_tie {winner: "TIE", index, player}
+    game_timeout {winner, player}      clock {player, ms}
+    opponent_disconnected {disconnected}
+    opponent_reconnecting {player}     opponent_reconnected {player}
+    resumed {code, player, seq}        moves {since, seq, moves}
+    resume_failed {message}
+    error {message}                    move_rejected {index, reason}
+    hello {encoding}                   leaderboard {top, rank, elo}
+    watching {code, spectators}        room_closed {code}
+
+A client that connects with ``?enc=bin1`` gets ``hello {encoding: "bin1"}``
+first and then receives game_move/turn_switch/game_win/game_tie as compact
+binary frames (see protocol.py); it may send game_move the same way.
+
+Moves are checked against the room's own board (right player, right turn,
+empty cell) before anyone else hears about them. After a win or tie the
+room resets and X moves first again, matching start_new_game() on the page.
+
+Turn clock: the server owns every turn's deadline (``--turn-seconds``).
+turn_switch carries the mover's time left in ``ms``. ``clock`` gives the
+same at the start of each game and after a resume. A player who runs out
+loses the round (game_timeout). The next game's clock starts at once,
+because the server cannot see the page's "Next Round" button.
+
+Resuming: every accepted move bumps the room's ``seq``. Each player sees
+exactly one turn_switch/game_win/game_tie/game_timeout per accepted move
+(a timeout counts as one), so a client
+knows the same number by counting those. A player whose socket drops
+(without disconnect_room) keeps its seat for ``--grace`` seconds, counted
+from the room's first drop, even when both players have dropped. Reconnecting with ``resume {code, session,
+seq}`` re-seats it and replays the messages it missed from the room's move
+log. If the log no longer reaches back, or a game ended in the gap, the
+rest comes as one ``moves`` message: the current game's move log (cell
+indexes, X first) and the seq it ends at. ``sync`` asks for the same at
+any time: the moves after ``seq`` if that lies in the current game, else
+all of them (``since`` says which).
+
+Spectators: ``watch_room {code}`` joins any room as a watcher (up to
+MAX_SPECTATORS per room); disconnect_room (or closing the socket) stops
+watching. A spectator gets the current game as ``moves`` and the clock,
+then every game_move (both sides'), turn_switch, game_win, game_tie,
+game_timeout, clock and opponent_reconnecting/reconnected, and
+room_closed when the room goes. Each event is serialised and framed once
+per encoding and the same bytes are written to every socket. A spectator
+whose socket (kernel buffer capped at SPECTATOR_SNDBUF) has more than
+SPECTATOR_BUFFER bytes queued skips events
+until it drains, then gets a fresh ``moves`` and ``clock`` (a resync), so
+one slow reader costs bounded memory and never holds up the players.
+
+``--history FILE`` appends every finished game to a match-history file
+(see movelog.py); ``python movelog.py stats FILE`` summarises it.
+
+``--results DB`` records every game between two players who sent a
+``player`` id with create_room/join_room in a SQLite results store with
+Elo ratings (see results.py). ``leaderboard`` answers with the top ``n``
+as [name, elo, wins, losses, ties] and the rank of ``player``.
+
+    python server.py --port 8080
+    python server.py --port 8080 --workers 4
+
+With ``--workers`` the parent process accepts connections, reads the first
+message and hands the socket to the worker that owns the room code
+(``code % workers``), so each room lives in exactly one process. A
+connection that later joins, watches or resumes a room owned by another
+worker is handed back to the parent with that message and routed again,
+so one socket can go through any number of rooms. If a worker dies, its
+rooms are gone: new rooms go to the workers still running, clients
+asking for a lost room get "Room N not found", and the server stops once
+no worker is left.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import secrets
+import socket
+import struct
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import engine
+import movelog
+import protocol
+import results
+import wsframe
+
+CODE_LIMIT = 100000000
+GRACE_SECONDS = 20
+TURN_SECONDS = 30
+MAX_PLAYER_ID = 64
+RESUME_LOG = 32  # moves kept per room for replaying to a resumed client
+MAX_SPECTATORS = 10000
+SPECTATOR_BUFFER = 1 << 14  # Bytes queued to a spectator before it skips ahead to a resync
+SPECTATOR_SNDBUF = 1 << 13  # Kernel send buffer of a spectator's socket (Linux doubles it)
+
+# Outcome of a logged move
+CONTINUE = 0
+WIN = 1
+TIE = 2
+TIMEOUT = 3
+
+
+class Client:
+    __slots__ = ("ws", "room", "side", "binary", "watching", "lagging", "moving")
+
+    def __init__(self, ws, binary=False):
+        self.ws = ws
+        self.room = None
+        self.side = engine.X
+        self.binary = binary
+        self.watching = None  # Room this client spectates
+        self.lagging = False  # Spectator skipping events until its socket drains
+        self.moving = None  # Message to replay on the shard that owns its room
+
+
+def pack_move(seq, index, side, outcome=CONTINUE, line=0):
+    # One int per logged move: [seq][line:4][outcome:2][side:1][index:4]
+    return seq << 11 | line << 7 | outcome << 5 | side << 4 | index
+
+def unpack_move(entry):
+    # (seq, index, side, outcome, line)
+    return entry >> 11, entry & 0xF, entry >> 4 & 1, entry >> 5 & 3, entry >> 7 & 0xF
+
+
+class Room:
+    __slots__ = ("code", "x_mask", "o_mask", "turn", "x_client", "o_client",
+                 "sessions", "players", "seq", "log", "moves", "spectators", "expiry", "deadline", "timer")
+
+    def __init__(self, code, creator):
+        self.code = code
+        self.x_mask = 0
+        self.o_mask = 0
+        self.turn = engine.X
+        self.x_client = creator
+        self.o_client = None
+        self.sessions = [secrets.token_hex(8), None]
+        self.players = [None, None]  # Player ids for the results store, by side
+        self.seq = 0
+        self.log = []
+        self.moves = movelog.MoveLog()  # The game in progress, from seq moves.base_seq
+        self.spectators = set()
+        self.expiry = None
+        self.deadline = 0.0
+        self.timer = None
+
+    def reset(self):
+        self.x_mask = 0
+        self.o_mask = 0
+        self.turn = engine.X
+
+    def opponent(self, client):
+        return self.o_client if client is self.x_client else self.x_client
+
+    def occupant(self, side):
+        return self.x_client if side == engine.X else self.o_client
+
+    def seat(self, side, client):
+        if side == engine.X:
+            self.x_client = client
+        else:
+            self.o_client = client
+
+    def record(self, index, side, outcome=CONTINUE, line=0):
+        # Log an accepted move; once it ends the game, return that game's moves
+        self.seq += 1
+        self.log.append(pack_move(self.seq, index, side, outcome, line))
+        if len(self.log) > RESUME_LOG:
+            del self.log[0]
+        if outcome != TIMEOUT:
+            self.moves.append(index)
+        if outcome == CONTINUE:
+            return None
+        moves = self.moves.played()
+        self.moves.clear(self.seq)
+        return moves
+
+
+def encode(msg_type, data):
+    return json.dumps({"type": msg_type, "data": data}, separators=(",", ":"))
+
+def frame_for(frames, client, msg_type, data):
+    # Wire frame of a message in client's encoding, built once per frames dict
+    binary = client.binary and msg_type in protocol.ENCODERS
+    frame = frames.get(binary)
+    if frame is None:
+        if binary:
+            frame = wsframe.encode_frame(wsframe.OP_BINARY, protocol.encode(msg_type, data))
+        else:
+            frame = wsframe.encode_frame(wsframe.OP_TEXT, encode(msg_type, data).encode())
+        frames[binary] = frame
+    return frame
+
+def player_id(data):
+    # The optional "player" field: a stable id the page keeps in localStorage
+    player = data.get("player")
+    return player[:MAX_PLAYER_ID] if isinstance(player, str) and player else None
+
+def wants_binary(path):
+    # True when the upgrade URL asks for the binary move encoding
+    query = parse_qs(urlsplit(path).query)
+    return protocol.ENCODING in query.get("enc", [])
+
+
+class GameServer:
+    def __init__(self, shard=0, shards=1, seed=None, grace=GRACE_SECONDS, turn_seconds=TURN_SECONDS,
+                 history=None, results=None, max_spectators=MAX_SPECTATORS):
+        self.shard = shard
+        self.shards = shards
+        self.grace = grace
+        self.turn_seconds = turn_seconds
+        self.history = history  # movelog.HistoryWriter for finished games, or None
+        self.results = results  # results.ResultStore, or None
+        self.max_spectators = max_spectators
+        self.rooms = {}
+        self.clients = 0
+        self.moves = 0
+        self.games = 0
+        self.resumes = 0
+        self.timeouts = 0
+        self.spectators = 0
+        self.resyncs = 0
+        self.rng = random.Random(seed)
+        self.rehome = None  # Sharded: async (ws, binary, message) handing a socket to another shard
+        self.handlers = {
+            "create_room": self.create_room,
+            "join_room": self.join_room,
+            "game_move": self.game_move,
+            "disconnect_room": self.disconnect_room,
+            "resume": self.resume,
+            "sync": self.sync,
+            "leaderboard": self.leaderboard,
+            "watch_room": self.watch_room,
+        }
+        self.binary_handlers = {
+            protocol.GAME_MOVE: self.game_move,
+        }
+
+    # --- Connections ---
+    async def serve(self, host="0.0.0.0", port=8080):
+        return await asyncio.start_server(self.on_connect, host, port)
+
+    async def on_connect(self, reader, writer):
+        try:
+            path, headers = await wsframe.read_request(reader)
+        except (wsframe.ProtocolError, asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        key, response = wsframe.handshake_response(headers)
+        writer.write(response)
+        if key is None:
+            writer.close()
+            return
+        await self.handle(wsframe.WebSocket(reader, writer), binary=wants_binary(path))
+
+    async def handle(self, ws, first=None, binary=False, greeted=False):
+        client = Client(ws, binary)
+        self.clients += 1
+        try:
+            if binary and not greeted:
+                ws.send(encode("hello", {"encoding": protocol.ENCODING}))
+            if first is not None:
+                self.dispatch(client, first)
+            while client.moving is None:
+                message = await ws.recv()
+                if message is None:
+                    break
+                self.dispatch(client, message)
+                if client.moving is not None:
+                    break
+                # Only wait on the socket when its buffer actually backs up
+                if ws.writer.transport.get_write_buffer_size() > 1 << 16:
+                    await ws.drain()
+        except (wsframe.ProtocolError, ConnectionError):
+            pass
+        finally:
+            self.clients -= 1
+            self.drop(client)
+            if client.moving is None:
+                await ws.close()
+            else:
+                await self.rehome(ws, client.binary, client.moving)
+
+    def send(self, client, msg_type, data):
+        if client is not None:
+            if client.binary and msg_type in protocol.ENCODERS:
+                client.ws.send(protocol.encode(msg_type, data))
+            else:
+                client.ws.send(encode(msg_type, data))
+
+    def broadcast(self, room, msg_type, data, skip=None):
+        # Both players (but skip) and every spectator; one frame per encoding in use
+        frames = {}
+        for client in (room.x_client, room.o_client):
+            if client is not None and client is not skip:
+                client.ws.send_frame(frame_for(frames, client, msg_type, data))
+        for client in room.spectators:
+            if not client.lagging:
+                self.feed(client, frame_for(frames, client, msg_type, data))
+
+    def feed(self, client, frame):
+        # A spectator's queue is bounded: past SPECTATOR_BUFFER it skips to a resync
+        if client.ws.writer.transport.get_write_buffer_size() > SPECTATOR_BUFFER:
+            client.lagging = True
+            asyncio.ensure_future(self.catch_up(client))
+        else:
+            client.ws.send_frame(frame)
+
+    async def catch_up(self, client):
+        # Once the socket drains, the current game replaces the events it skipped
+        await client.ws.drain()
+        client.lagging = False
+        room = client.watching
+        if room is not None and not client.ws.closed:
+            self.resyncs += 1
+            self.send_moves(client, room, room.moves.base_seq)
+            if room.timer is not None:
+                self.send(client, "clock", self.clock(room))
+
+    def dispatch(self, client, message):
+        if isinstance(message, bytes):
+            self.dispatch_binary(client, message)
+            return
+        try:
+            msg = json.loads(message)
+            handler = self.handlers.get(msg["type"])
+            data = msg.get("data") or {}
+            if not isinstance(data, dict):
+                raise TypeError
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send(client, "error", {"message": "Malformed message."})
+            return
+        if handler is None:
+            self.send(client, "error", {"message": f"Unknown message type: {msg['type']}"})
+            return
+        handler(client, data)
+
+    def dispatch_binary(self, client, message):
+        handler = self.binary_handlers.get(message[0]) if message else None
+        if handler is None:
+            self.send(client, "error", {"message": "Unknown binary message."})
+            return
+        try:
+            _, data = protocol.decode(message)
+        except ValueError as e:
+            self.send(client, "error", {"message": str(e)})
+            return
+        handler(client, data)
+
+    # --- Rooms ---
+    def new_code(self):
+        # Codes owned by this shard satisfy code % shards == shard
+        while True:
+            code = self.rng.randrange(1, CODE_LIMIT // self.shards) * self.shards + self.shard
+            if 0 < code <= CODE_LIMIT and code not in self.rooms:
+                return code
+
+    def create_room(self, client, data):
+        self.leave(client)
+        room = Room(self.new_code(), client)
+        room.players[engine.X] = player_id(data)
+        self.rooms[room.code] = room
+        client.room = room
+        client.side = engine.X
+        self.send(client, "room_created", {"code": room.code, "session": room.sessions[engine.X]})
+
+    def join_room(self, client, data):
+        try:
+            code = int(data.get("code"))
+        except (TypeError, ValueError):
+            self.send(client, "error", {"message": "Room code must be a number."})
+            return
+        if self.elsewhere(client, code, "join_room", data):
+            return
+        room = self.rooms.get(code)
+        if room is None:
+            self.send(client, "error", {"message": f"Room {code} not found."})
+            return
+        if room.x_client is client:
+            self.send(client, "error", {"message": "You are already in this room."})
+            return
+        if room.sessions[engine.O] is not None:
+            self.send(client, "error", {"message": f"Room {code} is full."})
+            return
+        self.leave(client)
+        room.o_client = client
+        room.sessions[engine.O] = secrets.token_hex(8)
+        room.players[engine.O] = player_id(data)
+        client.room = room
+        client.side = engine.O
+        self.send(client, "room_joined", {"code": code, "session": room.sessions[engine.O]})
+        self.send(room.x_client, "opponent_joined", {"code": code})
+        self.start_clock(room)
+        self.broadcast(room, "clock", self.clock(room))
+
+    def game_move(self, client, data):
+        room = client.room
+        index = data.get("index")
+        if room is None or room.sessions[engine.O] is None:
+            self.reject(client, index, "No game in progress.")
+            return
+        if type(index) is not int or not 0 <= index < 9:
+            self.reject(client, index, "Invalid cell.")
+            return
+        player = engine.SYMBOLS[client.side]
+        if data.get("player", player) != player:
+            self.reject(client, index, f"You are playing {player}.")
+            return
+        if room.turn != client.side:
+            self.reject(client, index, "Not your turn.")
+            return
+        bit = engine.CELL_BITS[index]
+        if (room.x_mask | room.o_mask) & bit:
+            self.reject(client, index, "Cell already taken.")
+            return
+
+        if client.side == engine.X:
+            room.x_mask |= bit
+            mask = room.x_mask
+        else:
+            room.o_mask |= bit
+            mask = room.o_mask
+        self.moves += 1
+
+        if engine.WIN_TABLE[mask]:
+            self.games += 1
+            condition = engine.winning_line(mask)
+            room.reset()
+            self.archive(room, room.record(index, client.side, WIN, engine.WINNING_CONDITIONS.index(condition)),
+                         player, player)
+            self.broadcast(room, "game_win", {"winner": player, "condition": condition,
+                                              "index": index, "player": player})
+            self.next_game(room)
+        elif (room.x_mask | room.o_mask) == engine.FULL_MASK:
+            self.games += 1
+            room.reset()
+            self.archive(room, room.record(index, client.side, TIE), "TIE", "TIE")
+            self.broadcast(room, "game_tie", {"winner": "TIE", "index": index, "player": player})
+            self.next_game(room)
+        else:
+            room.turn ^= 1
+            room.record(index, client.side)
+            self.start_clock(room)
+            self.broadcast(room, "game_move", {"index": index, "player": player}, skip=client)
+            self.broadcast(room, "turn_switch", self.clock(room))
+
+    def reject(self, client, index, reason):
+        self.send(client, "move_rejected", {"index": index, "reason": reason})
+
+    def archive(self, room, moves, result, winner):
+        # A finished game: history file (result may be TIMEOUT) and results store
+        if self.history is not None:
+            self.history.append(moves, result)
+        x_player, o_player = room.players
+        if self.results is not None and x_player and o_player and x_player != o_player:
+            self.results.submit(x_player, o_player, winner, moves)
+
+    # --- Turn clock ---
+    def start_clock(self, room):
+        self.stop_clock(room)
+        if self.turn_seconds:
+            loop = asyncio.get_running_loop()
+            room.deadline = loop.time() + self.turn_seconds
+            room.timer = loop.call_at(room.deadline, self.turn_timeout, room)
+
+    def stop_clock(self, room):
+        if room.timer is not None:
+            room.timer.cancel()
+            room.timer = None
+
+    def clock(self, room):
+        # {player, ms}: whose turn it is and, with a clock running, their time left
+        data = {"player": engine.SYMBOLS[room.turn]}
+        if room.timer is not None:
+            data["ms"] = max(0, int((room.deadline - asyncio.get_running_loop().time()) * 1000))
+        return data
+
+    def next_game(self, room):
+        self.start_clock(room)
+        if room.timer is not None:
+            self.broadcast(room, "clock", self.clock(room))
+
+    def turn_timeout(self, room):
+        # The player on turn ran out of time and loses the round
+        room.timer = None
+        side = room.turn
+        self.games += 1
+        self.timeouts += 1
+        room.reset()
+        # The loser is the side to move after the logged moves
+        self.archive(room, room.record(0, side, TIMEOUT), movelog.TIMEOUT, engine.SYMBOLS[side ^ 1])
+        self.broadcast(room, "game_timeout", {"winner": engine.SYMBOLS[side ^ 1],
+                                              "player": engine.SYMBOLS[side]})
+        self.next_game(room)
+
+    def disconnect_room(self, client, data):
+        self.leave(client)
+
+    def elsewhere(self, client, code, msg_type, data):
+        # Sharded: another worker owns room `code`, so the connection moves there with this message
+        if self.rehome is None or code % self.shards == self.shard:
+            return False
+        self.leave(client)
+        client.moving = encode(msg_type, data)
+        return True
+
+    def leave(self, client):
+        # Drop client from its room; the room closes and the opponent is told
+        self.unwatch(client)
+        room = client.room
+        if room is None:
+            return
+        client.room = None
+        opponent = room.opponent(client)
+        self.close_room(room)
+        if opponent is not None:
+            opponent.room = None
+            self.send(opponent, "opponent_disconnected",
+                      {"disconnected": engine.SYMBOLS[client.side]})
+
+    def close_room(self, room):
+        self.stop_clock(room)
+        if room.expiry is not None:
+            room.expiry.cancel()
+            room.expiry = None
+        if self.rooms.get(room.code) is room:
+            del self.rooms[room.code]
+        frames = {}
+        for spectator in room.spectators:
+            spectator.watching = None
+            spectator.ws.send_frame(frame_for(frames, spectator, "room_closed", {"code": room.code}))
+        self.spectators -= len(room.spectators)
+        room.spectators.clear()
+
+    # --- Spectators ---
+    def watch_room(self, client, data):
+        try:
+            code = int(data.get("code"))
+        except (TypeError, ValueError):
+            self.send(client, "error", {"message": "Room code must be a number."})
+            return
+        if self.elsewhere(client, code, "watch_room", data):
+            return
+        room = self.rooms.get(code)
+        if room is None:
+            self.send(client, "error", {"message": f"Room {code} not found."})
+            return
+        if client.watching is not room:
+            if len(room.spectators) >= self.max_spectators:
+                self.send(client, "error", {"message": f"Room {code} has too many spectators."})
+                return
+            self.leave(client)
+            sock = client.ws.writer.get_extra_info("socket")
+            if sock is not None:
+                # Without a cap the kernel would grow the buffer to megabytes before we see any backlog
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SPECTATOR_SNDBUF)
+            # drain() then waits for a lagging spectator's backlog to get down to a quarter
+            client.ws.writer.transport.set_write_buffer_limits(SPECTATOR_BUFFER, SPECTATOR_BUFFER // 4)
+            room.spectators.add(client)
+            client.watching = room
+            self.spectators += 1
+        self.send(client, "watching", {"code": code, "spectators": len(room.spectators)})
+        self.send_moves(client, room, room.moves.base_seq)
+        if room.timer is not None:
+            self.send(client, "clock", self.clock(room))
+
+    def unwatch(self, client):
+        room = client.watching
+        if room is not None:
+            client.watching = None
+            client.lagging = False
+            room.spectators.discard(client)
+            self.spectators -= 1
+
+    # --- Reconnects ---
+    def drop(self, client):
+        # Lost socket: hold the seat for the grace period instead of leaving
+        self.unwatch(client)
+        room = client.room
+        if room is None:
+            return
+        if not self.grace or room.sessions[engine.O] is None:
+            self.leave(client)
+            return
+        client.room = None
+        room.seat(client.side, None)
+        self.broadcast(room, "opponent_reconnecting", {"player": engine.SYMBOLS[client.side]})
+        # Held even with both seats empty (a shared network drop); expire() closes it
+        if room.expiry is None:
+            room.expiry = asyncio.get_running_loop().call_later(self.grace, self.expire, room)
+
+    def expire(self, room):
+        # Grace period over: whoever is still seated wins by forfeit
+        room.expiry = None
+        self.close_room(room)
+        for client in (room.x_client, room.o_client):
+            if client is not None:
+                client.room = None
+                self.send(client, "opponent_disconnected",
+                          {"disconnected": engine.SYMBOLS[client.side ^ 1]})
+
+    def resume(self, client, data):
+        try:
+            code = int(data.get("code"))
+            since = int(data.get("seq", 0))
+        except (TypeError, ValueError):
+            self.send(client, "resume_failed", {"message": "Bad resume request."})
+            return
+        if self.elsewhere(client, code, "resume", data):
+            return
+        room = self.rooms.get(code)
+        session = data.get("session")
+        if room is None or not session or session not in room.sessions:
+            self.send(client, "resume_failed", {"message": "Session expired."})
+            return
+        side = room.sessions.index(session)
+        previous = room.occupant(side)
+        if previous is not client:
+            if previous is not None:
+                # Half-open old socket: its handler's drop() becomes a no-op
+                previous.room = None
+                asyncio.ensure_future(previous.ws.close())
+            self.leave(client)
+        room.seat(side, client)
+        client.room = room
+        client.side = side
+        if room.expiry is not None and room.x_client is not None and room.o_client is not None:
+            room.expiry.cancel()
+            room.expiry = None
+        self.resumes += 1
+        player = engine.SYMBOLS[side]
+        self.send(client, "resumed", {"code": code, "player": player, "seq": since})
+        if not self.replay(client, room, since):
+            self.send_moves(client, room, room.moves.base_seq)
+        if room.timer is not None:
+            self.send(client, "clock", self.clock(room))
+        self.broadcast(room, "opponent_reconnected", {"player": player}, skip=client)
+
+    def replay(self, client, room, since):
+        # Re-send what client missed after move `since`; False if the current game's moves are needed
+        if since == room.seq:
+            return True
+        entries = [unpack_move(entry) for entry in room.log if entry >> 11 > since]
+        if since > room.seq or not entries or entries[0][0] != since + 1:
+            return False
+        for n, (seq, index, side, outcome, line) in enumerate(entries):
+            player = engine.SYMBOLS[side]
+            if outcome == WIN:
+                self.send(client, "game_win", {"winner": player, "condition": engine.WINNING_CONDITIONS[line],
+                                               "index": index, "player": player})
+            elif outcome == TIE:
+                self.send(client, "game_tie", {"winner": "TIE", "index": index, "player": player})
+            elif outcome == TIMEOUT:
+                self.send(client, "game_timeout", {"winner": engine.SYMBOLS[side ^ 1], "player": player})
+            else:
+                if side != client.side:
+                    self.send(client, "game_move", {"index": index, "player": player})
+                self.send(client, "turn_switch", {"player": engine.SYMBOLS[side ^ 1]})
+                continue
+            # Moves of the next game go out as one moves message instead
+            return n == len(entries) - 1
+        return True
+
+    def sync(self, client, data):
+        room = client.room or client.watching
+        if room is None:
+            self.send(client, "error", {"message": "Not in a room."})
+            return
+        try:
+            since = int(data.get("seq", 0))
+        except (TypeError, ValueError):
+            self.send(client, "error", {"message": "Bad sync request."})
+            return
+        self.send_moves(client, room, since)
+
+    def leaderboard(self, client, data):
+        if self.results is None:
+            self.send(client, "error", {"message": "No leaderboard on this server."})
+            return
+        try:
+            n = max(1, min(int(data.get("n", 10)), results.TOP_LIMIT))
+        except (TypeError, ValueError):
+            self.send(client, "error", {"message": "Bad leaderboard request."})
+            return
+        answer = {"top": [list(row) for row in self.results.top(n)], "rank": None, "elo": None}
+        found = self.results.rank(player_id(data)) if player_id(data) else None
+        if found:
+            answer["rank"], answer["elo"] = found
+        self.send(client, "leaderboard", answer)
+
+    def send_moves(self, client, room, since):
+        # The current game's moves after `since`, or all of them if it lies outside the game
+        moves = room.moves.since(since)
+        if moves is None:
+            since = room.moves.base_seq
+            moves = room.moves.played()
+        self.send(client, "moves", {"since": since, "seq": room.seq, "moves": list(moves)})
+
+    def stats(self):
+        return {"shard": self.shard, "rooms": len(self.rooms), "clients": self.clients,
+                "moves": self.moves, "games": self.games, "resumes": self.resumes,
+                "timeouts": self.timeouts, "spectators": self.spectators, "resyncs": self.resyncs}
+
+
+async def report_stats(servers, interval):
+    while True:
+        await asyncio.sleep(interval)
+        for server in servers:
+            print(time.strftime("%H:%M:%S"), json.dumps(server.stats()), flush=True)
+
+
+def open_history(path):
+    return movelog.HistoryWriter(path) if path else None
+
+def open_results(path):
+    return results.ResultStore(path) if path else None
+
+
+# --- Single process ---
+async def serve_forever(host, port, stats_interval=0, grace=GRACE_SECONDS, turn_seconds=TURN_SECONDS,
+                        history=None, results_path=None):
+    game_server = GameServer(grace=grace, turn_seconds=turn_seconds, history=open_history(history),
+                             results=open_results(results_path))
+    server = await game_server.serve(host, port)
+    print(f"Tic-Tac-Toe server listening on ws://{host}:{port}", flush=True)
+    if stats_interval:
+        asyncio.ensure_future(report_stats([game_server], stats_interval))
+    async with server:
+        await server.serve_forever()
+
+
+# --- Sharded workers ---
+def shard_for(message, shards, counter, live=None):
+    # Room-owning shard for a message; new rooms go round-robin over the live shards
+    try:
+        msg = json.loads(message)
+        if msg.get("type") in ("join_room", "resume", "watch_room"):
+            return int(msg["data"]["code"]) % shards
+    except (ValueError, KeyError, TypeError, AttributeError):
+        pass
+    if live is None:
+        live = range(shards)
+    return live[next(counter) % len(live)]
+
+def refuse(sock, payload):
+    # Best-effort "room not found" for a room whose worker died; the caller closes sock
+    try:
+        code = json.loads(payload)["data"]["code"]
+        message = encode("error", {"message": f"Room {code} not found."})
+        sock.send(wsframe.encode_frame(wsframe.OP_TEXT, message.encode()))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+def pack_hand_off(binary, opcode, payload, leftover=b""):
+    # [len][binary flag][opcode][payload][bytes already read past the first frame]
+    return struct.pack("!IB", len(payload) + 1, binary) + bytes([opcode]) + payload + leftover
+
+def unpack_hand_off(blob):
+    # (binary, opcode, payload, leftover)
+    size, binary = struct.unpack_from("!IB", blob)
+    return bool(binary), blob[5], blob[6:5 + size], blob[5 + size:]
+
+async def first_message(reader):
+    # First complete data message, skipping pings; (opcode, payload)
+    while True:
+        fin, opcode, payload = await wsframe.read_frame(reader)
+        if opcode in (wsframe.OP_TEXT, wsframe.OP_BINARY) and fin:
+            return opcode, payload
+        if opcode == wsframe.OP_CLOSE:
+            return None, b""
+        if opcode not in (wsframe.OP_PING, wsframe.OP_PONG):
+            raise wsframe.ProtocolError("Fragmented first message")
+
+async def hand_off(sock, controls, counter, live):
+    loop = asyncio.get_running_loop()
+    reader = wsframe.SocketReader(sock, loop)
+    try:
+        path, headers = await wsframe.read_request(reader)
+        key, response = wsframe.handshake_response(headers)
+        await loop.sock_sendall(sock, response)
+        if key is None:
+            return
+        binary = wants_binary(path)
+        if binary:
+            # Binary clients wait for hello before their first message
+            hello = encode("hello", {"encoding": protocol.ENCODING}).encode()
+            await loop.sock_sendall(sock, wsframe.encode_frame(wsframe.OP_TEXT, hello))
+        opcode, payload = await first_message(reader)
+        if opcode is None:
+            return
+        shard = shard_for(payload, len(controls), counter, live)
+        if shard not in live:
+            refuse(sock, payload)
+            return
+        blob = pack_hand_off(binary, opcode, payload, bytes(reader.buffer))
+        socket.send_fds(controls[shard], [blob], [sock.fileno()])
+    except (wsframe.ProtocolError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        sock.close()
+
+async def route(host, port, controls):
+    loop = asyncio.get_running_loop()
+    listener = socket.create_server((host, port), reuse_port=False, backlog=4096)
+    listener.setblocking(False)
+    counter = iter(range(1 << 62))
+    live = list(range(len(controls)))  # Shards whose worker is still running
+    all_dead = loop.create_future()
+
+    def relay(shard):
+        # A worker gave a socket back: route it again by the message it came with
+        control = controls[shard]
+        try:
+            blob, fds, _, _ = socket.recv_fds(control, 1 << 17, 1)
+        except BlockingIOError:
+            return
+        except OSError:
+            blob, fds = b"", []
+        if not blob and not fds:
+            # EOF: the worker died. Stop watching it and route around it
+            loop.remove_reader(control.fileno())
+            live.remove(shard)
+            print(f"worker {shard} died; {len(live)} of {len(controls)} left", flush=True)
+            if not live and not all_dead.done():
+                all_dead.set_result(None)
+            return
+        try:
+            _, _, payload, _ = unpack_hand_off(blob)
+            target = shard_for(payload, len(controls), counter, live)
+            if target in live:
+                socket.send_fds(controls[target], [blob], fds)
+            else:
+                with socket.socket(fileno=os.dup(fds[0])) as sock:
+                    refuse(sock, payload)
+        except (OSError, struct.error, IndexError):
+            pass
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    async def accept():
+        while True:
+            sock, _ = await loop.sock_accept(listener)
+            loop.create_task(hand_off(sock, controls, counter, live))
+
+    for shard, control in enumerate(controls):
+        loop.add_reader(control.fileno(), relay, shard)
+    print(f"Tic-Tac-Toe server listening on ws://{host}:{port} with {len(controls)} workers", flush=True)
+    accepting = loop.create_task(accept())
+    await all_dead
+    accepting.cancel()
+    listener.close()
+    print("No workers left; stopping", flush=True)
+
+async def adopt(game_server, fd, blob):
+    binary, opcode, payload, leftover = unpack_hand_off(blob)
+    sock = socket.socket(fileno=fd)
+    reader, writer = await asyncio.open_connection(sock=sock)
+    if leftover:
+        reader.feed_data(leftover)
+    first = payload.decode() if opcode == wsframe.OP_TEXT else payload
+    await game_server.handle(wsframe.WebSocket(reader, writer), first, binary, greeted=True)
+
+async def give_back(control, ws, binary, message):
+    # Hand a connection to the parent to be routed to the shard that owns its room
+    leftover = await ws.detach()
+    await ws.drain()
+    sock = ws.writer.get_extra_info("socket")
+    blob = pack_hand_off(binary, wsframe.OP_TEXT, message.encode(), leftover)
+    try:
+        socket.send_fds(control, [blob], [sock.fileno()])
+    except OSError:
+        pass
+    # The parent holds its own copy of the fd: closing ours leaves the connection open
+    ws.writer.transport.abort()
+
+async def worker_main(control, shard, shards, stats_interval, grace, turn_seconds, history, results_path):
+    loop = asyncio.get_running_loop()
+    game_server = GameServer(shard, shards, grace=grace, turn_seconds=turn_seconds,
+                             history=open_history(history), results=open_results(results_path))
+    done = asyncio.Event()
+    control.setblocking(False)
+
+    async def rehome(ws, binary, message):
+        await give_back(control, ws, binary, message)
+    game_server.rehome = rehome
+
+    def on_control():
+        try:
+            blob, fds, _, _ = socket.recv_fds(control, 1 << 17, 1)
+        except BlockingIOError:
+            return
+        if not blob and not fds:
+            done.set()
+            return
+        for fd in fds:
+            loop.create_task(adopt(game_server, fd, blob))
+
+    loop.add_reader(control.fileno(), on_control)
+    if stats_interval:
+        asyncio.ensure_future(report_stats([game_server], stats_interval))
+    await done.wait()
+
+def run_worker(control, shard, shards, stats_interval, grace, turn_seconds, history, results_path):
+    try:
+        asyncio.run(worker_main(control, shard, shards, stats_interval, grace, turn_seconds, history,
+                                results_path))
+    except KeyboardInterrupt:
+        pass
+
+def serve_sharded(host, port, workers, stats_interval=0, grace=GRACE_SECONDS, turn_seconds=TURN_SECONDS,
+                  history=None, results_path=None):
+    if history:
+        # Write the header once; each worker then appends whole records
+        movelog.HistoryWriter(history).close()
+    controls = []
+    processes = []
+    for shard in range(workers):
+        parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        process = multiprocessing.Process(target=run_worker, daemon=True,
+                                          args=(child_end, shard, workers, stats_interval, grace, turn_seconds,
+                                                history, results_path))
+        process.start()
+        child_end.close()
+        controls.append(parent_end)
+        processes.append(process)
+    try:
+        asyncio.run(route(host, port, controls))
+    finally:
+        for control in controls:
+            control.close()
+        for process in processes:
+            process.join(timeout=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe online game server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes to shard rooms across (by room code)")
+    parser.add_argument("--stats", type=float, default=0,
+                        help="print room/client counts every N seconds")
+    parser.add_argument("--grace", type=float, default=GRACE_SECONDS,
+                        help="seconds a dropped player may resume its seat (0: forfeit at once)")
+    parser.add_argument("--turn-seconds", type=float, default=TURN_SECONDS,
+                        help="time per move before the player loses the round (0: no clock)")
+    parser.add_argument("--history", default=None, metavar="FILE",
+                        help="append finished games to this match-history file")
+    parser.add_argument("--results", default=None, metavar="DB",
+                        help="record games and Elo ratings in this SQLite file")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.workers > 1:
+            serve_sharded(args.host, args.port, args.workers, args.stats, args.grace, args.turn_seconds,
+                          args.history, args.results)
+        else:
+            asyncio.run(serve_forever(args.host, args.port, args.stats, args.grace, args.turn_seconds,
+                                      args.history, args.results))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
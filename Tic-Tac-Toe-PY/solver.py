@@ -0,0 +1,166 @@
+"""Perfect-play table for 3x3 Tic-Tac-Toe.
+
+Every reachable position is solved once with negamax and stored under a
+canonical key (the smallest encoding across the 8 board symmetries), so an
+AI move is a symmetry lookup plus a dict hit. Difficulty levels only change
+how a move is sampled from the stored move sets.
+"""
+import random
+
+import engine
+
+# Cell permutations for the 8 symmetries of the square
+_IDENTITY = [0, 1, 2, 3, 4, 5, 6, 7, 8]
+_ROTATE = [6, 3, 0, 7, 4, 1, 8, 5, 2]
+_MIRROR = [2, 1, 0, 5, 4, 3, 8, 7, 6]
+
+def _compose(first, second):
+    return [first[second[i]] for i in range(9)]
+
+def _build_symmetries():
+    perms = []
+    perm = _IDENTITY
+    for _ in range(4):
+        perms.append(perm)
+        perms.append(_compose(perm, _MIRROR))
+        perm = _compose(perm, _ROTATE)
+    return perms
+
+SYMMETRIES = _build_symmetries()
+
+def _mask_table(perm):
+    # table[mask] is mask with cell i moved to perm[i]
+    table = []
+    for mask in range(engine.FULL_MASK + 1):
+        out = 0
+        for i in engine.iter_bits(mask):
+            out |= 1 << perm[i]
+        table.append(out)
+    return table
+
+_FORWARD = [_mask_table(perm) for perm in SYMMETRIES]
+_INVERSE = []
+for _perm in SYMMETRIES:
+    _inv = [0] * 9
+    for _i, _p in enumerate(_perm):
+        _inv[_p] = _i
+    _INVERSE.append(_mask_table(_inv))
+
+DIFFICULTIES = {
+    # chance of playing a best move; otherwise any legal move
+    "easy": 0.25,
+    "medium": 0.6,
+    "hard": 0.85,
+    "impossible": 1.0,
+}
+
+# Packed entry layout: best moves | winning << 9 | drawing << 18 | (value + 1) << 27
+_BEST_BITS = 0
+_WIN_BITS = 9
+_DRAW_BITS = 18
+_VALUE_BITS = 27
+
+_table = {}
+
+
+def canonical(x_mask, o_mask):
+    # (key, symmetry index) of the smallest image of the position
+    best_key = None
+    best_sym = 0
+    for sym, table in enumerate(_FORWARD):
+        key = table[x_mask] | (table[o_mask] << 9)
+        if best_key is None or key < best_key:
+            best_key = key
+            best_sym = sym
+    return best_key, best_sym
+
+def _score(x_mask, o_mask):
+    # Negamax score for the side to move: +(10 - plies) for a forced win,
+    # 0 for a draw, negative for a loss. Faster wins score higher.
+    key, _ = canonical(x_mask, o_mask)
+    entry = _table.get(key)
+    if entry is None:
+        entry = _solve_canonical(key)
+    return entry >> 32
+
+def _solve_canonical(key):
+    x_mask = key & engine.FULL_MASK
+    o_mask = key >> 9
+    occupied = x_mask | o_mask
+    plies = engine.popcount(occupied)
+    x_to_move = plies % 2 == 0
+    mover, other = (x_mask, o_mask) if x_to_move else (o_mask, x_mask)
+
+    if engine.WIN_TABLE[other]:
+        score = -(10 - plies)
+    elif occupied == engine.FULL_MASK:
+        score = 0
+    else:
+        score = None
+
+    best = winning = drawing = 0
+    if score is None:
+        best_score = -100
+        for index in engine.iter_bits(~occupied & engine.FULL_MASK):
+            bit = 1 << index
+            if x_to_move:
+                child = -_score(x_mask | bit, o_mask)
+            else:
+                child = -_score(x_mask, o_mask | bit)
+            if child > 0:
+                winning |= bit
+            elif child == 0:
+                drawing |= bit
+            if child > best_score:
+                best_score = child
+                best = bit
+            elif child == best_score:
+                best |= bit
+        score = best_score
+
+    value = (score > 0) - (score < 0)
+    entry = (best << _BEST_BITS) | (winning << _WIN_BITS) | (drawing << _DRAW_BITS) \
+        | ((value + 1) << _VALUE_BITS) | (score << 32)
+    _table[key] = entry
+    return entry
+
+
+def solve():
+    # Fill the table with every position reachable from the empty board
+    if not _table:
+        _score(0, 0)
+    return _table
+
+def table_size():
+    return len(solve())
+
+def lookup(x_mask, o_mask):
+    """Return ``(value, best, winning, drawing)`` for the side to move.
+
+    ``value`` is 1, 0 or -1; the others are 9-bit move masks in the
+    caller's orientation.
+    """
+    solve()
+    key, sym = canonical(x_mask, o_mask)
+    entry = _table.get(key)
+    if entry is None:
+        entry = _solve_canonical(key)
+    inverse = _INVERSE[sym]
+    value = ((entry >> _VALUE_BITS) & 3) - 1
+    best = inverse[(entry >> _BEST_BITS) & engine.FULL_MASK]
+    winning = inverse[(entry >> _WIN_BITS) & engine.FULL_MASK]
+    drawing = inverse[(entry >> _DRAW_BITS) & engine.FULL_MASK]
+    return value, best, winning, drawing
+
+def best_moves(x_mask, o_mask):
+    return list(engine.iter_bits(lookup(x_mask, o_mask)[1]))
+
+def choose_move(x_mask, o_mask, difficulty="impossible", rng=random):
+    # Sample a move for the side to move; None when the game is over
+    occupied = x_mask | o_mask
+    if occupied == engine.FULL_MASK or engine.WIN_TABLE[x_mask] or engine.WIN_TABLE[o_mask]:
+        return None
+    best = lookup(x_mask, o_mask)[1]
+    if rng.random() < DIFFICULTIES[difficulty]:
+        return rng.choice(list(engine.iter_bits(best)))
+    return rng.choice(engine.legal_moves(x_mask, o_mask))
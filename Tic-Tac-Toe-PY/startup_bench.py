@@ -0,0 +1,232 @@
+"""Page startup benchmark: time to interactive in headless Chrome.
+
+Serves the game over local HTTP, drives Chrome through the DevTools
+protocol and records when the page logs "Game initialized successfully!"
+(performance.now(), so ms since navigation start). Each run launches
+Chrome on a fresh profile and loads the page twice: the first load is
+cold (empty cache, no service worker), the second is warm.
+
+    python startup_bench.py --chrome /usr/bin/google-chrome
+    python startup_bench.py --rev HEAD~1 --runs 5       # an older revision
+    python startup_bench.py --cpu-throttle 4 --latency 150 --throughput 1600
+
+``--rev`` serves the game directory as it was at that git revision, so
+the same command measures before and after a change. Needs a local
+Chrome or Chromium; nothing beyond the standard library.
+"""
+import argparse
+import asyncio
+import functools
+import http.server
+import io
+import itertools
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+import urllib.request
+
+import wsframe
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+READY_LOG = "Game initialized successfully!"
+LOAD_TIMEOUT = 120
+
+# Runs before any page script: note when the game reports it is ready
+MARK_READY_JS = """
+(() => {
+    const log = console.log;
+    console.log = function (...args) {
+        if (window.__tti === undefined && String(args[0]).startsWith(%s)) {
+            window.__tti = performance.now();
+        }
+        return log.apply(this, args);
+    };
+})();
+""" % json.dumps(READY_LOG)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def export_revision(rev, target):
+    # Write the game directory as of git revision rev into target
+    top = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=HERE,
+                         capture_output=True, text=True, check=True).stdout.strip()
+    prefix = os.path.relpath(HERE, top)
+    data = subprocess.run(["git", "archive", "--format=tar", rev, "--", prefix],
+                          cwd=top, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        archive.extractall(target)
+    return os.path.join(target, prefix)
+
+
+def serve(directory):
+    handler = functools.partial(QuietHandler, directory=directory)
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class DevTools:
+    """Just enough of the Chrome DevTools protocol: send a command, await its reply."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.reader = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        while True:
+            message = await self.ws.recv()
+            if message is None:
+                break
+            data = json.loads(message)
+            future = self.pending.pop(data.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(data)
+
+    async def call(self, method, **params):
+        request_id = next(self.ids)
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        self.ws.send(json.dumps({"id": request_id, "method": method, "params": params}))
+        reply = await asyncio.wait_for(future, 30)
+        if "error" in reply:
+            raise RuntimeError(f"{method}: {reply['error'].get('message')}")
+        return reply.get("result", {})
+
+    async def close(self):
+        self.reader.cancel()
+        await self.ws.close()
+
+
+def launch_chrome(chrome, profile, port):
+    return subprocess.Popen([chrome, "--headless=new", f"--remote-debugging-port={port}",
+                             f"--user-data-dir={profile}", "--no-first-run",
+                             "--no-default-browser-check", "about:blank"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def page_target(port):
+    # webSocketDebuggerUrl of the first page tab, once Chrome is listening
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/list", timeout=2) as response:
+                targets = json.load(response)
+            pages = [t for t in targets if t.get("type") == "page"]
+            if pages:
+                return pages[0]["webSocketDebuggerUrl"]
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("Chrome did not expose a page target")
+        await asyncio.sleep(0.2)
+
+
+async def load_once(devtools, url):
+    # Navigate and wait for the ready log; returns ms since navigation start
+    await devtools.call("Page.navigate", url=url)
+    deadline = time.monotonic() + LOAD_TIMEOUT
+    while time.monotonic() < deadline:
+        result = await devtools.call("Runtime.evaluate", expression="window.__tti", returnByValue=True)
+        value = result.get("result", {}).get("value")
+        if value is not None:
+            return value
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"Page did not become interactive within {LOAD_TIMEOUT}s")
+
+
+async def run_once(args, url):
+    port = free_port()
+    profile = tempfile.mkdtemp(prefix="ttt-chrome-")
+    chrome = launch_chrome(args.chrome, profile, port)
+    try:
+        target = await page_target(port)
+        path = target.split(f"127.0.0.1:{port}", 1)[1]
+        devtools = DevTools(await wsframe.connect("127.0.0.1", port, path))
+        try:
+            await devtools.call("Page.enable")
+            await devtools.call("Network.enable")
+            await devtools.call("Page.addScriptToEvaluateOnNewDocument", source=MARK_READY_JS)
+            if args.cpu_throttle > 1:
+                await devtools.call("Emulation.setCPUThrottlingRate", rate=args.cpu_throttle)
+            if args.latency or args.throughput:
+                rate = args.throughput * 1024 / 8 if args.throughput else -1
+                await devtools.call("Network.emulateNetworkConditions", offline=False,
+                                    latency=args.latency, downloadThroughput=rate,
+                                    uploadThroughput=rate)
+            cold = await load_once(devtools, url)
+            # Let the service worker finish installing before the repeat visit
+            await asyncio.sleep(args.settle)
+            warm = await load_once(devtools, url)
+            return cold, warm
+        finally:
+            await devtools.close()
+    finally:
+        chrome.terminate()
+        try:
+            chrome.wait(10)
+        except subprocess.TimeoutExpired:
+            chrome.kill()
+        shutil.rmtree(profile, ignore_errors=True)
+
+
+def summary(label, values):
+    return (f"{label}: median {statistics.median(values):.0f} ms "
+            f"(min {min(values):.0f}, max {max(values):.0f}, n={len(values)})")
+
+
+async def run(args, directory):
+    httpd = serve(directory)
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/index.html"
+    cold, warm = [], []
+    try:
+        for run_index in range(args.runs):
+            first, repeat = await run_once(args, url)
+            cold.append(first)
+            warm.append(repeat)
+            print(f"run {run_index + 1}: cold {first:.0f} ms, warm {repeat:.0f} ms")
+    finally:
+        httpd.shutdown()
+    print(f"revision: {args.rev or 'working tree'}")
+    print(summary("cold load", cold))
+    print(summary("warm load", warm))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time to interactive for the Tic-Tac-Toe page")
+    parser.add_argument("--chrome", default=shutil.which("google-chrome") or shutil.which("chromium")
+                        or "google-chrome", help="Chrome or Chromium executable")
+    parser.add_argument("--rev", default=None, help="git revision to serve (default: working tree)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh browser profiles to measure")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="seconds between the cold and the warm load")
+    parser.add_argument("--cpu-throttle", type=float, default=1, help="CPU slowdown factor")
+    parser.add_argument("--latency", type=float, default=0, help="added round trip, ms")
+    parser.add_argument("--throughput", type=float, default=0, help="download/upload cap, kbit/s")
+    args = parser.parse_args(argv)
+
+    if args.rev is None:
+        asyncio.run(run(args, HERE))
+        return
+    with tempfile.TemporaryDirectory(prefix="ttt-rev-") as target:
+        asyncio.run(run(args, export_revision(args.rev, target)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+// Service worker: repeat visits start from cache, and work offline.
+//
+// The game's files are cached as one versioned set. A deploy bumps VERSION;
+// the new worker downloads the whole set into a fresh cache while the old
+// worker keeps serving the old one, and only once no page of the old
+// version is open does it activate and delete the old cache. Game files are
+// served cache-first from the current set, so a page (including the modules
+// main.py fetches later, when online play is chosen) never mixes two deploys.
+//
+// The Pyodide runtime is versioned by URL and never changes. Its core files
+// are precached at install into a cache that outlives deploys, so offline
+// play works from the first visit after the worker installs. That part is
+// best effort: if the CDN can't be reached the install still succeeds and
+// the runtime is cached on first use instead, as packages always are.
+
+const VERSION = "7";  // Bump on every deploy that changes a file in GAME_FILES
+const CACHE = `tic-tac-toe-v${VERSION}`;
+const RUNTIME_URL = "https://cdn.jsdelivr.net/pyodide/v0.23.4/full/";
+const RUNTIME_CACHE = "pyodide-v0.23.4";
+const RUNTIME_FILES = ["pyodide.js", "pyodide.asm.js", "pyodide.asm.wasm", "python_stdlib.zip", "repodata.json"]
+    .map(name => RUNTIME_URL + name);
+const GAME_FILES = [
+    "./",
+    "index.html",
+    "main.py",
+    "game.py",
+    "movelog.py",
+    "ai.py",
+    "ai_worker.js",
+    "metrics.py",
+    "engine.py",
+    "solver.py",
+    "board.py",
+    "ultimate.py",
+    "clock.py",
+    "render.py",
+    "protocol.py",
+    "connection.py",
+];
+
+self.addEventListener("install", event => {
+    event.waitUntil(Promise.all([
+        // Straight from the network, not the HTTP cache, so the set is all one deploy
+        caches.open(CACHE).then(cache => cache.addAll(GAME_FILES.map(url => new Request(url, { cache: "reload" })))),
+        caches.open(RUNTIME_CACHE).then(cache => cache.addAll(RUNTIME_FILES)).catch(() => {}),
+    ]));
+});
+
+self.addEventListener("activate", event => {
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names
+                .filter(name => name !== CACHE && name !== RUNTIME_CACHE)
+                .map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function cacheFirst(request, cacheName, options) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request, options);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    // pyodide.asm.js comes in through a <script> tag: an opaque response
+    if (cacheName === RUNTIME_CACHE && (response.ok || response.type === "opaque")) {
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+self.addEventListener("fetch", event => {
+    const request = event.request;
+    if (request.method !== "GET") {
+        return;
+    }
+    if (request.url.startsWith(RUNTIME_URL)) {
+        event.respondWith(cacheFirst(request, RUNTIME_CACHE));
+    } else if (new URL(request.url).origin === self.location.origin) {
+        // The page URL may carry ?server=...; it is still the cached page
+        event.respondWith(cacheFirst(request, CACHE, { ignoreSearch: request.mode === "navigate" }));
+    }
+});
@@ -0,0 +1,194 @@
+"""Headless AI-vs-AI tournament runner.
+
+Plays many games with the same engine code the page uses, spread over a
+process pool, and reports throughput, results and per-move latency:
+
+    python tournament.py --a impossible --b random --games 1000000
+    python tournament.py --a nearby --b random --size 15 --k 5 --games 2000
+
+Games are split into fixed-size chunks and chunk ``i`` is seeded with
+``seed + i``, so a run gives the same results whatever ``--workers`` is.
+Player A takes X in even games and O in odd games.
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import board
+import engine
+import solver
+
+# Move latencies go in log-scaled bins: 1 ns wide below 64 ns, then 32 bins
+# per doubling (about 3% wide) up to 2^36 ns (~69 s). Slower moves land in
+# one extra overflow bin and are reported as such. Workers send back
+# counts, never raw samples.
+SUB_BITS = 5
+MAX_BITS = 36
+BIN_COUNT = (MAX_BITS - SUB_BITS + 1) << SUB_BITS
+OVERFLOW = BIN_COUNT  # Index of the overflow bin; histograms have BIN_COUNT + 1 entries
+MAX_NS = 1 << MAX_BITS
+
+def bin_of(ns):
+    if ns >= MAX_NS:
+        return OVERFLOW
+    shift = ns.bit_length() - SUB_BITS - 1
+    if shift <= 0:
+        return ns
+    return (shift << SUB_BITS) + (ns >> shift)
+
+def bin_middle_ns(bucket):
+    # Midpoint of a bin, in ns
+    shift = (bucket >> SUB_BITS) - 1
+    if shift <= 0:
+        return bucket
+    return ((bucket - (shift << SUB_BITS)) << shift) + (1 << shift) / 2
+
+AGENTS = ("random", "easy", "medium", "hard", "impossible", "nearby")
+
+
+def make_agent(name, size):
+    if name == "random":
+        if size == 3:
+            return lambda pos, rng: rng.choice(pos.empty_cells())
+        return lambda pos, rng: rng.choice(pos.empty)
+    if name == "nearby":
+        if size == 3:
+            raise ValueError("'nearby' is for boards bigger than 3x3")
+        return lambda pos, rng: board.choose_move(pos, rng=rng)
+    if name in solver.DIFFICULTIES:
+        if size != 3:
+            raise ValueError(f"'{name}' only plays the 3x3 board")
+        return lambda pos, rng: solver.choose_move(pos.x_mask, pos.o_mask, name, rng)
+    raise ValueError(f"Unknown agent: {name}")
+
+def play_chunk(task):
+    # Play one chunk of games; returns plain counters so results pickle small
+    name_a, name_b, size, k, first_game, games, seed = task
+    rng = random.Random(seed)
+    agents = (make_agent(name_a, size), make_agent(name_b, size))
+    solver.solve()
+
+    wins = draws = losses = moves = 0
+    latency = [[0] * (BIN_COUNT + 1), [0] * (BIN_COUNT + 1)]
+    clock = time.perf_counter_ns
+    for game in range(first_game, first_game + games):
+        pos = engine.Position() if size == 3 else board.Board(size, k)
+        a_side = game % 2  # 0: A plays X
+        result = None
+        while result is None:
+            who = 0 if pos.move_count() % 2 == a_side else 1
+            start = clock()
+            index = agents[who](pos, rng)
+            latency[who][bin_of(clock() - start)] += 1
+            pos.make(index)
+            moves += 1
+            result = pos.result()
+        a_symbol = "X" if a_side == 0 else "O"
+        if result == "TIE":
+            draws += 1
+        elif result == a_symbol:
+            wins += 1
+        else:
+            losses += 1
+    return wins, draws, losses, moves, latency
+
+def percentile(hist, pct):
+    # In us; None when it falls in the overflow bin
+    total = sum(hist)
+    if not total:
+        return 0.0
+    target = total * pct / 100
+    running = 0
+    for bucket, count in enumerate(hist[:OVERFLOW]):
+        running += count
+        if running >= target:
+            return bin_middle_ns(bucket) / 1000
+    return None
+
+def run_tournament(name_a, name_b, games, size=3, k=3, workers=None, seed=0, chunk=5000):
+    # Validate names up front instead of inside every worker
+    make_agent(name_a, size)
+    make_agent(name_b, size)
+    tasks = []
+    for index, first in enumerate(range(0, games, chunk)):
+        tasks.append((name_a, name_b, size, k, first, min(chunk, games - first), seed + index))
+
+    totals = [0, 0, 0, 0]
+    latency = [[0] * (BIN_COUNT + 1), [0] * (BIN_COUNT + 1)]
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(play_chunk, tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(play_chunk, tasks)
+    try:
+        for wins, draws, losses, moves, lat in results:
+            for i, value in enumerate((wins, draws, losses, moves)):
+                totals[i] += value
+            for who in (0, 1):
+                hist = latency[who]
+                for bucket, count in enumerate(lat[who]):
+                    if count:
+                        hist[bucket] += count
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "games": games,
+        "seconds": elapsed,
+        "games_per_second": games / elapsed if elapsed else 0.0,
+        "moves": totals[3],
+        "wins": totals[0],
+        "draws": totals[1],
+        "losses": totals[2],
+        "latency_us": {
+            name: {p: percentile(latency[who], p) for p in (50, 90, 99, 99.9)}
+            for who, name in ((0, "a"), (1, "b"))
+        },
+        "latency_overflow": {"a": latency[0][OVERFLOW], "b": latency[1][OVERFLOW]},
+    }
+
+def format_us(value):
+    return f">{MAX_NS / 1000:,.0f}" if value is None else f"{value:.2f}"
+
+def print_report(name_a, name_b, report):
+    games = report["games"] or 1
+    print(f"{name_a} (A) vs {name_b} (B): {report['games']} games in {report['seconds']:.2f}s")
+    print(f"  {report['games_per_second']:,.0f} games/s, {report['moves'] / report['seconds']:,.0f} moves/s")
+    print(f"  A win {report['wins'] / games:.2%}  draw {report['draws'] / games:.2%}  "
+          f"loss {report['losses'] / games:.2%}")
+    for who, name in (("a", name_a), ("b", name_b)):
+        lat = report["latency_us"][who]
+        overflow = report["latency_overflow"][who]
+        print(f"  {name} move latency (us): p50 {format_us(lat[50])}  p90 {format_us(lat[90])}  "
+              f"p99 {format_us(lat[99])}  p99.9 {format_us(lat[99.9])}"
+              + (f"  ({overflow} moves over {MAX_NS / 1e9:.0f}s)" if overflow else ""))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe AI tournament")
+    parser.add_argument("--a", default="impossible", choices=AGENTS, help="player A")
+    parser.add_argument("--b", default="random", choices=AGENTS, help="player B")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=3, help="board size")
+    parser.add_argument("--k", type=int, default=None, help="win length (default: size, max 5)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=5000, help="games per task")
+    args = parser.parse_args(argv)
+
+    k = args.k or min(args.size, 5)
+    try:
+        report = run_tournament(args.a, args.b, args.games, args.size, k,
+                                args.workers, args.seed, args.chunk)
+    except ValueError as e:
+        parser.error(str(e))
+    print_report(args.a, args.b, report)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""Ultimate Tic-Tac-Toe: nine 3x3 boards inside a 3x3 board.
+
+A move in a small board's cell sends the opponent to the small board in
+the same place on the big one; if that board is already decided (won or
+full) they may play in any open board. Winning a small board claims its
+square on the big board, and three claimed squares in a line win the game.
+
+Every small board is a pair of 9-bit masks, numbered like
+engine.WINNING_CONDITIONS, so a win, a full board or the cells that would
+complete a line are one lookup in a 512-entry table. The big board is two
+more masks of won boards plus a mask of decided ones. Cells are indexed
+row by row on the 9x9 grid, so the UI draws it like any 9x9 board.
+
+Search is iterative-deepening alpha-beta with a transposition table keyed
+by an incrementally updated Zobrist hash (cells, the board the next move
+is sent to, side to move). Moves are tried table move first, then moves
+that win or block a small board, and moves that would give the opponent a
+free choice or a ready-made win last. Like ai.Search it runs in steps, so
+ai.AnytimeEngine can slice it between frames and ai_worker.js can run it
+off the main thread.
+
+    python ultimate.py    # nodes/s and depth reached for a few budgets
+"""
+import random
+import time
+
+import engine
+
+SIZE = 9
+WIN_LENGTH = 3
+DIMENSIONS = (SIZE, WIN_LENGTH)  # What game.new_position() and ai.search_request() look for
+
+X = engine.X
+O = engine.O
+SYMBOLS = engine.SYMBOLS
+SIDES = engine.SIDES
+FULL = engine.FULL_MASK
+ANY = -1  # Next move may go to any open board
+
+# 512-entry tables over a small board's 9-bit mask
+WIN_TABLE = engine.WIN_TABLE
+BIT_COUNT = bytes(engine.popcount(mask) for mask in range(FULL + 1))
+FREE_CELLS = tuple(tuple(engine.iter_bits(~mask & FULL)) for mask in range(FULL + 1))
+# Cells that would complete a line for mask (whether or not they are still free)
+THREATS = tuple(sum(1 << cell for cell in range(9) if not mask >> cell & 1 and WIN_TABLE[mask | 1 << cell])
+                for mask in range(FULL + 1))
+SQUARE_WEIGHTS = (2, 1, 2, 1, 3, 1, 2, 1, 2)  # Center, corners, edges
+WEIGHT = tuple(sum(SQUARE_WEIGHTS[cell] for cell in engine.iter_bits(mask)) for mask in range(FULL + 1))
+
+# Grid index <-> (small board, cell)
+BOARD_OF = bytes((row // 3) * 3 + col // 3 for row in range(SIZE) for col in range(SIZE))
+CELL_OF = bytes((row % 3) * 3 + col % 3 for row in range(SIZE) for col in range(SIZE))
+GRID = tuple(tuple((sub // 3 * 3 + cell // 3) * SIZE + sub % 3 * 3 + cell % 3 for cell in range(9))
+             for sub in range(9))
+
+# Zobrist keys: ZOBRIST[side][index], SENT_KEYS[board + 1] (index 0: any board), SIDE_KEY
+_keys = random.Random(0x7717)
+ZOBRIST = tuple(tuple(_keys.getrandbits(64) for _ in range(SIZE * SIZE)) for _ in range(2))
+SENT_KEYS = tuple(_keys.getrandbits(64) for _ in range(10))
+SIDE_KEY = _keys.getrandbits(64)
+
+MAX_DEPTH = 30
+TABLE_SIZE = 1 << 16  # Entries before the table is cleared (~100 bytes each)
+WIN = 1 << 30
+INFINITY = 1 << 31
+
+# Evaluation weights
+WON_BOARD = 100  # Per square weight of a won small board
+BIG_THREAT = 250  # Open board that would complete a big-board line
+SMALL_THREAT = 12  # Free cell that would win a small board
+# Transposition table entry flags
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class UltimateBoard:
+    """Position and move stack; speaks the UI's board API (see board.Board)."""
+
+    __slots__ = ("size", "win_length", "masks", "won", "decided", "sent", "turn", "moves", "history",
+                 "winner", "key")
+
+    def __init__(self):
+        self.size = SIZE
+        self.win_length = WIN_LENGTH
+        self.clear()
+
+    def clear(self):
+        self.masks = ([0] * 9, [0] * 9)  # masks[side][board]
+        self.won = [0, 0]  # Big-board squares won, by side
+        self.decided = 0  # Boards won or full
+        self.sent = ANY  # Board the side to move must play in
+        self.turn = X
+        self.moves = []
+        self.history = []  # sent before each move
+        self.winner = None
+        self.key = 0
+
+    # --- Queries ---
+    @property
+    def current_player(self):
+        return SYMBOLS[self.turn]
+
+    def cell(self, index):
+        sub = BOARD_OF[index]
+        bit = 1 << CELL_OF[index]
+        if self.masks[X][sub] & bit:
+            return "X"
+        if self.masks[O][sub] & bit:
+            return "O"
+        return ""
+
+    def is_empty(self, index):
+        sub = BOARD_OF[index]
+        return not (self.masks[X][sub] | self.masks[O][sub]) >> CELL_OF[index] & 1
+
+    def is_legal(self, index):
+        sub = BOARD_OF[index]
+        return (self.winner is None and not self.decided >> sub & 1
+                and self.sent in (ANY, sub) and self.is_empty(index))
+
+    def legal_moves(self):
+        if self.winner is not None:
+            return []
+        x_masks, o_masks = self.masks
+        boards = (self.sent,) if self.sent != ANY else FREE_CELLS[self.decided]
+        out = []
+        for sub in boards:
+            grid = GRID[sub]
+            out.extend(grid[cell] for cell in FREE_CELLS[x_masks[sub] | o_masks[sub]])
+        return out
+
+    def empty_cells(self):
+        # Cells the side to move may play
+        return self.legal_moves()
+
+    def move_count(self):
+        return len(self.moves)
+
+    def is_full(self):
+        return self.decided == FULL
+
+    def winning_line(self):
+        # The winner's line in each of the three boards that won the game
+        if self.winner is None:
+            return None
+        side = SIDES[self.winner]
+        return [GRID[sub][cell] for sub in engine.winning_line(self.won[side])
+                for cell in engine.winning_line(self.masks[side][sub])]
+
+    def result(self):
+        if self.winner:
+            return self.winner
+        if self.decided == FULL:
+            return "TIE"
+        return None
+
+    # --- Updates ---
+    def make(self, index):
+        # Play the side to move on index; no legality check
+        side = self.turn
+        sub = BOARD_OF[index]
+        cell = CELL_OF[index]
+        masks = self.masks[side]
+        mask = masks[sub] = masks[sub] | 1 << cell
+        if WIN_TABLE[mask]:
+            self.won[side] |= 1 << sub
+            self.decided |= 1 << sub
+            if WIN_TABLE[self.won[side]]:
+                self.winner = SYMBOLS[side]
+        elif mask | self.masks[side ^ 1][sub] == FULL:
+            self.decided |= 1 << sub
+        self.history.append(self.sent)
+        sent = ANY if self.decided >> cell & 1 else cell
+        self.key ^= ZOBRIST[side][index] ^ SENT_KEYS[self.sent + 1] ^ SENT_KEYS[sent + 1] ^ SIDE_KEY
+        self.sent = sent
+        self.turn = side ^ 1
+        self.moves.append(index)
+
+    def undo(self):
+        index = self.moves.pop()
+        side = self.turn ^ 1
+        sub = BOARD_OF[index]
+        sent = self.history.pop()
+        self.key ^= ZOBRIST[side][index] ^ SENT_KEYS[self.sent + 1] ^ SENT_KEYS[sent + 1] ^ SIDE_KEY
+        self.sent = sent
+        self.turn = side
+        self.masks[side][sub] &= ~(1 << CELL_OF[index])
+        # The move was legal, so its board was open before it
+        self.won[side] &= ~(1 << sub)
+        self.decided &= ~(1 << sub)
+        self.winner = None
+        return index
+
+    def unmake(self, index):
+        if self.moves and self.moves[-1] == index:
+            self.undo()
+
+    def place(self, index, player):
+        # Play player's symbol on index; False for an illegal move or the wrong player
+        if SIDES[player] != self.turn or not self.is_legal(index):
+            return False
+        self.make(index)
+        return True
+
+    def __repr__(self):
+        rows = ["".join(self.cell(row * SIZE + col) or "." for col in range(SIZE)) for row in range(SIZE)]
+        return f"UltimateBoard({'/'.join(rows)}, turn={SYMBOLS[self.turn]})"
+
+
+# --- Evaluation ---
+def evaluate(position):
+    # Side to move's view: won squares, big-board threats and small-board threats
+    decided = position.decided
+    open_boards = FREE_CELLS[decided]
+    total = 0
+    for side in (X, O):
+        own = position.masks[side]
+        other = position.masks[side ^ 1]
+        won = position.won[side]
+        score = WEIGHT[won] * WON_BOARD + BIT_COUNT[THREATS[won] & ~decided & FULL] * BIG_THREAT
+        for sub in open_boards:
+            mine = own[sub]
+            score += BIT_COUNT[THREATS[mine] & ~(mine | other[sub])] * SMALL_THREAT + WEIGHT[mine]
+        total += score if side == position.turn else -score
+    return total
+
+def scored_moves(position):
+    # [(score, index)] for every legal move, best first, by a one-ply look
+    me = position.turn
+    own = position.masks[me]
+    other = position.masks[me ^ 1]
+    decided = position.decided
+    scored = []
+    for index in position.legal_moves():
+        sub = BOARD_OF[index]
+        cell = CELL_OF[index]
+        bit = 1 << cell
+        mine = own[sub] | bit
+        score = SQUARE_WEIGHTS[cell]
+        if WIN_TABLE[mine]:
+            if WIN_TABLE[position.won[me] | 1 << sub]:
+                return [(WIN, index)]  # Wins the game
+            score += 1000 * SQUARE_WEIGHTS[sub]
+        elif WIN_TABLE[other[sub] | bit]:
+            score += 500
+        # Where the opponent is sent: a free choice, or a board they can win at once
+        if cell == sub:
+            sent_decided = WIN_TABLE[mine] or mine | other[sub] == FULL
+            sent_mine = mine
+        else:
+            sent_decided = decided >> cell & 1
+            sent_mine = own[cell]
+        if sent_decided:
+            score -= 300
+        elif THREATS[other[cell]] & ~(sent_mine | other[cell]):
+            score -= 400
+        scored.append((score, index))
+    scored.sort(reverse=True)
+    return scored
+
+def ordered_moves(position, first=None):
+    # Legal moves, most promising first; first (the table's move) leads
+    moves = [index for _, index in scored_moves(position) if index != first]
+    if first is not None and position.is_legal(first):
+        moves.insert(0, first)
+    return moves
+
+def choose_move(position, rng=random):
+    # One-ply pick: one of the best-scored moves, at random
+    scored = scored_moves(position)
+    if not scored:
+        return None
+    return rng.choice([index for score, index in scored if score == scored[0][0]])
+
+
+# --- Search ---
+def now_ms():
+    return time.perf_counter() * 1000
+
+def to_table(score, ply):
+    # Win scores count plies from the root; the table stores them from the node
+    if score > WIN // 2:
+        return score + ply
+    if score < -WIN // 2:
+        return score - ply
+    return score
+
+def from_table(score, ply):
+    if score > WIN // 2:
+        return score - ply
+    if score < -WIN // 2:
+        return score + ply
+    return score
+
+
+# Shared by every Search, so a move's search starts from what the last one stored
+TABLE = {}
+
+
+class Search:
+    """Iterative-deepening alpha-beta on a copy of a position, run in steps.
+
+    ``best`` is always playable: the one-ply pick until the first
+    iteration finishes, then the deepest finished iteration's move.
+    """
+
+    def __init__(self, position, max_depth=MAX_DEPTH, table=None):
+        self.board = UltimateBoard()
+        for index in position.moves:
+            self.board.make(index)
+        self.table = TABLE if table is None else table
+        self.max_depth = min(max_depth, SIZE * SIZE - len(position.moves))
+        moves = ordered_moves(self.board)
+        self.best = moves[0] if moves else None
+        self.depth = 0
+        self.nodes = 0
+        self.hits = 0
+        self._root_best = self.best
+        self._steps = self._iterate()
+
+    def step(self, until_ms):
+        # Search until until_ms (now_ms() clock); True once there is nothing left to search
+        if self._steps is None:
+            return True
+        for _ in self._steps:
+            if now_ms() >= until_ms:
+                return False
+        self._steps = None
+        return True
+
+    def _iterate(self):
+        if self.best is None:
+            return
+        for depth in range(1, self.max_depth + 1):
+            score = yield from self._negamax(depth, -INFINITY, INFINITY, 0)
+            self.best, self.depth = self._root_best, depth
+            if abs(score) >= WIN // 2:
+                return  # Forced result: deeper search can't change the move
+
+    def _negamax(self, depth, alpha, beta, ply):
+        position = self.board
+        self.nodes += 1
+        if not self.nodes & 63:
+            yield
+        if position.winner is not None:
+            return ply - WIN  # The last move won; sooner is worse for us
+        if position.decided == FULL:
+            return 0
+        if depth == 0:
+            return evaluate(position)
+
+        table = self.table
+        key = position.key
+        entry = table.get(key)
+        first = None
+        if entry is not None:
+            entry_depth, flag, score, first = entry
+            if entry_depth >= depth and ply:
+                self.hits += 1
+                score = from_table(score, ply)
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        start_alpha = alpha
+        best = -INFINITY
+        best_move = None
+        for index in ordered_moves(position, first):
+            position.make(index)
+            score = -(yield from self._negamax(depth - 1, -beta, -alpha, ply + 1))
+            position.undo()
+            if score > best:
+                best, best_move = score, index
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        flag = UPPER if best <= start_alpha else LOWER if best >= beta else EXACT
+        if len(table) >= TABLE_SIZE:
+            table.clear()
+        table[key] = (depth, flag, to_table(best, ply), best_move)
+        if not ply:
+            self._root_best = best_move
+        return best
+
+
+def _benchmark(seed=0):
+    # Nodes/s and depth for a few budgets, and raw move speed, on CPython
+    rng = random.Random(seed)
+    position = UltimateBoard()
+    start = time.perf_counter()
+    moves = 0
+    while moves < 200000:
+        position.clear()
+        while position.result() is None:
+            position.make(rng.choice(position.legal_moves()))
+            moves += 1
+        while position.moves:
+            position.undo()
+    seconds = time.perf_counter() - start
+    print(f"random playouts: {moves / seconds:,.0f} make+undo pairs/s (with move generation)")
+
+    for opening in (0, 8, 20):
+        position.clear()
+        while len(position.moves) < opening:
+            position.make(rng.choice(position.legal_moves()))
+        for budget in (50, 300, 1000):
+            TABLE.clear()
+            search = Search(position)
+            start = now_ms()
+            search.step(start + budget)
+            seconds = (now_ms() - start) / 1000
+            print(f"after {opening:2d} moves, {budget:4d} ms: depth {search.depth}, {search.nodes:,} nodes, "
+                  f"{search.nodes / seconds:,.0f} nodes/s, {search.hits:,} table hits, move {search.best}")
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,202 @@
+"""Spectator fan-out benchmark: one room, thousands of watchers.
+
+Sets up one player pair and ``--spectators`` watchers on its room, then
+the pair plays ``--moves`` random moves as fast as the server answers
+(or one per ``--interval`` ms). ``--slow`` of the watchers stop reading
+after they join, with a small receive buffer, so their queues on the
+server fill up; when they read again each must get a resync (a ``moves``
+snapshot) and follow the game from there.
+
+    python watchtest.py --spectators 2000 --moves 400
+    python watchtest.py --spectators 5000 --slow 100 --interval 5
+
+Without ``--host`` a local server.GameServer is started in a child process
+as the stand-in (see loadtest.py). Reports the move -> spectator delay as
+percentiles (the mover's send to a watcher's turn_switch/game_win/...),
+deliveries/s, and (local stand-in only) server heap per spectator and the
+number of resyncs.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+
+import engine
+import loadtest
+import protocol
+import wsframe
+from loadtest import TURN_DONE, ask, message, percentile, receive
+
+SLOW_RECEIVE_BUFFER = 4096
+
+
+class Spectator:
+    __slots__ = ("ws", "slow", "events", "resyncs", "delays", "seq")
+
+    def __init__(self, slow=False):
+        self.ws = None
+        self.slow = slow
+        self.events = 0
+        self.resyncs = 0
+        self.delays = []
+        self.seq = 0  # Moves seen, counted the way a player counts them
+
+    async def join(self, host, port, code):
+        sock = None
+        if self.slow:
+            # Set before connecting, so the TCP window stays this small
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SLOW_RECEIVE_BUFFER)
+            sock.setblocking(False)
+            await asyncio.get_running_loop().sock_connect(sock, (host, port))
+        self.ws = await wsframe.connect(host, port, sock=sock)
+        self.ws.send(message("watch_room", {"code": code}))
+        await receive(self.ws, "watching")
+        _, data = await receive(self.ws, "moves")
+        self.seq = data["seq"]
+        if self.slow:
+            self.ws.writer.transport.pause_reading()
+
+    async def follow(self, sent, clock=time.perf_counter):
+        # Read until the socket closes; sent[seq] is when the mover sent move seq
+        while True:
+            raw = await self.ws.recv()
+            if raw is None:
+                return
+            arrived = clock()
+            self.events += 1
+            if isinstance(raw, bytes):
+                msg_type, data = protocol.decode(raw)
+            else:
+                msg = json.loads(raw)
+                msg_type, data = msg["type"], msg["data"]
+            if msg_type in TURN_DONE:
+                self.seq += 1
+                if self.seq < len(sent):
+                    self.delays.append(arrived - sent[self.seq])
+            elif msg_type == "moves":
+                self.resyncs += 1
+                self.seq = data["seq"]
+
+
+async def play(pair, moves, interval, sent, rng):
+    # The pair plays random games until `moves` moves are in; sent[seq] is each send time
+    clock = time.perf_counter
+    position = engine.Position()
+    for _ in range(moves):
+        if position.result() is not None:
+            position = engine.Position()
+        side = position.turn
+        mover, other = (pair.x, pair.o) if side == engine.X else (pair.o, pair.x)
+        index = rng.choice(position.empty_cells())
+        sent.append(clock())
+        mover.send(message("game_move", {"code": pair.code, "index": index, "player": engine.SYMBOLS[side]}))
+        await receive(mover, *TURN_DONE)
+        await receive(other, *TURN_DONE)
+        position.make(index)
+        if interval:
+            await asyncio.sleep(interval / 1000)
+
+
+async def caught_up(spectators, seq, timeout=60):
+    # Wait until every spectator has seen move seq, or timeout seconds pass
+    deadline = time.perf_counter() + timeout
+    while any(spectator.seq < seq for spectator in spectators) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    control = process = None
+    host, port = args.host, args.port
+    if host is None:
+        control, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=loadtest.run_local_server, args=(child,), daemon=True)
+        process.start()
+        host, port = "127.0.0.1", control.recv()
+
+    pair = loadtest.Pair()
+    await pair.setup(host, port)
+    sent = [0.0]  # sent[seq]; seq 0 is before the first move
+    if control:
+        ask(control, "trace")
+
+    spectators = [Spectator(slow=n < args.slow) for n in range(args.spectators)]
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def join(spectator):
+        async with limit:
+            await spectator.join(host, port, pair.code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(join(spectator) for spectator in spectators))
+    join_seconds = time.perf_counter() - start
+    server_stats = ask(control, "measure") if control else None
+    followers = [asyncio.ensure_future(spectator.follow(sent)) for spectator in spectators]
+    fast = [spectator for spectator in spectators if not spectator.slow]
+    slow = [spectator for spectator in spectators if spectator.slow]
+
+    before = ask(control, "stats") if control else None
+    start = time.perf_counter()
+    await play(pair, args.moves, args.interval, sent, rng)
+    play_seconds = time.perf_counter() - start
+    await caught_up(fast, len(sent) - 1)
+    fanout_seconds = time.perf_counter() - start
+    after = ask(control, "stats") if control else None
+    # Now wake the slow watchers: each should get a resync and follow from there
+    for spectator in slow:
+        spectator.ws.writer.transport.resume_reading()
+    await caught_up(slow, len(sent) - 1)
+    final_stats = ask(control, "stats") if control else None
+
+    await pair.close()
+    for spectator in spectators:
+        await spectator.ws.close()
+    await asyncio.gather(*followers, return_exceptions=True)
+    if control:
+        control.send("stop")
+        process.join(timeout=5)
+
+    delays = sorted(delay for spectator in fast for delay in spectator.delays)
+    events = sum(spectator.events for spectator in fast)
+    print(f"{args.spectators} spectators ({args.slow} slow) joined in {join_seconds:.2f}s: "
+          f"{args.spectators / join_seconds:,.0f} joins/s")
+    print(f"{args.moves} moves in {play_seconds:.2f}s ({args.moves / play_seconds:,.0f} moves/s); "
+          f"{events:,} events reached the fast spectators in {fanout_seconds:.2f}s: "
+          f"{events / fanout_seconds:,.0f} deliveries/s")
+    print("move -> spectator (ms): " + "  ".join(
+        f"p{p} {percentile(delays, p) * 1000:.2f}" for p in (50, 90, 99, 99.9)) +
+          f"  max {delays[-1] * 1000 if delays else 0.0:.2f}")
+    current = sum(spectator.seq == len(sent) - 1 for spectator in slow)
+    print(f"slow spectators: {sum(spectator.resyncs for spectator in slow)} resyncs, "
+          f"{current}/{len(slow)} caught up with the game")
+    if server_stats and server_stats["spectators"]:
+        deliveries = 2 * args.moves * args.spectators
+        cpu = after["cpu_seconds"] - before["cpu_seconds"]
+        print(f"server: {cpu:.2f}s CPU for ~{deliveries:,} deliveries ({cpu / deliveries * 1e6:.2f} us each), "
+              f"{server_stats['traced_bytes'] / server_stats['spectators']:,.0f} bytes per spectator, "
+              f"{final_stats['resyncs']} resyncs sent")
+    return spectators
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spectator fan-out benchmark for the Tic-Tac-Toe server")
+    parser.add_argument("--host", default=None, help="server host (default: local stand-in)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--spectators", type=int, default=2000, help="watchers on the one room")
+    parser.add_argument("--slow", type=int, default=20, help="watchers that stop reading for the run")
+    parser.add_argument("--moves", type=int, default=400, help="moves the pair plays")
+    parser.add_argument("--interval", type=float, default=0, help="ms between moves (0: as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=200, help="watchers joining at once")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # One socket per watcher here, plus one more on a local stand-in
+    loadtest.raise_fd_limit(2 * args.spectators + 256)
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Minimal RFC 6455 WebSocket layer on top of asyncio streams.
+
+Only what the game server and its tools need: the HTTP upgrade handshake,
+text/binary messages, fragmentation, ping/pong and close. No extensions,
+no dependencies.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+
+GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_MESSAGE = 1 << 16
+MAX_HEADER = 8192
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class ProtocolError(Exception):
+    pass
+
+
+# --- Handshake ---
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1(key.strip().encode() + GUID).digest()).decode()
+
+async def read_request(reader):
+    # Read an HTTP request head; returns (path, {lower-case header: value})
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise ProtocolError("Request head too large")
+    if len(head) > MAX_HEADER:
+        raise ProtocolError("Request head too large")
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) < 2:
+        raise ProtocolError(f"Bad request line: {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return parts[1], headers
+
+def handshake_response(headers):
+    # 101 response for a valid upgrade request, or a plain 426 otherwise
+    key = headers.get("sec-websocket-key")
+    if headers.get("upgrade", "").lower() != "websocket" or not key:
+        return None, (b"HTTP/1.1 426 Upgrade Required\r\n"
+                      b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+    response = ("HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n")
+    return key, response.encode()
+
+
+# --- Framing ---
+def mask_payload(payload, mask):
+    # XOR with the 4-byte mask using one big-int operation instead of a loop
+    n = len(payload)
+    if not n:
+        return b""
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+def encode_frame(opcode, payload, masked=False):
+    length = len(payload)
+    head = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if masked else 0
+    if length < 126:
+        head.append(mask_bit | length)
+    elif length < 1 << 16:
+        head.append(mask_bit | 126)
+        head += length.to_bytes(2, "big")
+    else:
+        head.append(mask_bit | 127)
+        head += length.to_bytes(8, "big")
+    if masked:
+        mask = os.urandom(4)
+        return bytes(head) + mask + mask_payload(payload, mask)
+    return bytes(head) + payload
+
+async def read_frame(reader):
+    # Returns (fin, opcode, payload); the reader needs readexactly()
+    b1, b2 = await reader.readexactly(2)
+    length = b2 & 0x7F
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), "big")
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8), "big")
+    if length > MAX_MESSAGE:
+        raise ProtocolError(f"Frame too large: {length} bytes")
+    mask = await reader.readexactly(4) if b2 & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = mask_payload(payload, mask)
+    return bool(b1 & 0x80), b1 & 0x0F, payload
+
+
+class SocketReader:
+    """readexactly()/readuntil() over a raw non-blocking socket.
+
+    Used where the caller must know exactly which bytes are still
+    buffered, e.g. before handing the socket to another process.
+    """
+
+    __slots__ = ("sock", "loop", "buffer")
+
+    def __init__(self, sock, loop=None):
+        self.sock = sock
+        self.loop = loop or asyncio.get_running_loop()
+        self.buffer = bytearray()
+
+    async def _fill(self):
+        data = await self.loop.sock_recv(self.sock, 65536)
+        if not data:
+            raise asyncio.IncompleteReadError(bytes(self.buffer), None)
+        self.buffer += data
+
+    async def readexactly(self, n):
+        while len(self.buffer) < n:
+            await self._fill()
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    async def readuntil(self, separator=b"\n"):
+        while True:
+            end = self.buffer.find(separator)
+            if end >= 0:
+                end += len(separator)
+                data = bytes(self.buffer[:end])
+                del self.buffer[:end]
+                return data
+            if len(self.buffer) > MAX_HEADER:
+                raise ProtocolError("Request head too large")
+            await self._fill()
+
+
+class StreamBuffer:
+    """readexactly() over an asyncio StreamReader, with its own buffer.
+
+    WebSocket reads through one so it knows exactly which bytes it has
+    received but not parsed yet (see WebSocket.detach).
+    """
+
+    __slots__ = ("stream", "buffer")
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = bytearray()
+
+    async def readexactly(self, n):
+        buffer = self.buffer
+        while len(buffer) < n:
+            data = await self.stream.read(1 << 16)
+            if not data:
+                raise asyncio.IncompleteReadError(bytes(buffer), n)
+            buffer += data
+        data = bytes(buffer[:n])
+        del buffer[:n]
+        return data
+
+
+class WebSocket:
+    """One open WebSocket over an asyncio (reader, writer) pair."""
+
+    __slots__ = ("reader", "writer", "is_client", "closed", "frames")
+
+    def __init__(self, reader, writer, is_client=False):
+        self.reader = reader
+        self.writer = writer
+        self.is_client = is_client
+        self.closed = False
+        self.frames = StreamBuffer(reader)
+
+    async def recv(self):
+        # Next text (str) or binary (bytes) message; None once closed
+        parts = []
+        message_op = None
+        while True:
+            try:
+                fin, opcode, payload = await read_frame(self.frames)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                return None
+            if opcode == OP_PING:
+                self._write(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                if not self.closed:
+                    self._write(OP_CLOSE, payload[:2])
+                self.closed = True
+                return None
+            if opcode != OP_CONTINUATION:
+                message_op = opcode
+            elif message_op is None:
+                raise ProtocolError("Continuation frame without a message")
+            parts.append(payload)
+            if fin:
+                data = parts[0] if len(parts) == 1 else b"".join(parts)
+                if sum(map(len, parts)) > MAX_MESSAGE:
+                    raise ProtocolError("Message too large")
+                return data.decode() if message_op == OP_TEXT else data
+
+    def _write(self, opcode, payload):
+        if self.writer.is_closing():
+            self.closed = True
+            return
+        self.writer.write(encode_frame(opcode, payload, self.is_client))
+
+    def send(self, message):
+        # Queue one message; str goes out as text, bytes as binary
+        if self.closed:
+            return
+        if isinstance(message, str):
+            self._write(OP_TEXT, message.encode())
+        else:
+            self._write(OP_BINARY, message)
+
+    def send_frame(self, frame):
+        # Write an already-encoded frame (see encode_frame); servers only
+        if not self.closed and not self.writer.is_closing():
+            self.writer.write(frame)
+
+    async def detach(self):
+        # Stop reading; returns every byte received but not yet parsed (the socket stays open)
+        self.writer.transport.pause_reading()
+        self.reader.feed_eof()
+        rest = await self.reader.read()
+        self.closed = True
+        return bytes(self.frames.buffer) + rest
+
+    async def drain(self):
+        try:
+            await self.writer.drain()
+        except ConnectionError:
+            self.closed = True
+
+    async def close(self, code=1000):
+        if not self.closed:
+            self._write(OP_CLOSE, code.to_bytes(2, "big"))
+            self.closed = True
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def connect(host, port, path="/", sock=None):
+    # Client side of the handshake; returns a WebSocket. sock: an already connected socket to use
+    if sock is None:
+        reader, writer = await asyncio.open_connection(host, port)
+    else:
+        reader, writer = await asyncio.open_connection(sock=sock)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f"GET {path} HTTP/1.1\r\n"
+                  f"Host: {host}:{port}\r\n"
+                  "Upgrade: websocket\r\n"
+                  "Connection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\n"
+                  "Sec-WebSocket-Version: 13\r\n\r\n").encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = head.split(b"\r\n", 1)[0]
+    if status.split(b" ")[1:2] != [b"101"]:
+        writer.close()
+        raise ProtocolError(f"Handshake failed: {status.decode('latin-1')}")
+    if accept_key(key).encode() not in head:
+        writer.close()
+        raise ProtocolError("Handshake failed: bad Sec-WebSocket-Accept")
+    return WebSocket(reader, writer, is_client=True)
@@ -0,0 +1,185 @@
+"""Load generator for rps_server.py.
+
+Opens ``--clients`` simulated players over TCP. Each one queues, plays
+``--matches`` best-of-N matches with random moves (after an optional
+random think time of up to ``--think`` ms) and queues again. Players
+left without a human opponent get the server's bot. Moves are drawn from
+the weapons each match_start announces, so any rule set works.
+
+    python rps_loadtest.py --clients 4000 --matches 5
+    python rps_loadtest.py --host 127.0.0.1 --port 9090 --clients 1000
+    python rps_loadtest.py --rules rpsls
+
+Without ``--host`` a local rps_server.MatchServer is started in a child
+process as the stand-in. Reports matches/s and rounds/s, and the round
+latency (round_start received -> round_result received) as percentiles.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+import time
+
+import Rock_Paper_Scissor as rps
+import rps_server
+
+
+class Stats:
+    def __init__(self):
+        self.matches = 0
+        self.rounds = 0
+        self.errors = 0
+        self.latency = []
+
+
+def message(msg_type, **fields):
+    return rps_server.encode(msg_type, **fields)
+
+async def receive(reader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Server closed the connection")
+    msg = json.loads(line)
+    if msg["type"] == "error":
+        raise RuntimeError(msg.get("message"))
+    return msg
+
+
+async def play(host, port, matches, think, rng, stats, limit):
+    clock = time.perf_counter
+    # Connections are opened at a bounded rate; the matches then overlap freely
+    async with limit:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(matches):
+            writer.write(message("play"))
+            round_started = None
+            weapons = None
+            while True:
+                msg = await receive(reader)
+                msg_type = msg["type"]
+                if msg_type == "match_start":
+                    weapons = msg["weapons"]
+                elif msg_type == "round_start":
+                    round_started = clock()
+                    if think:
+                        await asyncio.sleep(rng.uniform(0, think) / 1000)
+                    writer.write(message("move", round=msg["round"], move=rng.choice(weapons)))
+                elif msg_type == "round_result":
+                    stats.latency.append(clock() - round_started)
+                    stats.rounds += 1
+                elif msg_type == "match_end":
+                    stats.matches += 1
+                    break
+    finally:
+        writer.close()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+# --- Local stand-in server ---
+def run_local_server(control, best_of, bot_after, rules="classic"):
+    async def main():
+        loop = asyncio.get_running_loop()
+        match_server = rps_server.MatchServer(rps.resolve_rules(rules), best_of=best_of,
+                                              bot_after=bot_after, seed=0)
+        listener = await match_server.serve("127.0.0.1", 0)
+        control.send(listener.sockets[0].getsockname()[1])
+        done = asyncio.Event()
+
+        def on_control():
+            if control.recv() == "stats":
+                control.send(match_server.stats())
+            else:
+                done.set()
+
+        loop.add_reader(control.fileno(), on_control)
+        await done.wait()
+        listener.close()
+
+    asyncio.run(main())
+
+def ask(control, command):
+    control.send(command)
+    return control.recv()
+
+
+async def run(args):
+    stats = Stats()
+    rng = random.Random(args.seed)
+    control = process = None
+    host, port = args.host, args.port
+    if host is None:
+        control, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=run_local_server,
+                                          args=(child, args.best_of, args.bot_after, args.rules), daemon=True)
+        process.start()
+        host, port = "127.0.0.1", control.recv()
+
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def client(seed):
+        try:
+            await play(host, port, args.matches, args.think, random.Random(seed), stats, limit)
+        except (OSError, RuntimeError, ValueError):
+            stats.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(rng.random()) for _ in range(args.clients)))
+    seconds = time.perf_counter() - start
+    server_stats = ask(control, "stats") if control else None
+
+    if control:
+        control.send("stop")
+        process.join(timeout=5)
+
+    latency = sorted(stats.latency)
+    print(f"{args.clients} clients, {stats.matches} matches, {stats.rounds} rounds in {seconds:.2f}s: "
+          f"{stats.matches / seconds:,.0f} matches/s, {stats.rounds / seconds:,.0f} rounds/s")
+    print("round latency (ms): " + "  ".join(
+        f"p{p} {percentile(latency, p) * 1000:.2f}" for p in (50, 90, 99, 99.9)))
+    if server_stats:
+        print(f"server: {server_stats['matches_played']} matches played, "
+              f"{server_stats['bot_matches']} against the bot")
+    if stats.errors:
+        print(f"{stats.errors} clients failed")
+    return stats
+
+def raise_fd_limit(needed):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed and soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for the Rock, Paper, Scissors match server")
+    parser.add_argument("--host", default=None, help="server host (default: local stand-in)")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--clients", type=int, default=2000, help="simulated players")
+    parser.add_argument("--matches", type=int, default=3, help="matches per player")
+    parser.add_argument("--think", type=float, default=0, help="max random think time per move, ms")
+    parser.add_argument("--concurrency", type=int, default=200, help="connections opened at once")
+    parser.add_argument("--best-of", type=int, default=rps_server.BEST_OF, help="local stand-in only")
+    parser.add_argument("--bot-after", type=float, default=0.2,
+                        help="local stand-in: seconds in the queue before the bot steps in")
+    parser.add_argument("--rules", default="classic",
+                        help="local stand-in: rule set name or JSON rule file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.host is None:
+        try:
+            rps.resolve_rules(args.rules)
+        except (OSError, ValueError) as e:
+            parser.error(f"--rules: {e}")
+
+    # One socket per client here, plus one on a local stand-in
+    raise_fd_limit(2 * args.clients + 256)
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
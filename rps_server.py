@@ -0,0 +1,312 @@
+"""Rock, Paper, Scissors match server (asyncio, newline-delimited JSON over TCP).
+
+Clients queue for a match, get paired with the next waiting player (or
+with Rock_Paper_Scissor.PredictiveBot if nobody turns up within
+``--bot-after`` seconds) and play best-of-N. Moves are sealed: the
+server reveals both only once both are in or the round deadline passes.
+A player who misses the deadline loses the round; if both miss it, the
+round is a tie.
+
+Every message is one JSON object per line: {"type": ..., **fields}.
+
+Client -> server:
+    play        {}                      join the matchmaking queue
+    move        {round, move}           this round's weapon
+    leave       {}                      leave the queue or forfeit the match
+
+Server -> client:
+    queued      {}
+    match_start {opponent: "human"|"bot", best_of, rules, weapons}
+    round_start {round, ms}             ms until the round deadline
+    round_result {round, you, opponent, result, score}
+                                        result is "win"/"tie"/"loss";
+                                        a missed move shows as null
+    match_end   {result, score, reason} reason: "score"/"rounds"/"opponent_left"
+    error       {message}
+
+Matches and players are __slots__ objects driven by callbacks on one
+event loop (no task per match), so thousands of matches fit in one
+process.
+
+    python rps_server.py --port 9090 --best-of 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import Rock_Paper_Scissor as rps
+
+BEST_OF = 3
+ROUND_SECONDS = 10
+BOT_AFTER_SECONDS = 2
+MAX_LINE = 1024
+# Ties don't count towards best-of-N; stop after N * ROUND_LIMIT rounds anyway
+ROUND_LIMIT = 3
+# A match is a handful of rounds, so the bot gets small tables: at most 4 KB
+# per context length (full order 3 for classic and RPSLS, order 0 for large
+# rule sets), whatever rule set the server runs
+BOT_FLOATS = 1 << 10
+
+
+def encode(msg_type, **fields):
+    return (json.dumps({"type": msg_type, **fields}, separators=(",", ":")) + "\n").encode()
+
+
+class Player:
+    __slots__ = ("writer", "match", "side", "queue_timer")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.match = None
+        self.side = 0
+        self.queue_timer = None
+
+    def send(self, msg_type, **fields):
+        if not self.writer.is_closing():
+            self.writer.write(encode(msg_type, **fields))
+
+    def send_raw(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(message)
+
+
+class Match:
+    __slots__ = ("players", "bot", "best_of", "round", "moves", "score", "timer")
+
+    def __init__(self, players, best_of, bot=None):
+        self.players = players  # [Player, Player or None]; None is the bot's seat
+        self.bot = bot
+        self.best_of = best_of
+        self.round = 0
+        self.moves = [None, None]
+        self.score = [0, 0]
+        self.timer = None
+
+
+class MatchServer:
+    def __init__(self, rules=rps.CLASSIC, best_of=BEST_OF, round_seconds=ROUND_SECONDS,
+                 bot_after=BOT_AFTER_SECONDS, seed=None):
+        self.rules = rules
+        self.best_of = best_of
+        self.round_seconds = round_seconds
+        self.bot_after = bot_after
+        self.rng = random.Random(seed)
+        self.waiting = {}  # Player -> None, in arrival order
+        self.matches = set()
+        self.clients = 0
+        self.matches_played = 0
+        self.bot_matches = 0
+        self.rounds_played = 0
+        self.handlers = {
+            "play": self.queue,
+            "move": self.move,
+            "leave": self.leave,
+        }
+
+    def stats(self):
+        return {"clients": self.clients, "waiting": len(self.waiting), "matches": len(self.matches),
+                "matches_played": self.matches_played, "bot_matches": self.bot_matches,
+                "rounds": self.rounds_played}
+
+    async def serve(self, host, port):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+
+    async def handle(self, reader, writer):
+        player = Player(writer)
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                    handler = self.handlers[msg["type"]]
+                except (ValueError, KeyError, TypeError):
+                    player.send("error", message="Unknown message")
+                    continue
+                handler(player, msg)
+        finally:
+            self.clients -= 1
+            self.leave(player)
+            writer.close()
+
+    # --- Matchmaking ---
+    def queue(self, player, msg=None):
+        if player.match is not None or player in self.waiting:
+            player.send("error", message="Already playing or queued")
+            return
+        if self.waiting:
+            other = next(iter(self.waiting))
+            self.unqueue(other)
+            self.start_match([other, player])
+            return
+        self.waiting[player] = None
+        player.send("queued")
+        if self.bot_after is not None:
+            loop = asyncio.get_running_loop()
+            player.queue_timer = loop.call_later(self.bot_after, self.bot_timeout, player)
+
+    def unqueue(self, player):
+        if player.queue_timer is not None:
+            player.queue_timer.cancel()
+            player.queue_timer = None
+        self.waiting.pop(player, None)
+
+    def bot_timeout(self, player):
+        player.queue_timer = None
+        if player in self.waiting:
+            self.unqueue(player)
+            bot = rps.PredictiveBot(rng=random.Random(self.rng.random()), rules=self.rules, budget=BOT_FLOATS)
+            self.start_match([player, None], bot)
+
+    # --- Matches ---
+    def start_match(self, players, bot=None):
+        match = Match(players, self.best_of, bot)
+        self.matches.add(match)
+        if bot is not None:
+            self.bot_matches += 1
+        for side, player in enumerate(players):
+            if player is not None:
+                player.match = match
+                player.side = side
+                player.send("match_start", opponent="bot" if bot is not None else "human",
+                            best_of=self.best_of, rules=self.rules.name, weapons=self.rules.weapons)
+        self.start_round(match)
+
+    def start_round(self, match):
+        match.round += 1
+        match.moves = [None, None]
+        if match.bot is not None:
+            # Sealed like anyone else's: decided before the human's move arrives
+            match.moves[1] = match.bot.choose()
+        # Same message for both seats: encode it once
+        message = encode("round_start", round=match.round, ms=int(self.round_seconds * 1000))
+        for player in match.players:
+            if player is not None:
+                player.send_raw(message)
+        match.timer = asyncio.get_running_loop().call_later(self.round_seconds, self.end_round, match)
+
+    def move(self, player, msg):
+        match = player.match
+        if match is None:
+            player.send("error", message="Not in a match")
+            return
+        code = self.rules.codes.get(str(msg.get("move", "")).lower())
+        if code is None or msg.get("round") != match.round:
+            player.send("error", message="Invalid move")
+            return
+        if match.moves[player.side] is not None:
+            player.send("error", message="Move already sealed")
+            return
+        match.moves[player.side] = code
+        if None not in match.moves:
+            self.end_round(match)
+
+    def end_round(self, match):
+        # Both moves are in, or the deadline passed
+        if match.timer is not None:
+            match.timer.cancel()
+            match.timer = None
+        first, second = match.moves
+        if first is None or second is None:
+            # A missing move loses; two missing moves tie
+            outcome = rps.TIE if first is second else (rps.LOSS if first is None else rps.WIN)
+        else:
+            outcome = self.rules.outcome(first, second)
+        if match.bot is not None and first is not None:
+            match.bot.update(first)
+        if outcome == rps.WIN:
+            match.score[0] += 1
+        elif outcome == rps.LOSS:
+            match.score[1] += 1
+        self.rounds_played += 1
+        weapons = self.rules.weapons
+        shown = [weapons[move] if move is not None else None for move in match.moves]
+        for side, player in enumerate(match.players):
+            if player is not None:
+                # outcome is from side 0's view; WIN <-> LOSS for side 1
+                result = outcome if side == 0 or outcome == rps.TIE else 3 - outcome
+                player.send("round_result", round=match.round, you=shown[side], opponent=shown[side ^ 1],
+                            result=rps.RESULT_NAMES[result], score=[match.score[side], match.score[side ^ 1]])
+        needed = match.best_of // 2 + 1
+        if max(match.score) >= needed:
+            self.end_match(match, "score")
+        elif match.round >= match.best_of * ROUND_LIMIT:
+            self.end_match(match, "rounds")
+        else:
+            self.start_round(match)
+
+    def end_match(self, match, reason):
+        if match.timer is not None:
+            match.timer.cancel()
+            match.timer = None
+        self.matches.discard(match)
+        self.matches_played += 1
+        first, second = match.score
+        for side, player in enumerate(match.players):
+            if player is None:
+                continue
+            mine, theirs = (first, second) if side == 0 else (second, first)
+            result = "win" if mine > theirs else "loss" if mine < theirs else "tie"
+            if reason == "opponent_left":
+                result = "win"
+            player.match = None
+            player.send("match_end", result=result, score=[mine, theirs], reason=reason)
+
+    def leave(self, player, msg=None):
+        self.unqueue(player)
+        match = player.match
+        if match is None:
+            return
+        player.match = None
+        match.players[player.side] = None
+        self.end_match(match, "opponent_left")
+
+
+async def report_stats(match_server, interval):
+    while True:
+        await asyncio.sleep(interval)
+        print(time.strftime("%H:%M:%S"), json.dumps(match_server.stats()), flush=True)
+
+async def serve_forever(host, port, rules, best_of, round_seconds, bot_after, stats_interval=0):
+    match_server = MatchServer(rules, best_of, round_seconds, bot_after)
+    server = await match_server.serve(host, port)
+    print(f"Rock, Paper, Scissors server listening on {host}:{port}", flush=True)
+    if stats_interval:
+        asyncio.ensure_future(report_stats(match_server, stats_interval))
+    async with server:
+        await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rock, Paper, Scissors match server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--best-of", type=int, default=BEST_OF, help="rounds to win: best_of // 2 + 1")
+    parser.add_argument("--round-seconds", type=float, default=ROUND_SECONDS,
+                        help="time to seal a move before the round is lost")
+    parser.add_argument("--bot-after", type=float, default=BOT_AFTER_SECONDS,
+                        help="seconds in the queue before playing the bot")
+    parser.add_argument("--rules", default="classic",
+                        help=f"variant: {', '.join(rps.RULE_SETS)} or a JSON rule file")
+    parser.add_argument("--stats", type=float, default=0,
+                        help="print client/match counts every N seconds")
+    args = parser.parse_args(argv)
+
+    try:
+        rules = rps.resolve_rules(args.rules)
+    except (OSError, ValueError) as e:
+        parser.error(f"--rules: {e}")
+    try:
+        asyncio.run(serve_forever(args.host, args.port, rules, args.best_of, args.round_seconds,
+                                  args.bot_after, args.stats))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Round-robin tournament between Rock, Paper, Scissors strategies.
+
+Every pair of registered strategies (Rock_Paper_Scissor.OPPONENTS, plus
+whatever ``--plugin`` modules register) plays one ``--rounds`` match with
+fresh state. The pairs are spread over a process pool, slowest first.
+Results never travel back through the pool's pipes: each worker adds its
+match's win/tie/loss counts straight into a shared-memory matrix (a
+multiprocessing.RawArray of S x S x 3 int64 counts, row strategy against
+column strategy, handed to the workers when they start). Each pair's two
+cells belong to exactly one task, so no lock is needed.
+
+    python rps_tournament.py --rounds 1000000
+    python rps_tournament.py --rounds 200000 --processes 4 --strategies random,cycle,wsls
+    python rps_tournament.py --plugin my_strategies --rules rpsls
+
+Reports rounds/s over the whole run and a table ranked by score (a win is
+1 point, a tie 1/2), then each strategy's net result (wins - losses, per
+round) against every other.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import time
+
+import Rock_Paper_Scissor as rps
+
+DEFAULT_ROUNDS = 1_000_000
+
+# Set in each worker by init_worker
+_matrix = None
+_names = None
+_rules = None
+_rounds = 0
+_seed = None
+
+
+def init_worker(matrix, names, rules_name, rounds, seed, plugins):
+    global _matrix, _names, _rules, _rounds, _seed
+    rps.load_plugins(plugins)
+    _matrix = matrix
+    _names = names
+    _rules = rps.resolve_rules(rules_name)
+    _rounds = rounds
+    _seed = seed
+
+
+def play_pair(pair):
+    # One match; the counts go into the shared matrix, only the pair comes back
+    a, b = pair
+    rng = random.Random(f"{_seed}:{_names[a]}:{_names[b]}")
+    first = rps.OPPONENTS[_names[a]](rng=random.Random(rng.random()), rules=_rules)
+    second = rps.OPPONENTS[_names[b]](rng=random.Random(rng.random()), rules=_rules)
+    wins, ties, losses = rps.play_match(first, second, _rounds, _rules)
+    size = len(_names)
+    for row, column, counts in ((a, b, (wins, ties, losses)), (b, a, (losses, ties, wins))):
+        cell = (row * size + column) * 3
+        _matrix[cell:cell + 3] = counts
+    return pair
+
+
+def run(names, rounds, processes, rules_name="classic", seed=None, plugins=()):
+    """Play every pair of names; returns (matrix, seconds).
+
+    matrix[(row * S + column) * 3 + k] is row's wins (k=0), ties (1) and
+    losses (2) against column, S = len(names).
+    """
+    size = len(names)
+    matrix = multiprocessing.RawArray("q", size * size * 3)
+    # Anything with the learning bots in it takes longest; start those first
+    cost = {name: 10 if name == "predictive" else 1 for name in names}
+    pairs = sorted(itertools.combinations(range(size), 2),
+                   key=lambda pair: -(cost[names[pair[0]]] + cost[names[pair[1]]]))
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes, initializer=init_worker,
+                              initargs=(matrix, names, rules_name, rounds, seed, list(plugins))) as pool:
+        for _ in pool.imap_unordered(play_pair, pairs):
+            pass
+    return matrix, time.perf_counter() - start
+
+
+def ranking(matrix, names):
+    # [(score, name, wins, ties, losses)], best first
+    size = len(names)
+    rows = []
+    for row, name in enumerate(names):
+        wins = ties = losses = 0
+        for column in range(size):
+            cell = (row * size + column) * 3
+            wins += matrix[cell]
+            ties += matrix[cell + 1]
+            losses += matrix[cell + 2]
+        rows.append((wins + ties / 2, name, wins, ties, losses))
+    rows.sort(key=lambda entry: (-entry[0], entry[1]))
+    return rows
+
+
+def print_report(matrix, names, rounds, seconds, processes):
+    size = len(names)
+    total = rounds * size * (size - 1) // 2
+    print(f"{size} strategies, {size * (size - 1) // 2} pairs x {rounds:,} rounds = {total:,} rounds "
+          f"in {seconds:.2f}s on {processes} processes: {total / seconds:,.0f} rounds/s")
+    print()
+    print(f"{'rank':>4}  {'strategy':<12} {'score':>7}  {'wins':>7} {'ties':>7} {'losses':>7}")
+    played = rounds * (size - 1) or 1
+    for position, (score, name, wins, ties, losses) in enumerate(ranking(matrix, names), 1):
+        print(f"{position:>4}  {name:<12} {score / played:7.1%}  {wins / played:7.1%} "
+              f"{ties / played:7.1%} {losses / played:7.1%}")
+    print()
+    print("net (wins - losses) per round, row against column:")
+    width = max(8, max(len(name) for name in names) + 1)
+    print(" " * 12 + "".join(f"{name:>{width}}" for name in names))
+    for row, name in enumerate(names):
+        cells = []
+        for column in range(size):
+            cell = (row * size + column) * 3
+            cells.append("-" if row == column else f"{(matrix[cell] - matrix[cell + 2]) / (rounds or 1):+.3f}")
+        print(f"{name:<12}" + "".join(f"{text:>{width}}" for text in cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Round-robin tournament between Rock, Paper, Scissors strategies")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="rounds per pair")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--strategies", default=None,
+                        help="comma-separated strategy names (default: every registered one)")
+    parser.add_argument("--plugin", action="append", default=[], metavar="MODULE",
+                        help="import MODULE first, so it can register strategies (repeatable)")
+    parser.add_argument("--rules", default="classic",
+                        help=f"variant: {', '.join(rps.RULE_SETS)} or a JSON rule file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        rps.load_plugins(args.plugin)
+    except ImportError as e:
+        parser.error(f"--plugin: {e}")
+    try:
+        rps.resolve_rules(args.rules)
+    except (OSError, ValueError) as e:
+        parser.error(f"--rules: {e}")
+    names = args.strategies.split(",") if args.strategies else sorted(rps.OPPONENTS)
+    unknown = [name for name in names if name not in rps.OPPONENTS]
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)} (known: {', '.join(sorted(rps.OPPONENTS))})")
+    if len(names) < 2:
+        parser.error("need at least two strategies")
+
+    matrix, seconds = run(names, args.rounds, args.processes, args.rules, args.seed, args.plugin)
+    print_report(matrix, names, args.rounds, seconds, args.processes)
+    return matrix
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The Rock, Paper, Scissors scripts sit at the top level and the Tic-Tac-Toe
+# modules in their own folder; neither is a package, so put both on the path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "Tic-Tac-Toe-PY")]
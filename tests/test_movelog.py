@@ -0,0 +1,89 @@
+import pytest
+
+import engine
+import movelog
+
+
+def test_movelog_undo_redo():
+    log = movelog.MoveLog(base_seq=10)
+    for index in (4, 0, 8):
+        log.append(index)
+    assert (len(log), log.seq, log.played()) == (3, 13, bytes([4, 0, 8]))
+    assert log.undo() == 8
+    assert log.undo() == 0
+    assert log.undone() == 2
+    assert log.redo() == 0
+    assert log.since(11) == bytes([0])
+    assert log.since(9) is None
+    # A new move drops the redo tail
+    log.append(2)
+    assert log.played() == bytes([4, 0, 2])
+    assert log.redo() is None
+
+
+def test_movelog_replay_round_trip():
+    position = engine.Position()
+    played = engine.Position()
+    log = movelog.MoveLog()
+    for index, player in ((4, "X"), (0, "O"), (8, "X"), (2, "O")):
+        played.place(index, player)
+        log.append(index)
+    assert movelog.replay(position, log.played())
+    assert position == played
+    assert not movelog.replay(position, bytes([4, 4]))
+
+
+def test_history_round_trip(tmp_path):
+    path = str(tmp_path / "history.bin")
+    games = [(bytes([4, 0, 8, 2, 6, 1, 3, 5, 7]), "TIE"), (bytes([0, 3, 1, 4, 2]), "X"), (bytes([4]), movelog.TIMEOUT)]
+    writer = movelog.HistoryWriter(path)
+    for when, (moves, result) in enumerate(games):
+        writer.append(moves, result, when=1000 + when)
+    writer.close()
+    # Reopening appends after the existing records
+    writer = movelog.HistoryWriter(path)
+    writer.append(bytes([0, 4, 1, 2, 6, 3, 5]), "O", when=2000)
+    writer.close()
+
+    history = movelog.HistoryFile(path)
+    try:
+        assert (len(history), history.size, history.win_length) == (4, 3, 3)
+        assert history[0] == (1000, movelog.TIE, games[0][0])
+        assert history[1] == (1001, movelog.X_WINS, games[1][0])
+        assert history[3] == (2000, movelog.O_WINS, bytes([0, 4, 1, 2, 6, 3, 5]))
+        with pytest.raises(IndexError):
+            history[4]
+        stats = history.stats()
+        assert stats["games"] == 4
+        assert stats["results"] == {"X": 1, "O": 1, "TIE": 1, "timeout": 1}
+        assert stats["average_moves"] == (9 + 5 + 1 + 7) / 4
+        assert stats["openings"][0] == {"X": 1, "O": 1, "TIE": 0, "timeout": 0}
+        assert history.column(movelog.RECORD_HEAD.size) == bytes([4, 0, 4, 0])
+    finally:
+        history.close()
+
+
+def test_history_rejects_other_board_size(tmp_path):
+    path = str(tmp_path / "history.bin")
+    movelog.HistoryWriter(path).close()
+    with pytest.raises(ValueError, match="3x3"):
+        movelog.HistoryWriter(path, size=4, win_length=4)
+
+
+def test_history_empty_file(tmp_path):
+    path = tmp_path / "history.bin"
+    path.touch()
+    history = movelog.HistoryFile(str(path))
+    try:
+        assert len(history) == 0
+        assert history.stats()["games"] == 0
+    finally:
+        history.close()
+
+
+@pytest.mark.parametrize("data", [b"TTTH\x01", b"JUNK" + bytes(12)])
+def test_history_bad_header(tmp_path, data):
+    path = tmp_path / "history.bin"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        movelog.HistoryFile(str(path))
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import Rock_Paper_Scissor as rps
+
+
+def write_rules(tmp_path, data):
+    path = tmp_path / "rules.json"
+    path.write_text(data if isinstance(data, str) else json.dumps(data))
+    return str(path)
+
+
+def test_load_rules_cyclic(tmp_path):
+    rules = rps.load_rules(write_rules(tmp_path, {"name": "five", "weapons": ["a", "b", "c", "d", "e"]}))
+    assert rules.name == "five"
+    assert rules.size == 5
+    # Each weapon beats the two listed just before it
+    assert rules.outcome(rules.codes["c"], rules.codes["a"]) == rps.WIN
+    assert rules.outcome(rules.codes["c"], rules.codes["b"]) == rps.WIN
+    assert rules.outcome(rules.codes["c"], rules.codes["d"]) == rps.LOSS
+    assert rules.outcome(rules.codes["c"], rules.codes["c"]) == rps.TIE
+
+
+def test_load_rules_beats(tmp_path):
+    rules = rps.load_rules(write_rules(tmp_path, {
+        "weapons": ["Rock", "Paper", "Scissors"],
+        "beats": {"rock": ["scissors"], "paper": ["rock"], "scissors": ["paper"]},
+    }))
+    assert rules.weapons == ["rock", "paper", "scissors"]
+    assert rules.table == rps.CLASSIC.table
+
+
+@pytest.mark.parametrize("data, message", [
+    ("{not json", "not valid JSON"),
+    ([], "expected a JSON object"),
+    ({"weapons": "rock"}, "must be a list of names"),
+    ({"weapons": ["a", "b", "c"], "name": 3}, "\"name\" must be a string"),
+    ({"weapons": ["a", "b", "c"], "beats": ["a"]}, "\"beats\" must map"),
+    ({"weapons": ["a", "b", "c", "d"]}, "odd number"),
+    ({"weapons": ["a", "a", "b"]}, "distinct"),
+    ({"weapons": [f"w{i}" for i in range(rps.MAX_WEAPONS + 2)]}, "at most"),
+    ({"weapons": ["a", "b", "c"], "beats": {"a": ["b"], "b": ["a"]}}, "cannot both win"),
+    ({"weapons": ["a", "b", "c"], "beats": {"a": ["b", "c"]}}, "beats 2 weapons, expected 1"),
+    ({"weapons": ["a", "b", "c"], "beats": {"a": ["z"]}}, "unknown weapon"),
+])
+def test_load_rules_rejects(tmp_path, data, message):
+    with pytest.raises(ValueError, match=message):
+        rps.load_rules(write_rules(tmp_path, data))
+
+
+def test_play_rounds():
+    rock, paper, scissors = (rps.MOVE_CODES[name] for name in ("rock", "paper", "scissors"))
+    result = rps.play_rounds([rock, rock, paper, scissors, scissors], [scissors, paper, paper, rock, paper])
+    assert (result.wins, result.ties, result.losses) == (2, 1, 2)
+    assert list(result.results) == [rps.WIN, rps.LOSS, rps.TIE, rps.LOSS, rps.WIN]
+
+
+def test_play_rounds_rpsls():
+    codes = rps.RPSLS.codes
+    result = rps.play_rounds([codes["spock"], codes["lizard"]], [codes["rock"], codes["spock"]], rps.RPSLS)
+    assert (result.wins, result.ties, result.losses) == (2, 0, 0)
+
+
+def test_play_rounds_checks_moves():
+    with pytest.raises(ValueError, match="same length"):
+        rps.play_rounds([0, 1], [0])
+    with pytest.raises(ValueError, match="0 to 2"):
+        rps.play_rounds([3], [0])
+    assert rps.play_rounds([3], [0], rps.RPSLS).results[0] == rps.RPSLS.outcome(3, 0)
+
+
+def test_simulate_counts_every_round():
+    result = rps.simulate(1000, seed=1)
+    assert result.wins + result.ties + result.losses == 1000
+    assert rps.simulate(1000, seed=1)[:3] == result[:3]
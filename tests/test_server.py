@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+import server
+import wsframe
+
+
+class Player:
+    """A test client: one WebSocket to the server, JSON messages both ways."""
+
+    connected = []  # Every client of the running test, closed when it ends
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.connected.append(ws)
+
+    @classmethod
+    async def connect(cls, port):
+        return cls(await wsframe.connect("127.0.0.1", port))
+
+    def send(self, msg_type, **data):
+        self.ws.send(json.dumps({"type": msg_type, "data": data}))
+
+    async def expect(self, *types):
+        # The next message of one of types, skipping the rest (clock, opponent_* ...)
+        while True:
+            msg = json.loads(await asyncio.wait_for(self.ws.recv(), 5))
+            if msg["type"] in types:
+                return msg
+
+    async def drop(self):
+        # Lose the connection without a close frame, as a network drop would
+        self.ws.writer.transport.abort()
+        self.ws.writer.close()
+        await asyncio.sleep(0.05)
+
+
+def run(test, grace=5.0):
+    async def main():
+        game_server = server.GameServer(seed=1, grace=grace, turn_seconds=0)
+        listener = await game_server.serve("127.0.0.1", 0)
+        try:
+            await test(game_server, listener.sockets[0].getsockname()[1])
+        finally:
+            for ws in Player.connected:
+                ws.writer.close()
+            Player.connected.clear()
+            listener.close()
+            await listener.wait_closed()
+    asyncio.run(main())
+
+
+async def start_game(port):
+    # X creates a room and O joins; returns (x, o, code, x_session, o_session)
+    x = await Player.connect(port)
+    x.send("create_room")
+    created = (await x.expect("room_created"))["data"]
+    o = await Player.connect(port)
+    o.send("join_room", code=created["code"])
+    joined = (await o.expect("room_joined"))["data"]
+    await x.expect("opponent_joined")
+    return x, o, created["code"], created["session"], joined["session"]
+
+
+def test_resume_replays_missed_moves():
+    async def test(game_server, port):
+        x, o, code, x_session, _ = await start_game(port)
+        x.send("game_move", index=4, player="X")
+        await o.expect("game_move")
+        await x.drop()
+        assert (await o.expect("opponent_reconnecting"))["data"] == {"player": "X"}
+        o.send("game_move", index=0, player="O")
+        await asyncio.sleep(0.05)
+
+        x = await Player.connect(port)
+        x.send("resume", code=code, session=x_session, seq=1)
+        assert (await x.expect("resumed"))["data"] == {"code": code, "player": "X", "seq": 1}
+        assert (await x.expect("game_move"))["data"] == {"index": 0, "player": "O"}
+        assert (await x.expect("turn_switch"))["data"] == {"player": "X"}
+        assert (await o.expect("opponent_reconnected"))["data"] == {"player": "X"}
+        # The game carries on where it was
+        x.send("game_move", index=8, player="X")
+        assert (await o.expect("game_move"))["data"] == {"index": 8, "player": "X"}
+        assert game_server.resumes == 1
+    run(test)
+
+
+def test_resume_outside_the_log_sends_the_game():
+    async def test(game_server, port):
+        x, o, code, _, o_session = await start_game(port)
+        for index, player in ((4, x), (0, o), (8, x)):
+            player.send("game_move", index=index, player="X" if player is x else "O")
+            await (o if player is x else x).expect("game_move")
+        await o.drop()
+        o = await Player.connect(port)
+        # seq from the future: the client's state can't be trusted, it gets every move
+        o.send("resume", code=code, session=o_session, seq=99)
+        await o.expect("resumed")
+        assert (await o.expect("moves"))["data"] == {"since": 0, "seq": 3, "moves": [4, 0, 8]}
+    run(test)
+
+
+def test_resume_after_both_dropped():
+    async def test(game_server, port):
+        x, o, code, x_session, o_session = await start_game(port)
+        x.send("game_move", index=4, player="X")
+        await o.expect("game_move")
+        await x.drop()
+        await o.drop()
+        # Both seats are empty, but the room is held for the grace period
+        assert code in game_server.rooms
+
+        x = await Player.connect(port)
+        x.send("resume", code=code, session=x_session, seq=1)
+        assert (await x.expect("resumed", "resume_failed"))["type"] == "resumed"
+        o = await Player.connect(port)
+        o.send("resume", code=code, session=o_session, seq=0)
+        await o.expect("resumed")
+        assert (await o.expect("game_move"))["data"] == {"index": 4, "player": "X"}
+        await x.expect("opponent_reconnected")
+        # Both back: the grace timer is off and play goes on
+        assert game_server.rooms[code].expiry is None
+        o.send("game_move", index=0, player="O")
+        assert (await x.expect("game_move"))["data"] == {"index": 0, "player": "O"}
+    run(test, grace=0.3)
+
+
+def test_room_expires_when_only_one_returns():
+    async def test(game_server, port):
+        x, o, code, x_session, _ = await start_game(port)
+        await x.drop()
+        await o.drop()
+        x = await Player.connect(port)
+        x.send("resume", code=code, session=x_session, seq=0)
+        await x.expect("resumed")
+        assert (await x.expect("opponent_disconnected"))["data"] == {"disconnected": "O"}
+        assert code not in game_server.rooms
+    run(test, grace=0.3)
+
+
+def test_resume_after_grace_fails():
+    async def test(game_server, port):
+        x, o, code, x_session, _ = await start_game(port)
+        await x.drop()
+        await o.drop()
+        await asyncio.sleep(0.3)
+        assert code not in game_server.rooms
+        x = await Player.connect(port)
+        x.send("resume", code=code, session=x_session, seq=0)
+        assert (await x.expect("resume_failed"))["data"] == {"message": "Session expired."}
+    run(test, grace=0.1)
+
+
+def test_resume_with_wrong_session_fails():
+    async def test(game_server, port):
+        x, o, code, _, _ = await start_game(port)
+        stranger = await Player.connect(port)
+        stranger.send("resume", code=code, session="0" * 16, seq=0)
+        assert (await stranger.expect("resume_failed"))["data"] == {"message": "Session expired."}
+        stranger.send("resume", code="abc")
+        assert (await stranger.expect("resume_failed"))["data"] == {"message": "Bad resume request."}
+    run(test)